@@ -1,13 +1,25 @@
 import asyncio
 import os
+import time
 from typing import Any, Dict, List, Optional, Callable
 import httpx
 
-from agents import Agent, ModelSettings, Runner, function_tool
+from agents import Agent, ModelSettings, RunContextWrapper, Runner, function_tool
 from agents import SQLiteSession  # Use concrete implementation instead of Protocol
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from qdrant_client import AsyncQdrantClient
-from qdrant_client.http.models import FieldCondition, Filter, MatchValue
+from qdrant_client.http.models import FieldCondition, Filter, MatchValue, QueryRequest
+
+from context_assembly import CONTEXT_CANDIDATE_MULTIPLIER, assemble_context, fuse_candidates
+from cache import TwoTierCache, decode_vector, encode_vector, make_key
+from collection_versions import resolve_alias
+from deadline import DeadlineExceeded, current_budget, timed_stage, with_deadline
+from resilience import CircuitOpenError, get_upstream
+from tool_memo import ToolMemo
+from query_expansion import split_query
+from content_store import ContentStore, content_store_path, open_content_store
+from translation import localize_candidates, needs_translation, translate_query
+from serialization import dumps_text
 
 # --- Environment -----------------------------------------------------------------
 
@@ -18,11 +30,21 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 
 # --- Shared clients --------------------------------------------------------------
 
-qdrant_client = AsyncQdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY) if QDRANT_URL else None
+_qdrant_client: Optional[AsyncQdrantClient] = None
+
+def get_qdrant_client() -> Optional[AsyncQdrantClient]:
+    """Return the shared Qdrant client, creating it on first use."""
+    global _qdrant_client
+    if _qdrant_client is None and QDRANT_URL:
+        _qdrant_client = AsyncQdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+    return _qdrant_client
 
 # Gemini embedding configuration
 EMBEDDING_MODEL = "models/text-embedding-004"  # Gemini embedding model
-COLLECTION_NAME = "physical_ai_textbook"
+FULL_EMBEDDING_DIMENSION = 768
+# Must match the size the collection was indexed with (see index_textbook.py)
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", str(FULL_EMBEDDING_DIMENSION)))
+COLLECTION_NAME = "physical_ai_textbook"  # Alias to the live versioned collection
 BOOK_ID = "physical_ai_humanoid_robotics"
 
 # User profile fetcher function (will be set from backend)
@@ -34,27 +56,128 @@ def set_user_profile_fetcher(fetcher: Callable[[str], Dict[str, Any]]):
     _user_profile_fetcher = fetcher
 
 
+EMBEDDING_CACHE_TTL = 7 * 24 * 3600  # Embeddings only change with the model
+# Per-stage upper bounds; each is further capped by the request deadline
+EMBEDDING_TIMEOUT = 30.0
+QDRANT_TIMEOUT = 10.0
+COLLECTION_VERSION_TTL = 60.0  # How long a resolved alias target is trusted
+# Add graph neighbors of the best hits as extra candidates (needs the content
+# store, so expansion costs no network round trip)
+NEIGHBOR_EXPANSION_HITS = int(os.getenv("NEIGHBOR_EXPANSION_HITS", "3"))
+NEIGHBOR_EXPANSION_PER_HIT = 2
+
+embedding_cache = TwoTierCache(
+    "embedding",
+    ttl=EMBEDDING_CACHE_TTL,
+    encode=encode_vector,
+    decode=decode_vector,
+)
+
+_collection_version: Optional[str] = None
+_collection_version_checked_at = 0.0
+
+
+async def get_collection_version() -> str:
+    """
+    Name of the versioned collection behind COLLECTION_NAME (e.g. ..._v7).
+
+    Used in cache keys so answers are invalidated by a re-index. Re-resolved at
+    most every COLLECTION_VERSION_TTL seconds.
+    """
+    global _collection_version, _collection_version_checked_at
+    if time.time() - _collection_version_checked_at < COLLECTION_VERSION_TTL and _collection_version:
+        return _collection_version
+    client = get_qdrant_client()
+    if client:
+        try:
+            _collection_version = await with_deadline(
+                resolve_alias(client, COLLECTION_NAME), QDRANT_TIMEOUT
+            ) or COLLECTION_NAME
+            _collection_version_checked_at = time.time()
+        except Exception as e:
+            print(f"Warning: could not resolve collection alias: {e}")
+    return _collection_version or COLLECTION_NAME
+
+
 async def _generate_embedding(text: str) -> List[float]:
-    """Helper to create embeddings via Gemini API."""
-    if not GEMINI_API_KEY:
-        raise ValueError("GEMINI_API_KEY is not set")
-    
-    url = f"https://generativelanguage.googleapis.com/v1beta/{EMBEDDING_MODEL}:embedContent?key={GEMINI_API_KEY}"
-    payload = {
+    """Helper to create embeddings via Gemini API (two-tier cached)."""
+    cache_key = make_key("emb", EMBEDDING_MODEL, EMBEDDING_DIMENSION, text)
+    return await embedding_cache.get_or_compute(cache_key, lambda: _fetch_embedding(text))
+
+
+async def _generate_embeddings(texts: List[str]) -> List[List[float]]:
+    """
+    Embed several query texts, fetching all cache misses in one
+    batchEmbedContents request instead of one request per text.
+    """
+    keys = [make_key("emb", EMBEDDING_MODEL, EMBEDDING_DIMENSION, text) for text in texts]
+    vectors: List[Optional[List[float]]] = [await embedding_cache.get(key) for key in keys]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if len(missing) == 1:
+        i = missing[0]
+        vectors[i] = await _generate_embedding(texts[i])
+    elif missing:
+        fetched = await _fetch_embeddings_batch([texts[i] for i in missing])
+        for i, vector in zip(missing, fetched):
+            vectors[i] = vector
+            await embedding_cache.set(keys[i], vector)
+    return vectors
+
+
+def _query_embedding_payload(text: str) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {
         "content": {
             "parts": [{"text": text}]
         },
         "taskType": "RETRIEVAL_QUERY"  # Use RETRIEVAL_QUERY for search queries
     }
+    if EMBEDDING_DIMENSION < FULL_EMBEDDING_DIMENSION:
+        payload["outputDimensionality"] = EMBEDDING_DIMENSION
+    return payload
+
+
+async def _fetch_embeddings_batch(texts: List[str]) -> List[List[float]]:
+    if not GEMINI_API_KEY:
+        raise ValueError("GEMINI_API_KEY is not set")
+
+    url = f"https://generativelanguage.googleapis.com/v1beta/{EMBEDDING_MODEL}:batchEmbedContents?key={GEMINI_API_KEY}"
+    payload = {
+        "requests": [
+            {"model": EMBEDDING_MODEL, **_query_embedding_payload(text)}
+            for text in texts
+        ]
+    }
+
+    async with httpx.AsyncClient(timeout=EMBEDDING_TIMEOUT) as client:
+        async def attempt() -> List[List[float]]:
+            response = await with_deadline(client.post(url, json=payload), EMBEDDING_TIMEOUT)
+            if response.status_code == 200:
+                return [item["values"] for item in response.json()["embeddings"]]
+            else:
+                raise Exception(f"Gemini API error ({response.status_code}): {response.text}")
+
+        return await get_upstream("gemini_embedding").call(attempt, hedge=True)
+
+
+async def _fetch_embedding(text: str) -> List[float]:
+    if not GEMINI_API_KEY:
+        raise ValueError("GEMINI_API_KEY is not set")
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.post(url, json=payload)
-        if response.status_code == 200:
-            data = response.json()
-            return data["embedding"]["values"]
-        else:
-            error_text = response.text
-            raise Exception(f"Gemini API error ({response.status_code}): {error_text}")
+    url = f"https://generativelanguage.googleapis.com/v1beta/{EMBEDDING_MODEL}:embedContent?key={GEMINI_API_KEY}"
+    payload = _query_embedding_payload(text)
+    
+    async with httpx.AsyncClient(timeout=EMBEDDING_TIMEOUT) as client:
+        async def attempt() -> List[float]:
+            response = await with_deadline(client.post(url, json=payload), EMBEDDING_TIMEOUT)
+            if response.status_code == 200:
+                data = response.json()
+                return data["embedding"]["values"]
+            else:
+                error_text = response.text
+                raise Exception(f"Gemini API error ({response.status_code}): {error_text}")
+
+        # Embedding is idempotent, so a slow request gets a hedged duplicate
+        return await get_upstream("gemini_embedding").call(attempt, hedge=True)
 
 
 # --- Pydantic Schemas ------------------------------------------------------------
@@ -74,65 +197,207 @@ class RagSearchResponse(BaseModel):
     chunks: List[RetrievedChunk] = Field(default_factory=list)
 
 
+CHUNK_FIELDS = tuple(RetrievedChunk.model_fields)
+
+
+def _search_response(
+    query: str,
+    user_selected_text: Optional[str],
+    chunks: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """
+    A RagSearchResponse as a plain dict. Built directly on this hot path:
+    the chunks are our own data, so pydantic validation and model_dump()
+    would only copy them twice.
+    """
+    return {
+        "query": query,
+        "total_results": len(chunks),
+        "user_selected_text_included": bool(user_selected_text),
+        "chunks": [
+            {field: chunk.get(field, "" if field == "content" else None) for field in CHUNK_FIELDS}
+            for chunk in chunks
+        ],
+    }
+
+
 class UserProfile(BaseModel):
     experience_level: str
     background: str
+    language: str = "english"
+
+
+class TutorContext(BaseModel):
+    """Per-run context passed to Runner.run(context=...)."""
+    user_id: Optional[str] = None
+    # Resolved before the run; rendered into the instructions when present
+    profile: Optional[UserProfile] = None
+    _tool_memo: ToolMemo = PrivateAttr(default_factory=ToolMemo)
+
+    @property
+    def tool_memo(self) -> ToolMemo:
+        """Tool results already computed during this run."""
+        return self._tool_memo
+
+    def share_tool_memo(self, memo: ToolMemo) -> None:
+        """Use a memo shared with other runs (e.g. the questions of a batch)."""
+        self._tool_memo = memo
+
+
+async def _memoized(
+    ctx: RunContextWrapper[Optional[TutorContext]],
+    tool: str,
+    args: Dict[str, Any],
+    compute: Callable[[], Any],
+) -> Any:
+    """Run a tool body once per run for equivalent arguments."""
+    if ctx.context is None:
+        return await compute()
+    return await ctx.context.tool_memo.get_or_run(tool, args, compute)
+
+
+class RetrievalUnavailable(Exception):
+    """search_textbook could not search (no client, deadline, open breaker, Qdrant error)."""
+
+
+async def memoized_search(
+    context: Optional[TutorContext],
+    query: str,
+    user_selected_text: Optional[str] = None,
+    top_k: int = 5,
+) -> Dict[str, Any]:
+    """
+    search_textbook in the learner's language, memoized on the run context.
+    Also used to search before a run (model routing); the agent's own
+    rag_search_tool call for the same question is then a memo hit.
+
+    A failed search returns no chunks and marks the request budget as
+    retrieval_failed, so the resulting answer isn't cached.
+    """
+    profile = context.profile if context else None
+    language = profile.language if profile else None
+    compute = lambda: search_textbook(query, user_selected_text, top_k, language)
+    try:
+        if context is None:
+            return await compute()
+        return await context.tool_memo.get_or_run(
+            "rag_search_tool",
+            {"query": query, "user_selected_text": user_selected_text or "", "top_k": top_k, "language": language or ""},
+            compute,
+        )
+    except Exception as e:
+        # Failures aren't memoized, so every run sharing the memo gets here
+        budget = current_budget()
+        if budget:
+            budget.retrieval_failed = True
+        if isinstance(e, RetrievalUnavailable):
+            print(f"Warning: textbook search failed: {e}")
+            return _search_response(query, user_selected_text, [])
+        raise
 
 
 # --- Tools -----------------------------------------------------------------------
 
 @function_tool
 async def rag_search_tool(
+    ctx: RunContextWrapper[Optional[TutorContext]],
     query: str,
     user_selected_text: Optional[str] = None,
     top_k: int = 5,
-) -> Dict[str, Any]:
+) -> str:
     """
     Searches the Physical AI textbook collection for relevant chunks.
 
     Returns:
-        dict containing retrieved chunks and metadata for citation.
+        JSON object containing retrieved chunks and metadata for citation.
+    """
+    result = await memoized_search(ctx.context, query, user_selected_text, top_k)
+    # Remember citations (also on memo hits) for the sources and for a
+    # degraded answer if the deadline hits later
+    budget = current_budget()
+    if budget:
+        budget.add_references(result["chunks"])
+    # The SDK would hand the model str(dict); compact JSON is smaller and
+    # encoded once here
+    return dumps_text(result)
+
+
+def _neighbor_candidates(
+    candidates: List[Dict[str, Any]],
+    collection: str,
+    content_store: ContentStore,
+) -> List[Dict[str, Any]]:
+    """
+    Neighbors of the top hits from the precomputed graph, scored as
+    hit score x neighbor similarity. Text comes from the local store.
+    """
+    from neighbor_graph import load_neighbor_graph  # numpy, only when used
+
+    graph = load_neighbor_graph(collection)
+    if graph is None:
+        return []
+    seen = {str(c.get("id")) for c in candidates}
+    scores: Dict[str, float] = {}
+    for candidate in candidates[:NEIGHBOR_EXPANSION_HITS]:
+        for neighbor_id, similarity in graph.neighbors(candidate.get("id"), NEIGHBOR_EXPANSION_PER_HIT):
+            if neighbor_id not in seen:
+                score = (candidate.get("score") or 0.0) * similarity
+                scores[neighbor_id] = max(score, scores.get(neighbor_id, 0.0))
+    stored = content_store.get_many(list(scores))
+    return [
+        {"id": neighbor_id, **stored[neighbor_id], "score": score, "vector": None}
+        for neighbor_id, score in scores.items()
+        if neighbor_id in stored
+    ]
+
+
+async def search_textbook(
+    query: str,
+    user_selected_text: Optional[str] = None,
+    top_k: int = 5,
+    language: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Body of rag_search_tool: embed, search, assemble context. For a
+    non-English `language` the query is searched in English and chunks are
+    returned in that language where a stored translation exists.
+
+    Raises RetrievalUnavailable when the search itself fails, so an empty
+    result always means "nothing relevant in the textbook".
     """
     if not query:
-        return RagSearchResponse(
-            query=query,
-            total_results=0,
-            user_selected_text_included=bool(user_selected_text),
-            chunks=[],
-        ).model_dump()
+        return _search_response(query, user_selected_text, [])
 
+    qdrant_client = get_qdrant_client()
     if not qdrant_client:
-        return RagSearchResponse(
-            query=query,
-            total_results=0,
-            user_selected_text_included=bool(user_selected_text),
-            chunks=[],
-        ).model_dump()
+        raise RetrievalUnavailable("QDRANT_URL is not set")
 
     # Check if collection exists
     try:
-        collection_info = await qdrant_client.get_collection(COLLECTION_NAME)
+        collection_info = await get_upstream("qdrant").call(
+            lambda: with_deadline(qdrant_client.get_collection(COLLECTION_NAME), QDRANT_TIMEOUT),
+            hedge=True,
+        )
     except Exception as e:
         error_msg = str(e)
         if "doesn't exist" in error_msg or "404" in error_msg or "Not found" in error_msg:
             print(f"Warning: Qdrant collection '{COLLECTION_NAME}' does not exist. Please create and index the collection first.")
-            return RagSearchResponse(
-                query=query,
-                total_results=0,
-                user_selected_text_included=bool(user_selected_text),
-                chunks=[],
-            ).model_dump()
         else:
             print(f"Error checking Qdrant collection: {e}")
-            return RagSearchResponse(
-                query=query,
-                total_results=0,
-                user_selected_text_included=bool(user_selected_text),
-                chunks=[],
-            ).model_dump()
-
-    # 1. Embed the query
-    query_vector = await _generate_embedding(query)
+        raise RetrievalUnavailable(f"collection check failed: {e!r}") from e
+
+    # 1. Embed the query, plus the parts of a compound question (one request).
+    # Vectors are English, so other languages search with a cached translation.
+    search_query = query
+    if needs_translation(language):
+        with timed_stage("query_translation"):
+            search_query = await translate_query(query, language)
+    queries = split_query(search_query)
+    try:
+        with timed_stage("embedding"):
+            query_vectors = await _generate_embeddings(queries)
+    except (DeadlineExceeded, CircuitOpenError) as e:
+        raise RetrievalUnavailable(f"could not embed the query: {e!r}") from e
 
     # 2. Search Qdrant using query_points (newer API - replaces search method)
     qdrant_filter = Filter(
@@ -144,66 +409,92 @@ async def rag_search_tool(
         ]
     )
     
-    # Use query_points instead of search (for qdrant-client 1.16.0+)
-    # query_points accepts the vector directly or a Query object
-    try:
-        query_result = await qdrant_client.query_points(
-            collection_name=COLLECTION_NAME,
-            query=query_vector,  # Can pass vector directly
-            query_filter=qdrant_filter,
-            limit=top_k,
-            with_payload=True,
-            with_vectors=False,
+    # With a local content store for the live version, hits come back without
+    # payloads and the text is read locally. The versioned collection is
+    # queried directly so ids always match the store, even mid-swap.
+    live_collection = await get_collection_version()
+    content_store = open_content_store(live_collection)
+    search_collection = live_collection if content_store else COLLECTION_NAME
+
+    # All (sub-)queries go to Qdrant in a single batch request
+    requests = [
+        QueryRequest(
+            query=query_vector,
+            filter=qdrant_filter,
+            limit=top_k * CONTEXT_CANDIDATE_MULTIPLIER,  # Over-fetch for MMR
+            with_payload=content_store is None,
+            with_vector=True,  # Needed for MMR diversification
         )
-        hits = query_result.points
+        for query_vector in query_vectors
+    ]
+    try:
+        with timed_stage("vector_search"):
+            responses = await get_upstream("qdrant").call(lambda: with_deadline(qdrant_client.query_batch_points(
+                collection_name=search_collection,
+                requests=requests,
+            ), QDRANT_TIMEOUT), hedge=True)
     except Exception as e:
         error_msg = str(e)
         print(f"Error querying Qdrant: {e}")
         if "doesn't exist" in error_msg or "404" in error_msg or "Not found" in error_msg:
             print(f"Warning: Qdrant collection '{COLLECTION_NAME}' does not exist. Please create and index the collection first.")
-        return RagSearchResponse(
-            query=query,
-            total_results=0,
-            user_selected_text_included=bool(user_selected_text),
-            chunks=[],
-        ).model_dump()
-
-    # 3. Format chunks
-    chunks: List[RetrievedChunk] = []
-    for hit in hits:
-        payload = hit.payload or {}
-        # ScoredPoint has a 'score' attribute
-        score = hit.score if hasattr(hit, 'score') else 0.0
-        
-        chunks.append(
-            RetrievedChunk(
-                content=payload.get("content", ""),
-                chapter=payload.get("chapter"),
-                section=payload.get("section"),
-                chapter_url=payload.get("chapter_url"),
-                score=score,
-            )
+        raise RetrievalUnavailable(f"query failed: {e!r}") from e
+
+    # 3. Collect candidates, fusing the sub-query results
+    stored: Dict[str, Dict[str, Any]] = {}
+    if content_store:
+        # SQLite reads block; keep them off the event loop
+        stored = await asyncio.to_thread(
+            content_store.get_many, list({hit.id for response in responses for hit in response.points})
         )
-
-    # 4. Inject user-selected text (if any) at highest priority
-    if user_selected_text:
-        chunks.insert(
-            0,
-            RetrievedChunk(
-                content=user_selected_text,
-                chapter="User Selection",
-                section="Provided Context",
-                chapter_url=None,
-                score=1.0,
-            ),
+    elif any("content" not in (hit.payload or {}) for response in responses for hit in response.points):
+        # Slim payloads, but this host has no content store for the version:
+        # every chunk would come back without text
+        print(
+            f"ERROR: '{search_collection}' has slim payloads but there is no content store at "
+            f"{content_store_path(live_collection)}; copy it from the indexing host or re-index"
         )
-
-    return RagSearchResponse(
-        query=query,
-        chunks=chunks,
-        total_results=len(chunks),
-        user_selected_text_included=bool(user_selected_text),
-    ).model_dump()
+        raise RetrievalUnavailable("chunk text unavailable (missing content store)")
+    result_lists: List[List[Dict[str, Any]]] = []
+    for response in responses:
+        candidates: List[Dict[str, Any]] = []
+        for hit in response.points:
+            payload = stored.get(str(hit.id), {}) if content_store else (hit.payload or {})
+            # ScoredPoint has a 'score' attribute
+            score = hit.score if hasattr(hit, 'score') else 0.0
+
+            candidates.append({
+                "id": hit.id,
+                "content": payload.get("content", ""),
+                "chapter": payload.get("chapter"),
+                "section": payload.get("section"),
+                "chapter_url": payload.get("chapter_url"),
+                "score": score,
+                "vector": hit.vector if isinstance(hit.vector, list) else None,
+            })
+        result_lists.append(candidates)
+    candidates = fuse_candidates(result_lists)
+    if content_store and NEIGHBOR_EXPANSION_HITS > 0:
+        # Graph load (first use or after a rebuild) and store reads block
+        candidates.extend(await asyncio.to_thread(_neighbor_candidates, candidates, live_collection, content_store))
+
+    # 4. Assemble context: score threshold, MMR, overlap removal, sentence
+    # compression and token budget.
+    # User-selected text (if any) is kept first at highest priority.
+    # Each chunk is compressed against the query in its own language: the
+    # learner's for translated chunks, English for the rest.
+    with timed_stage("context_assembly"):
+        localized = 0
+        if needs_translation(language):
+            localized = await asyncio.to_thread(localize_candidates, candidates, language)
+        chunks = assemble_context(
+            candidates,
+            top_k=top_k,
+            user_selected_text=user_selected_text,
+            query=search_query,
+            localized_query=query if localized else None,
+        )
+    return _search_response(query, user_selected_text, chunks)
 
 
 USER_PROFILES: Dict[str, UserProfile] = {
@@ -223,12 +514,24 @@ DEFAULT_PROFILE = UserProfile(
 
 
 @function_tool
-async def user_context_tool(user_id: Optional[str] = None) -> Dict[str, Any]:
+async def user_context_tool(
+    ctx: RunContextWrapper[Optional[TutorContext]],
+    user_id: Optional[str] = None,
+) -> Dict[str, Any]:
     """
     Returns personalization data for the user.
-    You should call this tool with the user_id when you want to personalize responses.
+    Only call this tool if no learner profile is given in your instructions.
     If no user_id is provided, returns default profile.
     """
+    # Fallback only: chat_endpoint normally injects the profile up front
+    if ctx.context and ctx.context.profile:
+        return ctx.context.profile.model_dump()
+    return await _memoized(
+        ctx, "user_context_tool", {"user_id": user_id or ""}, lambda: _lookup_user_profile(user_id)
+    )
+
+
+async def _lookup_user_profile(user_id: Optional[str]) -> Dict[str, Any]:
     if not user_id:
         return DEFAULT_PROFILE.model_dump()
     
@@ -247,19 +550,34 @@ async def user_context_tool(user_id: Optional[str] = None) -> Dict[str, Any]:
 
 # --- Agent -----------------------------------------------------------------------
 
+def render_profile_instructions(profile: Optional[UserProfile]) -> str:
+    """Learner profile section appended to the tutor instructions."""
+    if profile is None:
+        return ""
+    return (
+        "\n\nLearner profile (already known; do not call user_context_tool):\n"
+        f"- Experience level: {profile.experience_level}\n"
+        f"- Background: {profile.background}\n"
+        "Adapt depth, terminology and examples to this learner."
+    )
+
+
 def create_agent(language: str = "english") -> Agent:
     """Create the Physical AI Tutor agent with language support."""
     # Language-specific instructions
     language_instruction = ""
     if language and language.lower() != "english":
-        language_instruction = f"\n6. Respond in {language}. All your responses must be in {language}.\n"
+        language_instruction = (
+            f"\n6. Respond in {language}. All your responses must be in {language}. "
+            f"Textbook excerpts may already be translated into {language}; use them as they are.\n"
+        )
     
     instructions = (
         "You tutor Physical AI & Humanoid Robotics using ONLY the official textbook. "
         "For every question:\n"
         "1. Always call rag_search_tool first with the user's question.\n"
         "2. If the user provides context (selected text), use it to better understand their question.\n"
-        "3. Call user_context_tool if you need to personalize your response (pass user_id if mentioned in the conversation).\n"
+        "3. Personalize using the learner profile below; call user_context_tool only if no profile is given.\n"
         '4. If content is not in the textbook, reply only with "I don\'t have that information in the textbook."\n'
         "5. Present answers in Markdown with sections:\n"
         "   - **Reasoned Explanation** (step-by-step, pedagogical, citing chapters inline like (Chapter 2, Section 1)).\n"
@@ -270,9 +588,15 @@ def create_agent(language: str = "english") -> Agent:
         + language_instruction
     )
     
+    def dynamic_instructions(
+        ctx: RunContextWrapper[Optional[TutorContext]], agent: Agent
+    ) -> str:
+        profile = ctx.context.profile if ctx.context else None
+        return instructions.rstrip() + render_profile_instructions(profile)
+
     return Agent(
         name="Physical AI Tutor",
-        instructions=instructions,
+        instructions=dynamic_instructions,
         tools=[rag_search_tool, user_context_tool],
         model_settings=ModelSettings(
             temperature=0.3,
@@ -283,6 +607,17 @@ def create_agent(language: str = "english") -> Agent:
 # Default agent instance
 physical_ai_tutor = create_agent()
 
+# Agents are immutable once built, so one instance per language is reused
+# across requests (and shared copy-on-write by pre-forked workers)
+_agent_registry: Dict[str, Agent] = {"english": physical_ai_tutor}
+
+def get_agent(language: str = "english") -> Agent:
+    """Return the cached tutor agent for a language, creating it on first use."""
+    key = (language or "english").lower()
+    if key not in _agent_registry:
+        _agent_registry[key] = create_agent(language=language)
+    return _agent_registry[key]
+
 
 # --- Runner / Session Example ----------------------------------------------------
 
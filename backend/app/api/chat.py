@@ -2,19 +2,47 @@
 Chat API endpoint for the Physical AI Tutor.
 """
 import asyncio
+import json
 import os
 import sys
 from pathlib import Path
-from typing import Optional, Dict, Any
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from fastapi import APIRouter, HTTPException
 
 # Add backend directory to path to import agent
 backend_dir = Path(__file__).resolve().parent.parent.parent
 sys.path.insert(0, str(backend_dir))
-from agent import create_agent, set_user_profile_fetcher, physical_ai_tutor
+from agent import (
+    DEFAULT_PROFILE,
+    TutorContext,
+    UserProfile,
+    get_agent,
+    get_collection_version,
+    memoized_search,
+    set_user_profile_fetcher,
+)
 from agents import Runner
-from geminiconfig import get_gemini_config
+from geminiconfig import GEMINI_MODEL, get_gemini_config
+from migrate import get_capabilities
+from model_routing import ROUTING_ENABLED, ROUTING_USE_RETRIEVAL, classify_question, record_run
+from app.api.chat_models import ChatBatchRequest, ChatRequest, ChatResponse
+from resilience import CircuitOpenError
+from cache import TwoTierCache, make_key
+from user_profiles import get_cached_profile
+from tool_memo import ToolMemo
+from chat_events import record_chat_event
+from deadline import (
+    DEGRADE_RESERVE_SECONDS,
+    REQUEST_DEADLINE_SECONDS,
+    DeadlineExceeded,
+    current_budget,
+    degraded_answer,
+    request_deadline,
+    stage_timeout,
+    timed_stage,
+    with_deadline,
+)
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
@@ -29,35 +57,89 @@ if not DATABASE_URL:
         "Chat endpoint will fail on DB access until this is configured."
     )
 
+DB_CONNECT_TIMEOUT = 10
+
+
 def get_db_connection():
-    """Get a database connection."""
+    """Get a database connection (connect timeout capped by the request deadline)."""
     try:
-        conn = psycopg2.connect(DATABASE_URL)
+        # libpq takes whole seconds and treats anything below 2 as 2
+        connect_timeout = max(2, int(stage_timeout(DB_CONNECT_TIMEOUT)))
+        conn = psycopg2.connect(DATABASE_URL, connect_timeout=connect_timeout)
         return conn
     except Exception as e:
         print(f"Database connection error: {e}")
         raise
 
 
-# Store current user_id for the user_context_tool to access
-_current_user_id: Optional[str] = None
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "3600"))
+# Answers older than the TTL are still served for this long while refreshing
+ANSWER_CACHE_STALE_TTL = int(os.getenv("ANSWER_CACHE_STALE_TTL", "86400"))
+
+answer_cache = TwoTierCache("answer", ttl=ANSWER_CACHE_TTL, stale_ttl=ANSWER_CACHE_STALE_TTL)
+
+
+def normalize_question(query: str) -> str:
+    """Case/whitespace/trailing-punctuation-insensitive form used in answer keys."""
+    return " ".join(query.casefold().split()).rstrip("?.! ")
+
+
+EXPERIENCE_LEVELS = ("beginner", "intermediate", "advanced")
+
+
+def experience_bucket(level: Optional[str]) -> str:
+    """One of EXPERIENCE_LEVELS; anything else shares the default level's answers."""
+    level = (level or "").strip().lower()
+    return level if level in EXPERIENCE_LEVELS else DEFAULT_PROFILE.experience_level
+
+
+async def answer_cache_key(
+    language: str,
+    query: str,
+    selected_text: Optional[str],
+    profile: UserProfile = DEFAULT_PROFILE,
+) -> str:
+    """
+    Versioned cache key for a final tutor answer. Covers every profile field
+    rendered into the instructions: learners without a background of their
+    own (the default one) share answers per level, anyone else's background
+    tailors the answer, so it is only served back to that background.
+    """
+    return make_key(
+        "ans",
+        GEMINI_MODEL,
+        await get_collection_version(),
+        language.strip().lower(),
+        experience_bucket(profile.experience_level),
+        " ".join(profile.background.split()),
+        normalize_question(query),
+        selected_text or "",
+    )
+
+
+# Profile lookups should never eat much of the request budget
+PROFILE_LOOKUP_TIMEOUT = 1.5
+
+
+def user_profile_query() -> str:
+    """
+    Query shape for reading a user's profile, based on the schema
+    capabilities detected at startup (older schemas lack some columns).
+    """
+    columns = ["experience_level"]
+    capabilities = get_capabilities(get_db_connection)
+    for column in ("background", "language"):
+        if capabilities and capabilities.has_user_column(column):
+            columns.append(column)
+    return f"SELECT {', '.join(columns)} FROM users WHERE id = %s"
+
 
 def fetch_user_profile_from_db(user_id: str) -> Optional[Dict[str, Any]]:
     """Fetch user profile from database."""
     conn = get_db_connection()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(
-                """
-                SELECT 
-                    experience_level,
-                    background,
-                    language
-                FROM users 
-                WHERE id = %s
-                """,
-                (user_id,)
-            )
+            cur.execute(user_profile_query(), (user_id,))
             user = cur.fetchone()
             
             if not user:
@@ -73,21 +155,183 @@ def fetch_user_profile_from_db(user_id: str) -> Optional[Dict[str, Any]]:
         conn.close()
 
 
-# Set the user profile fetcher
+# Fallback for user_context_tool when a run has no injected profile
 set_user_profile_fetcher(fetch_user_profile_from_db)
 
 
-class ChatRequest(BaseModel):
-    query: str
-    session_id: str
-    user_id: Optional[str] = None
-    selected_text: Optional[str] = None
+async def resolve_profile(user_id: Optional[str]) -> UserProfile:
+    """The learner's cached profile, or the default one if unknown/unavailable."""
+    if not user_id:
+        return DEFAULT_PROFILE
+    try:
+        data = await with_deadline(
+            get_cached_profile(user_id, fetch_user_profile_from_db),
+            default=PROFILE_LOOKUP_TIMEOUT,
+        )
+    except Exception as e:
+        print(f"Warning: Could not fetch user profile: {e!r}")
+        return DEFAULT_PROFILE
+    if not data:
+        return DEFAULT_PROFILE
+    # The instructions show the level the answer is cached under
+    return UserProfile(**{**data, "experience_level": experience_bucket(data.get("experience_level"))})
 
 
-class ChatResponse(BaseModel):
-    response: str
-    sources: list
-    session_id: str
+async def run_tutor(
+    agent,
+    query_text: str,
+    config,
+    context: Optional[TutorContext] = None,
+) -> Dict[str, Any]:
+    """Run the tutor agent once and return its answer and cited sources."""
+    if current_budget() is None:
+        with request_deadline():
+            return await run_tutor(agent, query_text, config, context)
+    
+    current_budget().model = getattr(config.model, "model", None) or GEMINI_MODEL
+    # Run the agent with simple string input (no complex message format)
+    # The agents SDK doesn't support metadata content type, so we use plain text
+    # (agent_run includes the tool stages it triggers, e.g. vector_search)
+    with timed_stage("agent_run"):
+        result = await Runner.run(
+            agent,
+            input=query_text,  # Simple string input - no metadata format
+            context=context,  # Learner profile, rendered into the instructions
+            run_config=config
+        )
+    if context is not None:
+        print(f"Tutor run: {context.tool_memo.summary()}")
+    
+    # Extract response
+    # final_output is a property (string), not a method - access without parentheses
+    try:
+        response_text = result.final_output  # Property, not method
+    except AttributeError:
+        # Fallback: try final_output_as or other methods
+        if hasattr(result, 'final_output_as'):
+            response_text = result.final_output_as(str)
+        else:
+            response_text = str(result)
+    
+    # Sources are the chunks rag_search_tool retrieved during this run
+    sources = list(current_budget().references)
+    
+    return {"response": response_text, "sources": sources}
+
+
+async def run_routed_tutor(
+    agent,
+    query: str,
+    selected_text: Optional[str],
+    query_text: str,
+    context: TutorContext,
+) -> Dict[str, Any]:
+    """
+    Run the tutor on the model tier chosen for this question (see
+    model_routing). A failing light-tier run is retried once on the full tier.
+    """
+    scores = None
+    if ROUTING_USE_RETRIEVAL:
+        try:
+            # Seeds the run's tool memo: the agent's first search is then free.
+            # Searched as the model calls the tool (query only; the selection
+            # is passed to the model in its input, not the tool arguments)
+            result = await memoized_search(context, query)
+            scores = [chunk["score"] for chunk in result["chunks"] if chunk.get("chapter") != "User Selection"]
+        except Exception as e:
+            print(f"Warning: routing search failed, routing on the question only: {e!r}")
+    decision = classify_question(query, selected_text, scores)
+    print(f"Model route: {decision.describe()}")
+
+    start = time.monotonic()
+    try:
+        answer = await run_tutor(
+            agent, query_text, get_gemini_config(decision.tier.model, decision.tier.max_tokens), context
+        )
+    except (DeadlineExceeded, CircuitOpenError):
+        record_run(decision, (time.monotonic() - start) * 1000, "error")
+        raise
+    except Exception:
+        if decision.tier.name == "full":
+            record_run(decision, (time.monotonic() - start) * 1000, "error")
+            raise
+        record_run(decision, (time.monotonic() - start) * 1000, "escalated")
+        print("Light-tier run failed; retrying on the full tier")
+        return await run_tutor(agent, query_text, get_gemini_config(), context)
+    record_run(decision, (time.monotonic() - start) * 1000, "ok")
+    return answer
+
+
+async def answer_question(
+    agent,
+    config,
+    context: TutorContext,
+    language: str,
+    query: str,
+    selected_text: Optional[str] = None,
+    seconds: float = REQUEST_DEADLINE_SECONDS,
+    session_id: Optional[str] = None,
+    endpoint: str = "chat",
+) -> Dict[str, Any]:
+    """
+    Answer one question within its own deadline: cached answer if any,
+    otherwise a tutor run, or a degraded answer when time runs out. Every
+    answer is queued for the chat event log (written behind, off this path).
+    """
+    start = time.monotonic()
+    with request_deadline(seconds) as budget:
+        outcome = "error"
+        answer: Dict[str, Any] = {}
+        try:
+            # Prepare query text - include selected text if provided
+            query_text = query
+            if selected_text:
+                query_text = f"Context: {selected_text}\n\nQuestion: {query}"
+
+            # Answers are shared across workers/replicas; identical questions skip the LLM
+            cache_key = await answer_cache_key(language, query, selected_text, context.profile or DEFAULT_PROFILE)
+            try:
+                answer = await with_deadline(
+                    answer_cache.get_or_compute(
+                        cache_key,
+                        lambda: (
+                            run_routed_tutor(agent, query, selected_text, query_text, context)
+                            if ROUTING_ENABLED
+                            else run_tutor(agent, query_text, config, context)
+                        ),
+                        # An answer written without the textbook (search failed)
+                        # would be served as "not in the textbook" for hours
+                        cacheable=lambda _: not budget.retrieval_failed,
+                    ),
+                    default=seconds,
+                    reserve=DEGRADE_RESERVE_SECONDS,
+                )
+                # No tutor run in this request: the answer came from the cache
+                outcome = "answered" if "agent_run" in budget.stage_ms else "cached"
+            except (DeadlineExceeded, CircuitOpenError) as e:
+                # Out of time or the LLM is failing fast: answer with the
+                # references retrieved so far. A computation still in flight
+                # keeps filling the cache.
+                print(f"Chat degraded ({e!r}); returning {len(budget.references)} references")
+                answer = {
+                    "response": degraded_answer(budget.references),
+                    "sources": budget.references,
+                }
+                outcome = "degraded"
+            return answer
+        finally:
+            record_chat_event(
+                endpoint,
+                query,
+                outcome,
+                total_ms=(time.monotonic() - start) * 1000,
+                stage_ms=budget.stage_ms,
+                sources=answer.get("sources") or [],
+                model=budget.model if outcome == "answered" else None,
+                session_id=session_id,
+                user_id=context.user_id,
+                language=language,
+            )
 
 
 @router.post("/chat", response_model=ChatResponse)
@@ -99,112 +343,40 @@ async def chat_endpoint(
     Chat endpoint that uses the Physical AI Tutor agent.
     """
     try:
-        # Get user ID from request or current_user
-        user_id = request.user_id or (current_user.get("id") if current_user else None)
+        # Every stage below shares one end-to-end deadline
+        with request_deadline(REQUEST_DEADLINE_SECONDS) as budget:
+            # Get user ID from request or current_user
+            user_id = request.user_id or (current_user.get("id") if current_user else None)
         
-        # Get user language preference
-        language = "english"
-        if user_id:
-            conn = get_db_connection()
-            try:
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    # Check if language column exists first
-                    cur.execute("""
-                        SELECT column_name 
-                        FROM information_schema.columns 
-                        WHERE table_name = 'users' AND column_name = 'language'
-                    """)
-                    if cur.fetchone():
-                        # Column exists, query it
-                        cur.execute(
-                            "SELECT language FROM users WHERE id = %s",
-                            (user_id,)
-                        )
-                        user = cur.fetchone()
-                        if user and user.get("language"):
-                            language = user.get("language")
-                    # If column doesn't exist, use default "english"
-            except Exception as e:
-                print(f"Warning: Could not fetch user language: {e}")
-                # Use default language
-            finally:
-                conn.close()
-        
-        # Create agent with language support
-        agent = create_agent(language=language)
+            # Resolve the learner profile (cached) before the run, so the agent
+            # gets it in its instructions instead of spending a tool round trip
+            with timed_stage("profile"):
+                profile = await resolve_profile(user_id)
+            language = profile.language or "english"
+            context = TutorContext(user_id=user_id, profile=profile)
         
-        # Get Gemini config
-        config = get_gemini_config()
+            # Get the (cached) agent with language support
+            agent = get_agent(language)
         
-        # Prepare query text - include selected text if provided
-        query_text = request.query
-        if request.selected_text:
-            query_text = f"Context: {request.selected_text}\n\nQuestion: {request.query}"
+            # Get Gemini config
+            config = get_gemini_config()
         
-        # If user_id is available, include it in the query so the agent can use it
-        # The agent will call user_context_tool with the user_id if needed
-        if user_id:
-            # We can't pass metadata directly, but the agent can call user_context_tool
-            # with the user_id. For now, we'll just pass the query text.
-            # The agent's instructions tell it to use user_context_tool when needed.
-            pass
-        
-        # Run the agent with simple string input (no complex message format)
-        # The agents SDK doesn't support metadata content type, so we use plain text
-        result = await Runner.run(
-            agent,
-            input=query_text,  # Simple string input - no metadata format
-            run_config=config
-        )
-        
-        # Extract response
-        # final_output is a property (string), not a method - access without parentheses
-        try:
-            response_text = result.final_output  # Property, not method
-        except AttributeError:
-            # Fallback: try final_output_as or other methods
-            if hasattr(result, 'final_output_as'):
-                response_text = result.final_output_as(str)
-            else:
-                response_text = str(result)
-        
-        # Extract sources from tool calls if available
-        sources = []
-        # Try to extract sources from the result
-        # This is a simplified version - you may need to adjust based on your agent SDK
-        try:
-            if hasattr(result, 'messages'):
-                for msg in result.messages:
-                    # Check if message has tool calls or tool results
-                    if hasattr(msg, 'tool_calls'):
-                        for tool_call in msg.tool_calls:
-                            if hasattr(tool_call, 'function') and tool_call.function.name == 'rag_search_tool':
-                                # Try to get tool result
-                                if hasattr(msg, 'tool_results'):
-                                    for tool_result in msg.tool_results:
-                                        if hasattr(tool_result, 'content'):
-                                            # Parse content if it's a string
-                                            import json
-                                            try:
-                                                content = json.loads(tool_result.content) if isinstance(tool_result.content, str) else tool_result.content
-                                                if isinstance(content, dict) and 'chunks' in content:
-                                                    for chunk in content['chunks']:
-                                                        if chunk.get('chapter_url'):
-                                                            sources.append({
-                                                                'chapter': chunk.get('chapter', ''),
-                                                                'section': chunk.get('section', ''),
-                                                                'url': chunk.get('chapter_url', ''),
-                                                            })
-                                            except:
-                                                pass
-        except Exception as e:
-            print(f"Error extracting sources: {e}")
+            answer = await answer_question(
+                agent,
+                config,
+                context,
+                language,
+                request.query,
+                request.selected_text,
+                seconds=budget.remaining(),
+                session_id=request.session_id,
+            )
         
-        return ChatResponse(
-            response=response_text,
-            sources=sources,
-            session_id=request.session_id
-        )
+            return ChatResponse(
+                response=answer["response"],
+                sources=answer["sources"],
+                session_id=request.session_id
+            )
         
     except Exception as e:
         print(f"Chat error: {e}")
@@ -212,3 +384,93 @@ async def chat_endpoint(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
 
+
+
+# --- Batch questions ---------------------------------------------------------------
+
+# Questions answered at the same time within one batch
+BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "4"))
+# Each question gets its own deadline; batches are not interactive
+BATCH_QUESTION_DEADLINE_SECONDS = float(os.getenv("CHAT_BATCH_QUESTION_DEADLINE_SECONDS", "30"))
+# Accounts allowed to run batches; there is no role column, and an empty list disables batches
+INSTRUCTOR_EMAILS = {
+    email.strip().lower() for email in os.getenv("INSTRUCTOR_EMAILS", "").split(",") if email.strip()
+}
+
+
+def is_instructor(user: Optional[Dict[str, Any]]) -> bool:
+    return bool(user) and (user.get("email") or "").lower() in INSTRUCTOR_EMAILS
+
+
+async def chat_batch_stream(
+    request: ChatBatchRequest,
+    current_user: Dict[str, Any],
+) -> AsyncIterator[bytes]:
+    """
+    Answer a batch of questions, yielding one NDJSON line per question as
+    soon as it finishes, then a summary line.
+
+    The user's profile, agent and model config are resolved once. Identical
+    questions (after normalization) are answered once, and all runs share one
+    tool memo, so equivalent searches across questions are retrieved once.
+    """
+    start = time.monotonic()
+    user_id = current_user["id"]
+    profile = await resolve_profile(user_id)
+    language = profile.language or "english"
+    agent = get_agent(language)
+    config = get_gemini_config()
+    shared_memo = ToolMemo()
+
+    # Deduplicate: normalized (question, selection) -> indices in the request
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for index, question in enumerate(request.questions):
+        key = (normalize_question(question.query), question.selected_text or "")
+        groups.setdefault(key, []).append(index)
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def answer_group(indices: List[int]) -> Tuple[List[int], Dict[str, Any]]:
+        question = request.questions[indices[0]]
+        context = TutorContext(user_id=user_id, profile=profile)
+        context.share_tool_memo(shared_memo)
+        async with semaphore:
+            try:
+                answer = await answer_question(
+                    agent,
+                    config,
+                    context,
+                    language,
+                    question.query,
+                    question.selected_text,
+                    seconds=BATCH_QUESTION_DEADLINE_SECONDS,
+                    session_id=request.session_id,
+                    endpoint="batch",
+                )
+            except Exception as e:
+                print(f"Batch question failed: {e!r}")
+                answer = {"error": str(e)}
+        return indices, answer
+
+    tasks = [asyncio.ensure_future(answer_group(indices)) for indices in groups.values()]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            indices, answer = await finished
+            for index in indices:
+                question = request.questions[index]
+                line = {"index": index, "id": question.id, "query": question.query, **answer}
+                yield (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
+    finally:
+        # Client went away: stop the remaining runs
+        for task in tasks:
+            task.cancel()
+
+    summary = {
+        "done": True,
+        "questions": len(request.questions),
+        "unique_questions": len(groups),
+        "tool_memo": shared_memo.stats,
+        "elapsed_ms": round((time.monotonic() - start) * 1000),
+        "session_id": request.session_id,
+    }
+    yield (json.dumps(summary) + "\n").encode("utf-8")
@@ -0,0 +1,37 @@
+"""
+Request/response models for the chat API.
+
+Kept separate from chat.py so importing them (e.g. in main.py to declare the
+route) doesn't pull in the agent, LLM and vector-store stack.
+"""
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+
+class ChatRequest(BaseModel):
+    query: str
+    session_id: str
+    user_id: Optional[str] = None
+    selected_text: Optional[str] = None
+
+
+class ChatResponse(BaseModel):
+    response: str
+    sources: list
+    session_id: str
+
+
+# Upper bound on questions per /api/chat/batch request
+MAX_BATCH_QUESTIONS = 50
+
+
+class BatchQuestion(BaseModel):
+    query: str
+    id: Optional[str] = None  # Caller's label, echoed back in the result
+    selected_text: Optional[str] = None
+
+
+class ChatBatchRequest(BaseModel):
+    questions: List[BatchQuestion] = Field(min_length=1, max_length=MAX_BATCH_QUESTIONS)
+    session_id: str
+    # No user_id: a batch always runs as the authenticated caller
@@ -0,0 +1,61 @@
+"""
+Personalized chapter digests, served from precomputed artifacts.
+
+Digests are generated offline by chapter_digests.py for each experience
+level and language; this endpoint only picks the variant matching the
+caller's profile and reads it from disk (cached), with no LLM call.
+"""
+from typing import List, Optional
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from chapter_digests import DEFAULT_LANGUAGE, DEFAULT_LEVEL, EXPERIENCE_LEVELS, SERVED_LANGUAGES, load_digest
+
+
+class SectionDigest(BaseModel):
+    section: str
+    summary: str
+
+
+class ChapterDigestResponse(BaseModel):
+    chapter_id: str
+    title: str
+    experience_level: str
+    language: str
+    content_hash: str
+    generated_at: float
+    overview: str
+    sections: List[SectionDigest]
+
+
+def get_chapter_digest(
+    chapter_id: str,
+    current_user: Optional[dict] = None,
+    language: Optional[str] = None,
+    level: Optional[str] = None,
+) -> ChapterDigestResponse:
+    """
+    Digest for the caller's profile; explicit language/level win over it.
+    Explicit values outside the generated levels and languages are a 400;
+    unknown profile values fall back to the defaults.
+    """
+    if language is not None and language.lower() not in SERVED_LANGUAGES:
+        raise HTTPException(status_code=400, detail=f"Unsupported language: {language}")
+    if level is not None and level.lower() not in EXPERIENCE_LEVELS:
+        raise HTTPException(status_code=400, detail=f"Unsupported level: {level}")
+
+    profile = current_user or {}
+    language = (language or profile.get("language") or DEFAULT_LANGUAGE).lower()
+    level = (level or profile.get("experience_level") or DEFAULT_LEVEL).lower()
+    if language not in SERVED_LANGUAGES:
+        language = DEFAULT_LANGUAGE
+    if level not in EXPERIENCE_LEVELS:
+        level = DEFAULT_LEVEL
+
+    try:
+        digest = load_digest(chapter_id, language, level)
+    except ValueError:
+        digest = None  # Chapter ids that can't be a path are never in the manifest
+    if digest is None:
+        raise HTTPException(status_code=404, detail="No digest available for this chapter")
+    return ChapterDigestResponse(**digest)
@@ -2,12 +2,15 @@
 Personalization API endpoints for user profile management.
 """
 import os
-from typing import Optional, List
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Dict, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from datetime import datetime
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from user_profiles import ProfileVersion, invalidate_profile, profile_version, remember_profile_version
 
 router = APIRouter(prefix="/api", tags=["personalization"])
 
@@ -53,20 +56,56 @@ class PersonalizationResponse(BaseModel):
     is_technical: Optional[bool] = None
 
 
-@router.get("/personalization", response_model=PersonalizationResponse)
-async def get_personalization(
-    user_id: Optional[str] = None,
-    current_user: Optional[dict] = None
-):
-    """
-    Get user personalization settings.
-    """
-    # Use user_id from query or current_user
-    actual_user_id = user_id or (current_user.get("id") if current_user else None)
-    
-    if not actual_user_id:
-        raise HTTPException(status_code=400, detail="User ID is required")
-    
+# Browsers keep the profile but revalidate on every use; a matching ETag is a
+# 304 answered from the in-process version map (see user_profiles.py)
+PERSONALIZATION_CACHE_CONTROL = "private, no-cache"
+
+
+def _settings_from_row(user_id: str, user_dict: dict) -> Tuple[PersonalizationResponse, ProfileVersion]:
+    settings = PersonalizationResponse(
+        experience_level=user_dict.get("experience_level"),
+        background=user_dict.get("background"),
+        language=user_dict.get("language") or "english",
+        is_technical=user_dict.get("is_technical")
+    )
+    version = profile_version(user_id, settings.model_dump(), user_dict.get("updated_at"))
+    remember_profile_version(user_id, version)
+    return settings, version
+
+
+def version_headers(version: ProfileVersion) -> Dict[str, str]:
+    etag, last_modified = version
+    headers = {"ETag": etag, "Cache-Control": PERSONALIZATION_CACHE_CONTROL}
+    if last_modified is not None:
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def is_not_modified(request: Request, version: ProfileVersion) -> bool:
+    """Whether the client's cached copy (If-None-Match / If-Modified-Since) is current."""
+    etag, last_modified = version
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence; comparison is weak
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag.removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        # HTTP dates have whole-second precision
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def read_personalization(user_id: str) -> Tuple[PersonalizationResponse, ProfileVersion]:
+    """The user's settings and their version, from one users row."""
     conn = get_db_connection()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -76,28 +115,41 @@ async def get_personalization(
                     experience_level,
                     background,
                     language,
-                    is_technical
+                    is_technical,
+                    updated_at
                 FROM users 
                 WHERE id = %s
                 """,
-                (actual_user_id,)
+                (user_id,)
             )
             user = cur.fetchone()
             
             if not user:
                 raise HTTPException(status_code=404, detail="User not found")
             
-            user_dict = dict(user)
-            return PersonalizationResponse(
-                experience_level=user_dict.get("experience_level"),
-                background=user_dict.get("background"),
-                language=user_dict.get("language") or "english",
-                is_technical=user_dict.get("is_technical")
-            )
+            return _settings_from_row(user_id, dict(user))
     finally:
         conn.close()
 
 
+@router.get("/personalization", response_model=PersonalizationResponse)
+async def get_personalization(
+    user_id: Optional[str] = None,
+    current_user: Optional[dict] = None
+):
+    """
+    Get user personalization settings.
+    """
+    # Use user_id from query or current_user
+    actual_user_id = user_id or (current_user.get("id") if current_user else None)
+    
+    if not actual_user_id:
+        raise HTTPException(status_code=400, detail="User ID is required")
+    
+    settings, _ = read_personalization(actual_user_id)
+    return settings
+
+
 @router.put("/personalization", response_model=PersonalizationResponse)
 async def update_personalization(
     update: PersonalizationUpdate,
@@ -151,7 +203,8 @@ async def update_personalization(
                     experience_level,
                     background,
                     language,
-                    is_technical
+                    is_technical,
+                    updated_at
             """
             
             cur.execute(query, values)
@@ -161,13 +214,12 @@ async def update_personalization(
             if not user:
                 raise HTTPException(status_code=404, detail="User not found")
             
-            user_dict = dict(user)
-            return PersonalizationResponse(
-                experience_level=user_dict.get("experience_level"),
-                background=user_dict.get("background"),
-                language=user_dict.get("language") or "english",
-                is_technical=user_dict.get("is_technical")
-            )
+            # The tutor reads profiles from cache; make the change visible now
+            await invalidate_profile(actual_user_id)
+            
+            # Also records the new version for conditional GETs
+            settings, _ = _settings_from_row(actual_user_id, dict(user))
+            return settings
     except HTTPException:
         raise
     except Exception as e:
@@ -0,0 +1,52 @@
+"""
+"See also" sections from the precomputed chunk neighbor graph.
+
+Lookups are dictionary reads on a graph built at index time (see
+neighbor_graph.py); no embedding or vector search happens per request.
+The graph module (numpy) is imported on first use so this module stays
+light. The live collection version comes from the pointer written at
+index time; only trees indexed before that fall back to asking Qdrant
+through the agent stack.
+"""
+import asyncio
+from typing import List, Optional
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+MAX_RELATED = 20
+
+
+class RelatedSection(BaseModel):
+    chapter_id: Optional[str] = None
+    chapter: Optional[str] = None
+    section: Optional[str] = None
+    chapter_url: Optional[str] = None
+    score: float
+
+
+class RelatedResponse(BaseModel):
+    chapter_id: str
+    section: Optional[str] = None
+    related: List[RelatedSection]
+
+
+async def get_related(chapter_id: str, section: Optional[str] = None, limit: int = 5) -> RelatedResponse:
+    """Sections related to a chapter, or to one section of it."""
+    from neighbor_graph import live_collection, load_neighbor_graph
+
+    collection = await asyncio.to_thread(live_collection)
+    if collection is None:
+        from agent import get_collection_version
+        collection = await get_collection_version()
+    graph = await asyncio.to_thread(load_neighbor_graph, collection)
+    if graph is None:
+        raise HTTPException(status_code=503, detail="Related sections are not available; re-index the textbook")
+
+    related = graph.related_sections(chapter_id, section, limit=max(1, min(limit, MAX_RELATED)))
+    if related is None:
+        raise HTTPException(status_code=404, detail="Chapter or section not found")
+    return RelatedResponse(
+        chapter_id=chapter_id,
+        section=section,
+        related=[RelatedSection(**link) for link in related],
+    )
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for the serialization hot paths (see serialization.py).
+
+Compares per-request CPU time of the previous and the current way of
+producing:
+
+- a rag_search_tool result: pydantic models + model_dump() + str(dict) for
+  the model, versus a plain dict + compact JSON text
+- a /api/chat response body: FastAPI's default path for a returned model
+  (response_model re-validation, jsonable_encoder, stdlib json) versus
+  fast_json_response (with and without gzip)
+
+Uses synthetic but realistically sized data (a long Markdown answer with
+five cited chunks). Needs no database, LLM or Qdrant.
+
+Usage:
+    python benchmark_serialization.py [--requests 2000]
+"""
+import argparse
+import time
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from starlette.requests import Request
+
+from agent import RagSearchResponse, RetrievedChunk, _search_response
+from app.api.chat_models import ChatResponse
+from serialization import dumps_text, fast_json_response, orjson
+
+SENTENCE = "The zero moment point keeps a humanoid's center of pressure inside its support polygon. "
+
+
+def sample_chunks() -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": index,
+            "content": SENTENCE * 10,
+            "chapter": f"Chapter {index + 1}: Bipedal Locomotion",
+            "section": "Balance and Stability",
+            "chapter_url": f"/docs/chapter-{index + 1}",
+            "score": 0.83 - index * 0.04,
+        }
+        for index in range(5)
+    ]
+
+
+def sample_answer() -> Dict[str, Any]:
+    return {
+        "response": "**Reasoned Explanation**\n\n" + SENTENCE * 45,
+        "sources": [{key: value for key, value in chunk.items() if key != "id"} for chunk in sample_chunks()],
+        "session_id": "session-123",
+    }
+
+
+def cpu_per_call(fn: Callable[[], Any], n: int) -> float:
+    """Process CPU time per call in microseconds."""
+    for _ in range(min(n, 50)):
+        fn()  # Warm-up
+    start = time.process_time()
+    for _ in range(n):
+        fn()
+    return (time.process_time() - start) / n * 1e6
+
+
+def tool_result_before(chunks: List[Dict[str, Any]]) -> str:
+    result = RagSearchResponse(
+        query="what is the zero moment point",
+        chunks=[RetrievedChunk(**chunk) for chunk in chunks],
+        total_results=len(chunks),
+        user_selected_text_included=False,
+    ).model_dump()
+    return str(result)  # What the agents SDK sends the model for a dict
+
+
+def tool_result_after(chunks: List[Dict[str, Any]]) -> str:
+    return dumps_text(_search_response("what is the zero moment point", None, chunks))
+
+
+def chat_response_before(answer: ChatResponse) -> bytes:
+    validated = ChatResponse.model_validate(answer.model_dump())  # response_model pass
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def chat_response_after(answer: ChatResponse, request: Request) -> bytes:
+    return fast_json_response(answer.model_dump(), request).body
+
+
+def fake_request(accept_encoding: str) -> Request:
+    return Request({"type": "http", "headers": [(b"accept-encoding", accept_encoding.encode())]})
+
+
+def main(requests: int) -> None:
+    chunks = sample_chunks()
+    print(f"JSON encoder: {'orjson' if orjson else 'stdlib json (install orjson for the fast path)'}")
+    print(f"{requests} iterations each; process CPU per call\n")
+
+    before = cpu_per_call(lambda: tool_result_before(chunks), requests)
+    after = cpu_per_call(lambda: tool_result_after(chunks), requests)
+    print("rag_search_tool result")
+    print(f"  before  {before:8.1f} us   {len(tool_result_before(chunks)):6d} chars")
+    print(f"  after   {after:8.1f} us   {len(tool_result_after(chunks)):6d} chars   ({before / after:.1f}x)\n")
+
+    answer = ChatResponse(**sample_answer())
+    plain, gzipped = fake_request("identity"), fake_request("gzip")
+    baseline = cpu_per_call(lambda: chat_response_before(answer), requests)
+    fast = cpu_per_call(lambda: chat_response_after(answer, plain), requests)
+    compressed = cpu_per_call(lambda: chat_response_after(answer, gzipped), requests)
+    print("/api/chat response body")
+    print(f"  before         {baseline:8.1f} us   {len(chat_response_before(answer)):6d} bytes")
+    print(f"  after          {fast:8.1f} us   {len(chat_response_after(answer, plain)):6d} bytes   ({baseline / fast:.1f}x)")
+    print(f"  after + gzip   {compressed:8.1f} us   {len(chat_response_after(answer, gzipped)):6d} bytes on the wire")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark JSON serialization on the hot paths.")
+    parser.add_argument("--requests", type=int, default=2000)
+    main(parser.parse_args().requests)
@@ -0,0 +1,311 @@
+"""
+Two-tier cache for query embeddings and final tutor answers.
+
+    tier 1: in-process LRU (microseconds, lost on restart)
+    tier 2: persistent shared store, either Redis (REDIS_URL, shared across
+            replicas) or the local SQLite file from shared_cache.py (shared
+            across workers on one host, survives restarts; used in tests/dev)
+
+Keys are versioned (cache format, embedding model, collection version,
+language ...) so a model change or re-index never serves stale entries.
+Concurrent misses for the same key are collapsed into one computation
+(in-process single-flight plus a short lock entry in the shared tier), and
+entries past their fresh TTL are served stale while one caller refreshes
+them in the background.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import struct
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from deadline import stage_timeout
+from shared_cache import SharedCache
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite")  # sqlite | redis | memory
+REDIS_URL = os.getenv("REDIS_URL", "")
+CACHE_KEY_VERSION = "v1"  # Bump when the stored value format changes
+LRU_MAX_ENTRIES = int(os.getenv("CACHE_LRU_MAX_ENTRIES", "2048"))
+# How long a computing caller holds the shared lock, and how long others wait
+# (at most; never past the request budget)
+LOCK_TTL = 30.0
+LOCK_WAIT_SECONDS = 10.0
+LOCK_POLL_INTERVAL = 0.1
+
+_ENVELOPE = struct.Struct("!d")  # fresh_until timestamp prefix
+
+
+# --- Codecs ----------------------------------------------------------------------
+
+def encode_json(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+def decode_json(data: bytes) -> Any:
+    return json.loads(data)
+
+
+def encode_vector(value: Any) -> bytes:
+    return array("f", value).tobytes()
+
+
+def decode_vector(data: bytes) -> Any:
+    return array("f", data).tolist()
+
+
+def make_key(namespace: str, *parts: Any) -> str:
+    """Build a versioned cache key; long/free-text parts are hashed."""
+    digest = hashlib.sha256(json.dumps(parts, default=str).encode("utf-8")).hexdigest()
+    return f"{namespace}:{CACHE_KEY_VERSION}:{digest}"
+
+
+# --- Shared tier backends ----------------------------------------------------------
+
+class SqliteBackend:
+    """
+    Async facade over the local SQLite store. Calls run in worker threads:
+    a write lock held by another process can block for the busy timeout.
+    """
+
+    def __init__(self, store: Optional[SharedCache] = None):
+        self.store = store or SharedCache()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self.store.get, key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await asyncio.to_thread(self.store.set, key, value, ttl)
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return await asyncio.to_thread(self.store.add, key, value, ttl)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self.store.delete, key)
+
+
+class RedisBackend:
+    """Shared tier on any Redis-protocol server (Redis, Valkey, KeyDB, ...)."""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis  # Optional dependency, only needed here
+        self.client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.client.set(key, value, px=int(ttl * 1000))
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return bool(await self.client.set(key, value, px=int(ttl * 1000), nx=True))
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(key)
+
+
+def create_backend():
+    """Shared tier selected by CACHE_BACKEND; None means LRU only."""
+    if CACHE_BACKEND == "redis":
+        if not REDIS_URL:
+            print("WARNING: CACHE_BACKEND=redis but REDIS_URL is not set; using SQLite")
+            return SqliteBackend()
+        try:
+            return RedisBackend(REDIS_URL)
+        except ImportError:
+            print("WARNING: redis package not installed; using SQLite cache backend")
+            return SqliteBackend()
+    if CACHE_BACKEND == "sqlite":
+        return SqliteBackend()
+    return None
+
+
+# --- Two-tier cache ----------------------------------------------------------------
+
+class TwoTierCache:
+    """
+    LRU in front of a shared backend, with single-flight and stale-while-revalidate.
+
+    Args:
+        name: Label used in stats and lock keys.
+        ttl: Seconds an entry is fresh.
+        stale_ttl: Extra seconds a stale entry may be served while refreshing.
+        encode/decode: Convert values to and from bytes for the shared tier.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        stale_ttl: float = 0.0,
+        encode: Callable[[Any], bytes] = encode_json,
+        decode: Callable[[bytes], Any] = decode_json,
+        backend: Any = "default",
+        max_entries: int = LRU_MAX_ENTRIES,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.encode = encode
+        self.decode = decode
+        self._backend = backend
+        self.max_entries = max_entries
+        # key -> (value, fresh_until, expires_at)
+        self._lru: "OrderedDict[str, Tuple[Any, float, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"lru_hits": 0, "shared_hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0}
+
+    @property
+    def backend(self):
+        # Resolved lazily so importing this module never opens files/sockets
+        if self._backend == "default":
+            self._backend = create_backend()
+        return self._backend
+
+    # -- tier helpers --
+
+    def _lru_get(self, key: str) -> Optional[Tuple[Any, float]]:
+        entry = self._lru.get(key)
+        if entry is None:
+            return None
+        value, fresh_until, expires_at = entry
+        if expires_at <= time.time():
+            del self._lru[key]
+            return None
+        self._lru.move_to_end(key)
+        return value, fresh_until
+
+    def _lru_put(self, key: str, value: Any, fresh_until: float) -> None:
+        self._lru[key] = (value, fresh_until, fresh_until + self.stale_ttl)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    async def _shared_get(self, key: str) -> Optional[Tuple[Any, float]]:
+        if not self.backend:
+            return None
+        try:
+            data = await self.backend.get(key)
+        except Exception as e:
+            print(f"Warning: {self.name} cache read failed: {e}")
+            return None
+        if not data:
+            return None
+        (fresh_until,) = _ENVELOPE.unpack_from(data)
+        return self.decode(data[_ENVELOPE.size:]), fresh_until
+
+    async def _lookup(self, key: str) -> Optional[Tuple[Any, float]]:
+        entry = self._lru_get(key)
+        if entry is not None:
+            self.stats["lru_hits"] += 1
+            return entry
+        entry = await self._shared_get(key)
+        if entry is not None:
+            self.stats["shared_hits"] += 1
+            self._lru_put(key, *entry)
+        return entry
+
+    # -- public API --
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Return a cached value (fresh or stale), or None."""
+        entry = await self._lookup(key)
+        return entry[0] if entry else None
+
+    async def set(self, key: str, value: Any) -> None:
+        fresh_until = time.time() + self.ttl
+        self._lru_put(key, value, fresh_until)
+        if self.backend:
+            try:
+                data = _ENVELOPE.pack(fresh_until) + self.encode(value)
+                await self.backend.set(key, data, self.ttl + self.stale_ttl)
+            except Exception as e:
+                print(f"Warning: {self.name} cache write failed: {e}")
+
+    async def delete(self, key: str) -> None:
+        self._lru.pop(key, None)
+        if self.backend:
+            try:
+                await self.backend.delete(key)
+            except Exception as e:
+                print(f"Warning: {self.name} cache delete failed: {e}")
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        Return the cached value for `key`, computing it on a miss.
+
+        Stale entries are returned immediately and refreshed in the background.
+        Only one caller per process computes a given key at a time. A computed
+        value is stored unless it is None or `cacheable(value)` is false.
+        """
+        entry = await self._lookup(key)
+        if entry is not None:
+            value, fresh_until = entry
+            if fresh_until <= time.time() and key not in self._inflight:
+                self.stats["stale_hits"] += 1
+                self.stats["refreshes"] += 1
+                self._start(key, compute, cacheable)
+            return value
+
+        self.stats["misses"] += 1
+        future = self._inflight.get(key) or self._start(key, compute, cacheable)
+        return await asyncio.shield(future)
+
+    def _start(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> asyncio.Future:
+        future = asyncio.ensure_future(self._compute(key, compute, cacheable))
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Background refreshes may fail without anyone awaiting them
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return future
+
+    async def _compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        lock_key = f"lock:{key}"
+        locked = False
+        if self.backend:
+            try:
+                locked = await self.backend.add(lock_key, b"1", LOCK_TTL)
+                held_elsewhere = not locked
+            except Exception as e:
+                # Shared tier unavailable: nobody can be waited for, just compute
+                print(f"Warning: {self.name} cache lock failed: {e}")
+                held_elsewhere = False
+            if held_elsewhere:
+                # Another process is computing it; wait briefly for its result,
+                # within what's left of the request budget (the task inherits it)
+                deadline = time.time() + stage_timeout(LOCK_WAIT_SECONDS)
+                while time.time() < deadline:
+                    await asyncio.sleep(LOCK_POLL_INTERVAL)
+                    entry = await self._shared_get(key)
+                    if entry is not None and entry[1] > time.time():
+                        self._lru_put(key, *entry)
+                        return entry[0]
+        try:
+            value = await compute()
+            if value is not None and (cacheable is None or cacheable(value)):
+                await self.set(key, value)
+            return value
+        finally:
+            if self.backend and locked:
+                try:
+                    await self.backend.delete(lock_key)
+                except Exception:
+                    pass
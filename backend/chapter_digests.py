@@ -0,0 +1,301 @@
+"""
+Precomputed, personalized chapter digests.
+
+An offline pipeline summarizes every chapter-*.mdx section by section, once
+per experience level and language, and stores the results as JSON artifacts:
+
+    digests/manifest.json                              chapter -> current hash
+    digests/<chapter_id>/<content_hash>/<language>/<level>.json
+
+The content hash covers the chapter text, the prompt version and the model,
+so re-running the pipeline only regenerates chapters that changed; older
+hashes are pruned once the manifest points at the new one.
+GET /api/chapters/{id}/digest reads these files (cached in memory), so
+serving a digest never involves an LLM call.
+
+Usage:
+    python chapter_digests.py [--languages english,urdu]
+        [--levels beginner,intermediate,advanced] [--chapter chapter-1-...]
+        [--concurrency 2] [--force]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+DIGEST_DIR = Path(os.getenv("CHAPTER_DIGEST_DIR", str(BASE_DIR / "digests")))
+DIGEST_LANGUAGES = os.getenv("DIGEST_LANGUAGES", "english")
+DIGEST_LEVELS = os.getenv("DIGEST_LEVELS", "beginner,intermediate,advanced")
+DIGEST_CONCURRENCY = int(os.getenv("DIGEST_CONCURRENCY", "2"))
+DIGEST_REQUESTS_PER_MINUTE = float(os.getenv("DIGEST_REQUESTS_PER_MINUTE", "10"))
+# Bump when the prompt or artifact format changes to regenerate everything
+DIGEST_PROMPT_VERSION = 1
+# Section text sent to the model is capped to keep prompts bounded
+MAX_SECTION_CHARS = 3000
+SKIPPED_SECTIONS = {"exercises", "references"}
+DEFAULT_LEVEL = "intermediate"
+DEFAULT_LANGUAGE = "english"
+EXPERIENCE_LEVELS = ("beginner", "intermediate", "advanced")
+SERVED_LANGUAGES = {
+    lang.strip().lower() for lang in DIGEST_LANGUAGES.split(",") if lang.strip()
+} | {DEFAULT_LANGUAGE}
+# Path components come from requests and the manifest; never let them leave DIGEST_DIR
+_SAFE_COMPONENT = re.compile(r"^[a-z0-9][a-z0-9_-]*$")
+
+
+# --- Artifact storage (used by the API; stdlib only) ---------------------------------
+
+def manifest_path() -> Path:
+    return DIGEST_DIR / "manifest.json"
+
+
+def digest_path(chapter_id: str, content_hash: str, language: str, level: str) -> Path:
+    parts = [chapter_id.lower(), content_hash.lower(), language.lower(), level.lower()]
+    for part in parts:
+        if not _SAFE_COMPONENT.match(part):
+            raise ValueError(f"Invalid digest path component: {part!r}")
+    return DIGEST_DIR / chapter_id / content_hash / language.lower() / f"{level.lower()}.json"
+
+
+_file_cache: Dict[Path, Tuple[float, Any]] = {}
+
+def _read_json(path: Path, cached: bool = True) -> Optional[Any]:
+    """Parsed JSON file, cached until its mtime changes."""
+    if not cached:
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    entry = _file_cache.get(path)
+    if entry and entry[0] == mtime:
+        return entry[1]
+    data = json.loads(path.read_text(encoding="utf-8"))
+    _file_cache[path] = (mtime, data)
+    return data
+
+
+def load_digest(chapter_id: str, language: str, level: str) -> Optional[Dict[str, Any]]:
+    """
+    The current digest for a chapter and profile. Falls back to the default
+    level (or any generated level), then to the default language, when that
+    variant wasn't generated. Callers validate language and level first
+    (digest_path raises ValueError for anything that isn't a plain name).
+    """
+    entry = (_read_json(manifest_path()) or {}).get(chapter_id)
+    if not entry:
+        return None
+    for lang in (language, DEFAULT_LANGUAGE):
+        for lvl in (level, DEFAULT_LEVEL):
+            digest = _read_json(digest_path(chapter_id, entry["hash"], lang, lvl))
+            if digest:
+                return digest
+        generated = sorted(digest_path(chapter_id, entry["hash"], lang, level).parent.glob("*.json"))
+        if generated:
+            return _read_json(generated[0])
+    return None
+
+
+# --- Generation ----------------------------------------------------------------------
+
+def chapter_sections(file_path: Path) -> Tuple[str, str, List[Dict[str, str]]]:
+    """(chapter_id, title, sections) with level-3+ content folded into its level-2 section."""
+    from index_textbook import clean_markdown, extract_sections, parse_frontmatter
+
+    metadata, body = parse_frontmatter(file_path.read_text(encoding="utf-8"))
+    chapter_id = metadata.get("id", file_path.stem)
+    title = metadata.get("title", file_path.stem.replace("-", " ").title())
+    # Comments inside code blocks would otherwise look like headings
+    body = re.sub(r"```.*?```", "", body, flags=re.DOTALL)
+
+    sections: List[Dict[str, str]] = []
+    for section in extract_sections(body):
+        text = clean_markdown("\n".join(section["content"]))
+        if section["level"] <= 2 or not sections:
+            heading = re.sub(r"^\d+(\.\d+)*\s+", "", section["title"]).strip()
+            sections.append({"section": heading, "text": text})
+        else:
+            sections[-1]["text"] += f"\n\n{section['title']}\n{text}"
+    sections = [
+        s for s in sections
+        if s["section"].lower() not in SKIPPED_SECTIONS and len(s["text"].strip()) >= 50
+    ]
+    return chapter_id, title, sections
+
+
+def chapter_hash(file_path: Path, model: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{DIGEST_PROMPT_VERSION}|{model}|".encode("utf-8"))
+    digest.update(file_path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def digest_prompt(title: str, sections: List[Dict[str, str]]) -> str:
+    parts = [f"Chapter: {title}\n"]
+    for section in sections:
+        parts.append(f"## {section['section']}\n{section['text'][:MAX_SECTION_CHARS]}\n")
+    return "\n".join(parts)
+
+
+def build_digest_agent(language: str, level: str):
+    from agents import Agent, ModelSettings
+    from pydantic import BaseModel
+
+    class SectionSummary(BaseModel):
+        section: str
+        summary: str
+
+    class ChapterDigestOutput(BaseModel):
+        overview: str
+        sections: List[SectionSummary]
+
+    return Agent(
+        name="Chapter Digest Writer",
+        instructions=(
+            "You write study digests of textbook chapters on Physical AI & Humanoid Robotics. "
+            f"The reader is a {level} learner. Write in {language}. "
+            "Give a 2-3 sentence overview of the chapter, then one summary of 2-4 sentences "
+            "for every section, in the given order, using the section headings exactly as given. "
+            "Use only the provided text; match depth and terminology to the reader's level."
+        ),
+        output_type=ChapterDigestOutput,
+        model_settings=ModelSettings(temperature=0.2, max_tokens=2500),
+    )
+
+
+async def generate_digest(
+    chapter_id: str,
+    title: str,
+    sections: List[Dict[str, str]],
+    content_hash: str,
+    language: str,
+    level: str,
+    limiter,
+) -> None:
+    """Generate one (chapter, language, level) digest and write its artifact."""
+    from agents import Runner
+    from geminiconfig import GEMINI_MODEL, get_gemini_config
+    from warm_answer_cache import MAX_ATTEMPTS, RATE_LIMIT_BACKOFF_SECONDS, is_rate_limit_error
+
+    agent = build_digest_agent(language, level)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        await limiter.wait()
+        try:
+            result = await Runner.run(agent, input=digest_prompt(title, sections), run_config=get_gemini_config())
+            break
+        except Exception as e:
+            if attempt == MAX_ATTEMPTS:
+                raise
+            backoff = RATE_LIMIT_BACKOFF_SECONDS * 2 ** (attempt - 1)
+            if is_rate_limit_error(e):
+                print(f"  ⏸️  Rate limited; pausing for {backoff:.0f}s")
+                limiter.back_off(backoff)
+            else:
+                print(f"  ⚠️  Attempt {attempt} failed ({e}); retrying")
+
+    output = result.final_output
+    digest = {
+        "chapter_id": chapter_id,
+        "title": title,
+        "language": language,
+        "experience_level": level,
+        "content_hash": content_hash,
+        "model": GEMINI_MODEL,
+        "generated_at": time.time(),
+        "overview": output.overview,
+        "sections": [s.model_dump() for s in output.sections],
+    }
+    path = digest_path(chapter_id, content_hash, language, level)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(digest, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+
+def update_manifest(chapter_id: str, title: str, content_hash: str) -> None:
+    # Uncached: two updates within one mtime tick would otherwise drop an entry
+    manifest = _read_json(manifest_path(), cached=False) or {}
+    manifest[chapter_id] = {"hash": content_hash, "title": title, "updated_at": time.time()}
+    DIGEST_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = manifest_path().with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(manifest_path())
+    # Older content versions are no longer served
+    for old in (DIGEST_DIR / chapter_id).iterdir():
+        if old.is_dir() and old.name != content_hash:
+            shutil.rmtree(old)
+
+
+async def run_pipeline(args: argparse.Namespace) -> bool:
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path=BASE_DIR / ".env")
+    from geminiconfig import GEMINI_MODEL
+    from index_textbook import BOOK_DOCS_DIR
+    from warm_answer_cache import RateLimiter
+
+    languages = [item.strip() for item in args.languages.split(",") if item.strip()]
+    levels = [item.strip() for item in args.levels.split(",") if item.strip()]
+    chapter_files = sorted(BOOK_DOCS_DIR.glob(f"{args.chapter or 'chapter-*'}.mdx"))
+    if not chapter_files:
+        print(f"❌ No chapter files found in {BOOK_DOCS_DIR}")
+        return False
+
+    limiter = RateLimiter(args.requests_per_minute)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    ok = True
+
+    async def run(job: Tuple[str, str, List[Dict[str, str]], str, str, str]) -> bool:
+        chapter_id, title, sections, content_hash, language, level = job
+        async with semaphore:
+            try:
+                await generate_digest(chapter_id, title, sections, content_hash, language, level, limiter)
+                print(f"  ✅ {chapter_id} [{language}/{level}]")
+                return True
+            except Exception as e:
+                print(f"  ❌ {chapter_id} [{language}/{level}]: {e}")
+                return False
+
+    for chapter_file in chapter_files:
+        chapter_id, title, sections = chapter_sections(chapter_file)
+        content_hash = chapter_hash(chapter_file, GEMINI_MODEL)
+        jobs = [
+            (chapter_id, title, sections, content_hash, language, level)
+            for language in languages
+            for level in levels
+            if args.force or not digest_path(chapter_id, content_hash, language, level).exists()
+        ]
+        if not jobs:
+            print(f"⏭️  {chapter_id}: up to date ({content_hash})")
+            if (_read_json(manifest_path()) or {}).get(chapter_id, {}).get("hash") != content_hash:
+                update_manifest(chapter_id, title, content_hash)
+            continue
+        print(f"📖 {chapter_id}: {len(sections)} sections, {len(jobs)} digests to generate ({content_hash})")
+        results = await asyncio.gather(*(run(job) for job in jobs))
+        if all(results):
+            update_manifest(chapter_id, title, content_hash)
+        else:
+            ok = False  # Keep serving the previous version of this chapter
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate personalized chapter digests.")
+    parser.add_argument("--languages", default=DIGEST_LANGUAGES)
+    parser.add_argument("--levels", default=DIGEST_LEVELS)
+    parser.add_argument("--chapter", help="Only this chapter file stem")
+    parser.add_argument("--concurrency", type=int, default=DIGEST_CONCURRENCY)
+    parser.add_argument("--requests-per-minute", type=float, default=DIGEST_REQUESTS_PER_MINUTE)
+    parser.add_argument("--force", action="store_true", help="Regenerate even if up to date")
+    success = asyncio.run(run_pipeline(parser.parse_args()))
+    if not success:
+        exit(1)
@@ -0,0 +1,229 @@
+"""
+Write-behind log of chat events (questions, latencies, sources, model).
+
+Request handlers call record_chat_event(), which only appends to an
+in-process queue. A background task flushes the queue to the chat_events
+table (migration 0003) with multi-row inserts, once CHAT_EVENT_BATCH_SIZE
+events are waiting or every CHAT_EVENT_FLUSH_INTERVAL seconds, whichever
+comes first. The database round trip never happens on the request path.
+
+The queue is bounded: when Postgres is slow or down, the oldest events are
+dropped (and counted) instead of growing memory. A failed batch is retried
+on the next flush while there is room for it. Events still queued when the
+process stops are flushed on shutdown; in serverless deployments a frozen
+instance flushes on its next invocation.
+
+The data feeds answer-cache warming (which questions are common) and
+capacity planning (where the time goes); see GET /metrics/chat-events for
+the writer's own counters.
+"""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+CHAT_EVENT_LOG_ENABLED = os.getenv("CHAT_EVENT_LOG_ENABLED", "true").lower() in ("1", "true", "yes")
+CHAT_EVENT_QUEUE_MAX = int(os.getenv("CHAT_EVENT_QUEUE_MAX", "5000"))
+CHAT_EVENT_BATCH_SIZE = int(os.getenv("CHAT_EVENT_BATCH_SIZE", "200"))
+CHAT_EVENT_FLUSH_INTERVAL = float(os.getenv("CHAT_EVENT_FLUSH_INTERVAL", "5"))
+# Schema version that created chat_events
+CHAT_EVENTS_MIGRATION = 3
+MAX_QUERY_CHARS = 2000
+
+EVENT_COLUMNS = (
+    "created_at", "endpoint", "session_id", "user_id", "language", "query",
+    "outcome", "model", "total_ms", "stage_ms", "sources",
+)
+
+
+def _insert_batch(conn, events: List[Dict[str, Any]]) -> None:
+    from psycopg2.extras import execute_values
+
+    rows = [
+        (
+            event["created_at"],
+            event["endpoint"],
+            event["session_id"],
+            event["user_id"],
+            event["language"],
+            event["query"],
+            event["outcome"],
+            event["model"],
+            event["total_ms"],
+            json.dumps(event["stage_ms"]),
+            json.dumps(event["sources"], ensure_ascii=False),
+        )
+        for event in events
+    ]
+    with conn.cursor() as cur:
+        execute_values(
+            cur,
+            f"INSERT INTO chat_events ({', '.join(EVENT_COLUMNS)}) VALUES %s",
+            rows,
+            template="(to_timestamp(%s), %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, %s::jsonb)",
+            page_size=len(rows),
+        )
+    conn.commit()
+
+
+class ChatEventLog:
+    """Bounded in-process queue with a background batch writer."""
+
+    def __init__(
+        self,
+        connect=None,
+        max_events: int = CHAT_EVENT_QUEUE_MAX,
+        batch_size: int = CHAT_EVENT_BATCH_SIZE,
+        flush_interval: float = CHAT_EVENT_FLUSH_INTERVAL,
+    ):
+        self.connect = connect
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._conn = None
+        self._disabled_reason: Optional[str] = None
+        self._closing = False
+        self.stats = {"recorded": 0, "written": 0, "dropped": 0, "batches": 0, "failed_batches": 0}
+
+    def record(self, event: Dict[str, Any]) -> None:
+        """Queue an event; never blocks and never raises."""
+        if self._disabled_reason:
+            return
+        if len(self._queue) == self._queue.maxlen:
+            self.stats["dropped"] += 1  # deque drops the oldest
+        self._queue.append(event)
+        self.stats["recorded"] += 1
+        self._ensure_worker()
+        if len(self._queue) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _ensure_worker(self) -> None:
+        if self._closing or (self._worker is not None and not self._worker.done()):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No loop (e.g. a script); flush() writes the queue later
+        self._wakeup = asyncio.Event()
+        self._worker = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while not self._disabled_reason and not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write everything queued, one batch at a time."""
+        while self._queue and not self._disabled_reason:
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception as e:
+                self.stats["failed_batches"] += 1
+                print(f"Warning: chat event flush failed ({len(batch)} events): {e}")
+                room = self._queue.maxlen - len(self._queue)
+                if room >= len(batch):
+                    self._queue.extendleft(reversed(batch))
+                else:
+                    self.stats["dropped"] += len(batch)
+                return
+            self.stats["batches"] += 1
+            self.stats["written"] += len(batch)
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        # Runs in a worker thread; keeps one connection open between flushes
+        if self._conn is None or self._conn.closed:
+            self._conn = self.connect()
+            self._check_schema()
+            if self._disabled_reason:
+                self.stats["dropped"] += len(batch)
+                return
+        try:
+            _insert_batch(self._conn, batch)
+        except Exception:
+            try:
+                self._conn.close()
+            finally:
+                self._conn = None
+            raise
+
+    def _check_schema(self) -> None:
+        from migrate import get_capabilities
+
+        capabilities = get_capabilities(self.connect)
+        if capabilities is not None and capabilities.version < CHAT_EVENTS_MIGRATION:
+            self._disabled_reason = f"schema version {capabilities.version} has no chat_events table"
+            print(f"WARNING: chat event log disabled: {self._disabled_reason}. Run `python migrate.py`.")
+            self._queue.clear()
+
+    async def close(self) -> None:
+        """Flush what's left and stop the writer (application shutdown)."""
+        # Not cancelled: a batch it has popped would be lost mid-write. It
+        # finishes its current flush and exits; the final flush does the rest.
+        self._closing = True
+        if self._worker is not None:
+            self._wakeup.set()
+            await self._worker
+            self._worker = None
+        await self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "queued": len(self._queue),
+            "enabled": CHAT_EVENT_LOG_ENABLED and not self._disabled_reason,
+            "disabled_reason": self._disabled_reason,
+        }
+
+
+def _connect():
+    import psycopg2
+
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise RuntimeError("DATABASE_URL is not set")
+    return psycopg2.connect(database_url, connect_timeout=10)
+
+
+chat_event_log = ChatEventLog(_connect)
+
+
+def record_chat_event(
+    endpoint: str,
+    query: str,
+    outcome: str,
+    total_ms: float,
+    stage_ms: Dict[str, float],
+    sources: List[Dict[str, Any]],
+    model: Optional[str] = None,
+    session_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    language: Optional[str] = None,
+) -> None:
+    """Queue one answered question; outcome is answered, cached, degraded or error."""
+    if not CHAT_EVENT_LOG_ENABLED:
+        return
+    chat_event_log.record({
+        "created_at": time.time(),
+        "endpoint": endpoint,
+        "session_id": session_id,
+        "user_id": user_id,
+        "language": language,
+        "query": query[:MAX_QUERY_CHARS],
+        "outcome": outcome,
+        "model": model,
+        "total_ms": round(total_ms),
+        "stage_ms": {name: round(ms, 1) for name, ms in stage_ms.items()},
+        "sources": sources,
+    })
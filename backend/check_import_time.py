@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Cold-start import budget check for the serverless entry point.
+
+Imports main.py in fresh interpreters with `-X importtime`, takes the median
+cumulative import time of `main`, and fails if it exceeds the budget or if
+any of the heavy agent/LLM modules were imported eagerly.
+
+Usage:
+    python check_import_time.py [--budget-ms 400] [--runs 5]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "400"))
+ENTRY_MODULE = "main"
+
+# Must only be imported on first use, never at cold start
+LAZY_MODULES = ["agents", "openai", "qdrant_client", "httpx", "agent", "app.api.chat"]
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def measure_once() -> Tuple[float, List[str]]:
+    """Import the entry module in a fresh process; return (ms, eager lazy modules)."""
+    probe = (
+        f"import sys, {ENTRY_MODULE}\n"
+        f"print('EAGER:' + ','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {ENTRY_MODULE} failed:\n{result.stderr[-2000:]}")
+
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match and match.group(4) == ENTRY_MODULE and len(match.group(3)) == 1:
+            cumulative_us = int(match.group(2))
+    if cumulative_us is None:
+        raise RuntimeError(f"No importtime entry for '{ENTRY_MODULE}'")
+
+    # main.py prints config warnings, so look for the marker line only
+    eager: List[str] = []
+    for line in result.stdout.splitlines():
+        if line.startswith("EAGER:"):
+            eager = [m for m in line[len("EAGER:"):].split(",") if m]
+    return cumulative_us / 1000, eager
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Fail if cold-start import time regresses.")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_TIME_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    timings = []
+    eager_modules: List[str] = []
+    for _ in range(args.runs):
+        elapsed_ms, eager = measure_once()
+        timings.append(elapsed_ms)
+        eager_modules = eager
+
+    median_ms = statistics.median(timings)
+    print(f"import {ENTRY_MODULE}: median {median_ms:.0f} ms over {args.runs} runs "
+          f"(min {min(timings):.0f}, max {max(timings):.0f}); budget {args.budget_ms:.0f} ms")
+
+    ok = True
+    if eager_modules:
+        print(f"❌ Heavy modules imported at cold start: {', '.join(eager_modules)}")
+        ok = False
+    if median_ms > args.budget_ms:
+        print(f"❌ Import time {median_ms:.0f} ms exceeds budget of {args.budget_ms:.0f} ms")
+        ok = False
+    if ok:
+        print("✅ Cold-start import budget OK")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
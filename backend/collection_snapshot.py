@@ -0,0 +1,279 @@
+"""
+Export / import the textbook collection as a compact local snapshot.
+
+Bootstrapping a new Qdrant (test, staging, a fresh cluster) normally means
+re-parsing every chapter and re-embedding everything through Gemini. A
+snapshot file holds the already-computed points instead:
+
+    manifest.json    collection info, counts and a SHA-256 checksum
+    ids.json         point ids, in the same order as the vector rows
+    vectors.f32      float32 vectors, row-major (stored uncompressed)
+    payloads.json    payloads, deflate-compressed
+
+Import loads the points into a new versioned collection with parallel
+batched upserts and then swaps the alias, exactly like a re-index. A
+snapshot made with another embedding model or dimension than this
+deployment queries with (EMBEDDING_DIMENSION) is refused.
+Snapshots always carry the full chunk text: export fills it in from the
+local content store when the collection has slim payloads, and import
+rebuilds the store when CONTENT_STORE_ENABLED is set. Import also builds
+the neighbor graph (see neighbor_graph.py) from the snapshot's vectors.
+
+Usage:
+    python collection_snapshot.py export textbook.qsnap
+    python collection_snapshot.py import textbook.qsnap [--concurrency 8]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.models import PointStruct
+
+from collection_versions import create_next_version, garbage_collect, resolve_alias, swap_alias
+from neighbor_graph import build_neighbor_graph, mark_live, neighbor_graph_path, remove_neighbor_graph
+from content_store import (
+    CONTENT_STORE_ENABLED,
+    SLIM_PAYLOAD_FIELDS,
+    ContentStore,
+    content_store_path,
+    open_content_store,
+    remove_content_store,
+)
+
+BASE_DIR = Path(__file__).resolve().parent
+ENV_PATH = BASE_DIR / '.env'
+load_dotenv(dotenv_path=ENV_PATH)
+
+QDRANT_URL = os.getenv("QDRANT_URL", "")
+QDRANT_API_KEY = os.getenv("QDRANT_API_KEY", "")
+COLLECTION_NAME = "physical_ai_textbook"
+EMBEDDING_MODEL = "models/text-embedding-004"
+# Must match the size the API embeds queries with (see agent.py)
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "768"))
+
+SNAPSHOT_FORMAT_VERSION = 1
+SCROLL_PAGE_SIZE = 256
+UPSERT_BATCH_SIZE = 256
+DEFAULT_CONCURRENCY = 4
+
+
+def _checksum(ids_bytes: bytes, vectors_bytes: bytes, payloads_bytes: bytes) -> str:
+    digest = hashlib.sha256()
+    for part in (ids_bytes, vectors_bytes, payloads_bytes):
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def write_snapshot(
+    path: Path,
+    ids: List[Any],
+    vectors: np.ndarray,
+    payloads: List[Dict[str, Any]],
+    source_collection: str,
+) -> Dict[str, Any]:
+    """Write points to a snapshot file and return its manifest."""
+    ids_bytes = json.dumps(ids).encode("utf-8")
+    vectors_bytes = np.ascontiguousarray(vectors, dtype=np.float32).tobytes()
+    payloads_bytes = json.dumps(payloads, ensure_ascii=False).encode("utf-8")
+
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "alias": COLLECTION_NAME,
+        "source_collection": source_collection,
+        "embedding_model": EMBEDDING_MODEL,
+        "points": len(ids),
+        "dimension": int(vectors.shape[1]) if len(ids) else 0,
+        "sha256": _checksum(ids_bytes, vectors_bytes, payloads_bytes),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+        archive.writestr("ids.json", ids_bytes, compress_type=zipfile.ZIP_DEFLATED)
+        # Float noise barely compresses; storing keeps import fast
+        archive.writestr("vectors.f32", vectors_bytes, compress_type=zipfile.ZIP_STORED)
+        archive.writestr("payloads.json", payloads_bytes, compress_type=zipfile.ZIP_DEFLATED)
+    return manifest
+
+
+def read_snapshot(path: Path) -> Tuple[Dict[str, Any], List[Any], np.ndarray, List[Dict[str, Any]]]:
+    """Read and verify a snapshot file."""
+    with zipfile.ZipFile(path) as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+        ids_bytes = archive.read("ids.json")
+        vectors_bytes = archive.read("vectors.f32")
+        payloads_bytes = archive.read("payloads.json")
+
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format: {manifest.get('format_version')}")
+    if _checksum(ids_bytes, vectors_bytes, payloads_bytes) != manifest["sha256"]:
+        raise ValueError("Snapshot checksum mismatch; the file is corrupt or was modified")
+
+    ids = json.loads(ids_bytes)
+    vectors = np.frombuffer(vectors_bytes, dtype=np.float32)
+    vectors = vectors.reshape(manifest["points"], manifest["dimension"])
+    payloads = json.loads(payloads_bytes)
+    return manifest, ids, vectors, payloads
+
+
+def incompatibility(manifest: Dict[str, Any]) -> Optional[str]:
+    """Why a snapshot can't serve this deployment's queries, or None."""
+    if manifest.get("embedding_model") != EMBEDDING_MODEL:
+        return f"embedding model {manifest.get('embedding_model')!r}, this deployment uses {EMBEDDING_MODEL!r}"
+    if manifest.get("dimension") != EMBEDDING_DIMENSION:
+        return f"{manifest.get('dimension')}-dim vectors, EMBEDDING_DIMENSION is {EMBEDDING_DIMENSION}"
+    return None
+
+
+def chunks_without_text(payloads: List[Dict[str, Any]]) -> int:
+    """Points whose chunk text is missing (slim payloads with no content store)."""
+    return sum(1 for payload in payloads if not payload.get("content"))
+
+
+async def export_collection(client: AsyncQdrantClient, path: Path) -> bool:
+    """Scroll through the live collection and write it to `path`."""
+    source = await resolve_alias(client, COLLECTION_NAME) or COLLECTION_NAME
+    print(f"Exporting '{source}'...")
+    store = open_content_store(source)
+
+    ids: List[Any] = []
+    vectors: List[List[float]] = []
+    payloads: List[Dict[str, Any]] = []
+    offset = None
+    while True:
+        points, offset = await client.scroll(
+            collection_name=source,
+            limit=SCROLL_PAGE_SIZE,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        stored = store.get_many([point.id for point in points]) if store else {}
+        for point in points:
+            ids.append(point.id)
+            vectors.append(point.vector)
+            payloads.append({**(point.payload or {}), **stored.get(str(point.id), {})})
+        print(f"  {len(ids)} points read", end="\r", flush=True)
+        if offset is None:
+            break
+
+    if not ids:
+        print(f"❌ Collection '{source}' is empty; nothing to export")
+        return False
+    missing = chunks_without_text(payloads)
+    if missing:
+        print(
+            f"❌ {missing} points of '{source}' have no chunk text: the collection has slim payloads "
+            f"and {content_store_path(source)} is missing or incomplete. Export from the host that built it."
+        )
+        return False
+
+    manifest = write_snapshot(path, ids, np.asarray(vectors, dtype=np.float32), payloads, source)
+    size_mb = path.stat().st_size / (1024 * 1024)
+    print(f"\n✅ Wrote {manifest['points']} points ({manifest['dimension']}-dim) to {path} ({size_mb:.1f} MB)")
+    return True
+
+
+async def import_collection(client: AsyncQdrantClient, path: Path, concurrency: int) -> bool:
+    """Load a snapshot into a new version and make it live."""
+    start = time.time()
+    manifest, ids, vectors, payloads = read_snapshot(path)
+    print(f"Snapshot: {manifest['points']} points, {manifest['dimension']}-dim, from '{manifest['source_collection']}'")
+    problem = incompatibility(manifest)
+    if problem:
+        print(f"❌ Snapshot has {problem}; the live alias was not changed")
+        return False
+    missing = chunks_without_text(payloads)
+    if missing:
+        print(f"❌ Snapshot has {missing} points without chunk text; the live alias was not changed")
+        return False
+
+    target = await create_next_version(client, COLLECTION_NAME, manifest["dimension"])
+    print(f"Loading into '{target}' (concurrency {concurrency})...")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def upload(batch_start: int, batch_payloads: List[Dict[str, Any]]) -> None:
+        batch_end = min(batch_start + UPSERT_BATCH_SIZE, len(ids))
+        points = [
+            PointStruct(id=ids[i], vector=vectors[i].tolist(), payload=batch_payloads[i])
+            for i in range(batch_start, batch_end)
+        ]
+        async with semaphore:
+            await client.upsert(collection_name=target, points=points)
+
+    try:
+        # Everything written for `target` is inside the try, so a failure
+        # anywhere leaves no version, store or graph behind
+        build_neighbor_graph(neighbor_graph_path(target), ids, vectors, payloads)
+        point_payloads = payloads
+        if CONTENT_STORE_ENABLED:
+            ContentStore(content_store_path(target)).put_many(zip(ids, payloads))
+            point_payloads = [{field: p.get(field) for field in SLIM_PAYLOAD_FIELDS} for p in payloads]
+        uploads = [
+            asyncio.ensure_future(upload(i, point_payloads)) for i in range(0, len(ids), UPSERT_BATCH_SIZE)
+        ]
+        try:
+            await asyncio.gather(*uploads)
+        finally:
+            # One failed batch stops the rest instead of writing into a
+            # collection that is about to be dropped
+            for task in uploads:
+                task.cancel()
+            await asyncio.gather(*uploads, return_exceptions=True)
+        count_result = await client.count(target, exact=True)
+        if count_result.count != manifest["points"]:
+            raise ValueError(f"expected {manifest['points']} points, found {count_result.count}")
+    except Exception as e:
+        print(f"❌ Import failed ({e}); dropping '{target}'")
+        await client.delete_collection(target)
+        remove_content_store(target)
+        remove_neighbor_graph(target)
+        return False
+
+    await swap_alias(client, COLLECTION_NAME, target)
+    mark_live(target)
+    deleted = await garbage_collect(client, COLLECTION_NAME)
+    for name in deleted:
+        remove_content_store(name)
+        remove_neighbor_graph(name)
+    print(f"✅ Imported {manifest['points']} points in {time.time() - start:.1f}s; alias now points to '{target}'")
+    if deleted:
+        print(f"🧹 Removed old versions: {', '.join(deleted)}")
+    return True
+
+
+async def main(args: argparse.Namespace) -> bool:
+    if not QDRANT_URL:
+        print("❌ QDRANT_URL must be set in .env file")
+        return False
+    client = AsyncQdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY or None)
+    path = Path(args.file)
+    if args.command == "export":
+        return await export_collection(client, path)
+    if not path.exists():
+        print(f"❌ Snapshot file not found: {path}")
+        return False
+    return await import_collection(client, path, args.concurrency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or import the textbook collection.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Dump the live collection to a file")
+    export_parser.add_argument("file")
+    import_parser = subparsers.add_parser("import", help="Load a snapshot file and make it live")
+    import_parser.add_argument("file")
+    import_parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    success = asyncio.run(main(parser.parse_args()))
+    if not success:
+        exit(1)
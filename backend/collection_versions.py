@@ -0,0 +1,111 @@
+"""
+Versioned Qdrant collections behind a stable alias (blue/green indexing).
+
+The agent always queries COLLECTION_NAME ("physical_ai_textbook"), which is a
+Qdrant alias. Each full re-index builds a new physical collection such as
+"physical_ai_textbook_v7"; once it is validated the alias is repointed in a
+single atomic request, so searches never see a half-built index.
+"""
+import re
+from typing import List, Optional
+
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.models import (
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation,
+    Distance,
+    VectorParams,
+)
+
+# Number of versions kept around (the live one plus rollback candidates)
+KEEP_VERSIONS = 2
+
+
+def version_name(alias: str, version: int) -> str:
+    return f"{alias}_v{version}"
+
+
+def _version_of(alias: str, name: str) -> Optional[int]:
+    match = re.fullmatch(rf"{re.escape(alias)}_v(\d+)", name)
+    return int(match.group(1)) if match else None
+
+
+async def list_versions(client: AsyncQdrantClient, alias: str) -> List[int]:
+    """Return the existing version numbers for `alias`, oldest first."""
+    response = await client.get_collections()
+    versions = [_version_of(alias, c.name) for c in response.collections]
+    return sorted(v for v in versions if v is not None)
+
+
+async def resolve_alias(client: AsyncQdrantClient, alias: str) -> Optional[str]:
+    """Return the collection the alias currently points to, if any."""
+    response = await client.get_aliases()
+    for entry in response.aliases:
+        if entry.alias_name == alias:
+            return entry.collection_name
+    return None
+
+
+async def is_legacy_collection(client: AsyncQdrantClient, alias: str) -> bool:
+    """True if a plain (unversioned) collection occupies the alias name."""
+    response = await client.get_collections()
+    return any(c.name == alias for c in response.collections)
+
+
+async def create_next_version(
+    client: AsyncQdrantClient,
+    alias: str,
+    dimension: int,
+) -> str:
+    """Create an empty collection for the next version and return its name."""
+    versions = await list_versions(client, alias)
+    name = version_name(alias, (versions[-1] if versions else 0) + 1)
+    await client.create_collection(
+        collection_name=name,
+        vectors_config=VectorParams(size=dimension, distance=Distance.COSINE),
+    )
+    return name
+
+
+async def swap_alias(client: AsyncQdrantClient, alias: str, collection_name: str) -> None:
+    """
+    Atomically point `alias` at `collection_name`.
+
+    A pre-versioning deployment has a real collection called `alias`; it has to
+    be dropped before the alias can take its name. That is the only step with
+    a (sub-second) gap and it happens once.
+    """
+    if await is_legacy_collection(client, alias):
+        print(f"  ⚠️  Replacing legacy collection '{alias}' with an alias")
+        await client.delete_collection(alias)
+
+    operations = []
+    if await resolve_alias(client, alias):
+        operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias)))
+    operations.append(
+        CreateAliasOperation(
+            create_alias=CreateAlias(collection_name=collection_name, alias_name=alias)
+        )
+    )
+    # Both operations are applied in one request, so readers never see a gap
+    await client.update_collection_aliases(change_aliases_operations=operations)
+
+
+async def garbage_collect(
+    client: AsyncQdrantClient,
+    alias: str,
+    keep: int = KEEP_VERSIONS,
+) -> List[str]:
+    """Delete old versions, never touching the one the alias points to."""
+    live = await resolve_alias(client, alias)
+    versions = await list_versions(client, alias)
+    deleted = []
+    for version in versions[:-keep] if keep > 0 else versions:
+        name = version_name(alias, version)
+        if name == live:
+            continue
+        await client.delete_collection(name)
+        deleted.append(name)
+    return deleted
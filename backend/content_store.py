@@ -0,0 +1,97 @@
+"""
+Local store for chunk text, keyed by Qdrant point id.
+
+With CONTENT_STORE_ENABLED, index_textbook.py writes each chunk's content and
+citation fields to a SQLite file next to the collection version it builds
+(content_store/<collection_version>.sqlite3). Qdrant then only keeps the
+fields used for filtering, so searches can ask for no payload at all and
+fetch the text locally by id instead of pulling kilobytes of JSON per hit.
+
+The store is read-only at serving time. Every worker opens its own
+connection, and files are removed together with their collection version.
+A version with slim payloads is useless without its store: searches on a
+host that lacks the file log an error and fail instead of returning empty
+chunks, and such a collection can't be exported to a snapshot.
+"""
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+CONTENT_STORE_ENABLED = os.getenv("CONTENT_STORE_ENABLED", "false").lower() in ("1", "true", "yes")
+CONTENT_STORE_DIR = Path(os.getenv("CONTENT_STORE_DIR", str(BASE_DIR / "content_store")))
+# What stays in the Qdrant payload when text lives in the store
+SLIM_PAYLOAD_FIELDS = ("book", "chapter_id")
+STORED_FIELDS = ("content", "chapter", "section", "chapter_url", "chapter_id")
+
+
+def content_store_path(collection: str) -> Path:
+    return CONTENT_STORE_DIR / f"{collection}.sqlite3"
+
+
+class ContentStore:
+    """Chunk text and citation fields for one collection version."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per process/thread; connections must not cross a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " id TEXT PRIMARY KEY,"
+                + ", ".join(f" {field} TEXT" for field in STORED_FIELDS)
+                + ")"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def put_many(self, rows: Iterable[Tuple[Any, Dict[str, Any]]]) -> None:
+        placeholders = ", ".join("?" for _ in range(len(STORED_FIELDS) + 1))
+        conn = self._connection()
+        conn.execute("BEGIN")
+        conn.executemany(
+            f"INSERT OR REPLACE INTO chunks (id, {', '.join(STORED_FIELDS)}) VALUES ({placeholders})",
+            [(str(point_id), *(fields.get(f) for f in STORED_FIELDS)) for point_id, fields in rows],
+        )
+        conn.execute("COMMIT")
+
+    def get_many(self, ids: List[Any]) -> Dict[str, Dict[str, Any]]:
+        """Stored fields for the given point ids (missing ids are left out)."""
+        if not ids:
+            return {}
+        placeholders = ", ".join("?" for _ in ids)
+        rows = self._connection().execute(
+            f"SELECT id, {', '.join(STORED_FIELDS)} FROM chunks WHERE id IN ({placeholders})",
+            [str(point_id) for point_id in ids],
+        ).fetchall()
+        return {row[0]: dict(zip(STORED_FIELDS, row[1:])) for row in rows}
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+
+_open_stores: Dict[str, ContentStore] = {}
+
+def open_content_store(collection: str) -> Optional[ContentStore]:
+    """The store built for a collection version, or None if there isn't one."""
+    path = content_store_path(collection)
+    if not path.exists():
+        _open_stores.pop(collection, None)
+        return None
+    if collection not in _open_stores:
+        _open_stores[collection] = ContentStore(path)
+    return _open_stores[collection]
+
+
+def remove_content_store(collection: str) -> None:
+    _open_stores.pop(collection, None)
+    content_store_path(collection).unlink(missing_ok=True)
@@ -0,0 +1,226 @@
+"""
+Context assembly for retrieved textbook chunks.
+
+Turns the raw Qdrant hits from rag_search_tool into a compact context:
+drops low-score hits, diversifies with maximal marginal relevance (MMR),
+strips text repeated between overlapping chunks, compresses each chunk to
+its query-relevant sentences, and trims everything to a token budget
+before it is handed to the model.
+"""
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from context_compression import (
+    CONTEXT_COMPRESSION_RATIO,
+    compress_text,
+    compute_idf,
+    tokenize,
+)
+
+# Configuration (overridable through environment variables)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1800"))
+CONTEXT_MIN_SCORE = float(os.getenv("CONTEXT_MIN_SCORE", "0.45"))
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+# How many extra candidates to fetch from Qdrant per requested chunk
+CONTEXT_CANDIDATE_MULTIPLIER = int(os.getenv("CONTEXT_CANDIDATE_MULTIPLIER", "3"))
+# Share of the budget the user-selected text may use at most
+SELECTED_TEXT_BUDGET_SHARE = 0.4
+
+CHARS_PER_TOKEN = 4  # Rough estimate, good enough for budgeting
+MIN_OVERLAP_CHARS = 40  # Shorter shared spans are treated as coincidence
+MAX_OVERLAP_CHARS = 1000  # index_textbook.CHUNK_OVERLAP is 200, leave headroom
+MIN_CHUNK_TOKENS = 40  # Don't bother appending a tail shorter than this
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate based on character count."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _unit_vectors(candidates: List[Dict[str, Any]]) -> Optional[np.ndarray]:
+    """Row-normalized candidate vectors (zero rows for missing or zero vectors)."""
+    vectors = [candidate.get("vector") for candidate in candidates]
+    dimension = next((len(v) for v in vectors if v), 0)
+    if not dimension:
+        return None
+    matrix = np.zeros((len(candidates), dimension), dtype=np.float32)
+    for row, vector in enumerate(vectors):
+        if vector and len(vector) == dimension:
+            matrix[row] = vector
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def mmr_select(
+    candidates: List[Dict[str, Any]],
+    k: int,
+    lambda_mult: float = CONTEXT_MMR_LAMBDA,
+) -> List[Dict[str, Any]]:
+    """
+    Pick up to k candidates using maximal marginal relevance.
+
+    Each candidate needs a "score" (relevance to the query) and optionally a
+    "vector". Candidates without vectors are only ranked by score. Cosine
+    similarities come from one matrix product over normalized vectors.
+    """
+    if not candidates or k <= 0:
+        return []
+    relevance = np.array([candidate.get("score") or 0.0 for candidate in candidates], dtype=np.float64)
+    unit = _unit_vectors(candidates)
+    has_vector = np.array([bool(candidate.get("vector")) for candidate in candidates])
+    similarity = unit @ unit.T if unit is not None else None
+
+    # Highest similarity to anything selected so far; -inf until there is one
+    redundancy = np.full(len(candidates), -np.inf)
+    available = np.ones(len(candidates), dtype=bool)
+    selected: List[int] = []
+    while len(selected) < min(k, len(candidates)):
+        penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+        values = lambda_mult * relevance - (1 - lambda_mult) * penalty
+        values[~available] = -np.inf
+        best = int(np.argmax(values))
+        selected.append(best)
+        available[best] = False
+        if similarity is not None and has_vector[best]:
+            sims = np.where(has_vector, similarity[best], -np.inf)
+            np.maximum(redundancy, sims, out=redundancy)
+
+    return [candidates[idx] for idx in selected]
+
+
+def _shared_span(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right`."""
+    limit = min(len(left), len(right), MAX_OVERLAP_CHARS)
+    for size in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def strip_overlap(content: str, previous: List[str]) -> str:
+    """
+    Remove text from `content` that is already present in `previous` chunks.
+
+    Handles the CHUNK_OVERLAP seam between adjacent chunks (in either order)
+    as well as chunks fully contained in one that was already selected.
+    """
+    text = content.strip()
+    for other in previous:
+        if not text:
+            break
+        if text in other:
+            return ""
+        # `other` precedes `text` in the source: drop the repeated head
+        head = _shared_span(other, text)
+        if head:
+            text = text[head:].lstrip()
+            continue
+        # `text` precedes `other`: drop the repeated tail
+        tail = _shared_span(text, other)
+        if tail:
+            text = text[:-tail].rstrip()
+    return text
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Trim text to roughly `max_tokens`, preferring a sentence boundary."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    boundary = max(cut.rfind(". "), cut.rfind(".\n"), cut.rfind("\n\n"))
+    if boundary > max_chars // 2:
+        cut = cut[:boundary + 1]
+    return cut.rstrip() + " …"
+
+
+def fuse_candidates(result_lists: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Merge the hits of several sub-queries (multi-query retrieval).
+
+    Hits are deduplicated by point id (falling back to content); each keeps
+    its best score, so a chunk that answers only one part of a compound
+    question still competes on equal terms in MMR selection.
+    """
+    fused: Dict[Any, Dict[str, Any]] = {}
+    for results in result_lists:
+        for candidate in results:
+            key = candidate.get("id") or candidate.get("content")
+            best = fused.get(key)
+            if best is None or (candidate.get("score") or 0.0) > (best.get("score") or 0.0):
+                fused[key] = candidate
+    return sorted(fused.values(), key=lambda c: c.get("score") or 0.0, reverse=True)
+
+
+def assemble_context(
+    candidates: List[Dict[str, Any]],
+    top_k: int,
+    user_selected_text: Optional[str] = None,
+    query: Optional[str] = None,
+    localized_query: Optional[str] = None,
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    min_score: float = CONTEXT_MIN_SCORE,
+    lambda_mult: float = CONTEXT_MMR_LAMBDA,
+    compression_ratio: float = CONTEXT_COMPRESSION_RATIO,
+) -> List[Dict[str, Any]]:
+    """
+    Build the final list of chunks for the model.
+
+    Args:
+        candidates: Qdrant hits as dicts with content, chapter, section,
+            chapter_url, score and (optionally) vector.
+        top_k: Maximum number of retrieved chunks to keep.
+        user_selected_text: Text highlighted by the user; kept first but
+            limited to a share of the budget.
+        query: The search query; when given, chunks are compressed to the
+            sentences most relevant to it (see context_compression).
+        localized_query: The query in the learner's language, used instead
+            of `query` for candidates marked "localized" (translated chunks).
+        token_budget: Approximate token budget for all returned content.
+        min_score: Hits scoring below this are dropped.
+
+    Returns:
+        list of chunk dicts (without vectors), user selection first.
+    """
+    assembled: List[Dict[str, Any]] = []
+    remaining_budget = token_budget
+
+    if user_selected_text:
+        selection_budget = int(token_budget * SELECTED_TEXT_BUDGET_SHARE)
+        selection = truncate_to_tokens(user_selected_text.strip(), selection_budget)
+        assembled.append({
+            "content": selection,
+            "chapter": "User Selection",
+            "section": "Provided Context",
+            "chapter_url": None,
+            "score": 1.0,
+        })
+        remaining_budget -= estimate_tokens(selection)
+
+    relevant = [c for c in candidates if (c.get("score") or 0.0) >= min_score]
+    ordered = mmr_select(relevant, k=top_k, lambda_mult=lambda_mult)
+
+    query_terms = tokenize(query) if query else []
+    localized_terms = tokenize(localized_query) if localized_query else query_terms
+    idf = compute_idf([c.get("content", "") for c in ordered]) if query_terms or localized_terms else {}
+
+    kept_texts: List[str] = []
+    for candidate in ordered:
+        if remaining_budget < MIN_CHUNK_TOKENS:
+            break
+        text = strip_overlap(candidate.get("content", ""), kept_texts)
+        if estimate_tokens(text) < MIN_CHUNK_TOKENS // 2:
+            continue
+        terms = localized_terms if candidate.get("localized") else query_terms
+        text = compress_text(text, terms, idf, compression_ratio)
+        text = truncate_to_tokens(text, remaining_budget)
+        kept_texts.append(candidate.get("content", ""))
+        remaining_budget -= estimate_tokens(text)
+        chunk = {key: value for key, value in candidate.items() if key not in ("vector", "localized")}
+        chunk["content"] = text
+        assembled.append(chunk)
+
+    return assembled
@@ -0,0 +1,150 @@
+"""
+Extractive compression of retrieved chunks.
+
+Chunks are large (index_textbook.CHUNK_SIZE is 5000 characters) and most of
+their sentences are unrelated to the question. This module scores every
+sentence of a chunk against the query with a lexical overlap measure and
+keeps only the best ones, in their original order. It runs locally on the
+CPU and never touches chunk metadata, so chapter/section citations survive.
+
+Line structure is kept: list items are never split into sentences, kept
+pieces stay on their original lines, and chunks containing code or tables
+are passed through whole. Tokens are Unicode words, so translated chunks
+(e.g. Urdu) are compressed against a query in the same language.
+"""
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+# Fraction of sentences to keep per chunk (1.0 disables compression)
+CONTEXT_COMPRESSION_RATIO = float(os.getenv("CONTEXT_COMPRESSION_RATIO", "0.35"))
+MIN_SENTENCES_KEPT = 2
+# Chunks shorter than this are passed through untouched
+MIN_COMPRESSIBLE_CHARS = 600
+# Small boost for a chunk's first sentence, which usually states the topic
+LEAD_SENTENCE_BONUS = 0.15
+
+# Latin and Arabic-script (Urdu full stop, question mark) sentence ends
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?\u06d4\u061f])\s+")
+_TOKEN = re.compile(r"\w+")
+_LIST_ITEM = re.compile(r"^\s*(?:[-*+•]|\d+[.)])\s+")
+# Code blocks, indented code and tables lose their meaning when lines are dropped
+_CODE_OR_TABLE = re.compile(
+    r"^(?:```|~~~|\s*\||(?: {4}|\t)\s*(?!(?:[-*+•]|\d+[.)])\s)\S)", re.MULTILINE
+)
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how in is it its of on or "
+    "that the their this to was what when where which who why will with you "
+    "your i me my we our explain tell about".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords and one-letter tokens removed."""
+    return [
+        _normalize(token)
+        for token in _TOKEN.findall(text.lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+def _normalize(token: str) -> str:
+    """Very light stemming so 'sensors' matches 'sensor'."""
+    for suffix in ("ing", "es", "s"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[: -len(suffix)]
+    return token
+
+
+def split_units(text: str) -> List[Tuple[int, str]]:
+    """
+    (line number, text) pieces of a chunk: the sentences of each prose line,
+    and each list item whole.
+    """
+    units: List[Tuple[int, str]] = []
+    for line_no, line in enumerate(text.splitlines()):
+        if not line.strip():
+            continue
+        if _LIST_ITEM.match(line):
+            units.append((line_no, line.rstrip()))
+            continue
+        units.extend((line_no, piece.strip()) for piece in _SENTENCE_SPLIT.split(line) if piece.strip())
+    return units
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split chunk text into sentences / list items, dropping empty pieces."""
+    return [unit for _, unit in split_units(text)]
+
+
+def score_sentences(
+    sentences: Sequence[str],
+    query_terms: Sequence[str],
+    idf: Dict[str, float],
+) -> List[float]:
+    """Score each sentence by IDF-weighted overlap with the query terms."""
+    query_counts = Counter(query_terms)
+    scores = []
+    for idx, sentence in enumerate(sentences):
+        terms = set(tokenize(sentence))
+        overlap = sum(idf.get(term, 1.0) for term in query_counts if term in terms)
+        # Normalise so long sentences don't win by length alone
+        score = overlap / math.sqrt(len(terms) + 1)
+        if idx == 0:
+            score += LEAD_SENTENCE_BONUS
+        scores.append(score)
+    return scores
+
+
+def compress_text(
+    text: str,
+    query_terms: Sequence[str],
+    idf: Dict[str, float],
+    ratio: float = CONTEXT_COMPRESSION_RATIO,
+) -> str:
+    """Keep the top `ratio` of sentences from `text`, preserving order and lines."""
+    if ratio >= 1.0 or len(text) < MIN_COMPRESSIBLE_CHARS or not query_terms:
+        return text
+    if _CODE_OR_TABLE.search(text):
+        return text
+
+    units = split_units(text)
+    sentences = [unit for _, unit in units]
+    keep = max(MIN_SENTENCES_KEPT, math.ceil(len(sentences) * ratio))
+    if keep >= len(sentences):
+        return text
+
+    scores = score_sentences(sentences, query_terms, idf)
+    ranked = sorted(range(len(sentences)), key=lambda i: scores[i], reverse=True)
+    kept = sorted(ranked[:keep])
+
+    # Mark gaps so the model knows text was elided; a new source line starts a new line
+    lines: List[List[str]] = []
+    previous = -1
+    for idx in kept:
+        line_no = units[idx][0]
+        if previous == -1 or line_no != units[previous][0]:
+            lines.append([])
+        if previous != -1 and idx != previous + 1:
+            lines[-1].append("…")
+        lines[-1].append(sentences[idx])
+        previous = idx
+    return "\n".join(" ".join(parts) for parts in lines)
+
+
+def compute_idf(texts: Sequence[str]) -> Dict[str, float]:
+    """Inverse document frequency over the sentences of the given texts."""
+    document_freq: Counter = Counter()
+    total = 0
+    for text in texts:
+        for sentence in split_sentences(text):
+            document_freq.update(set(tokenize(sentence)))
+            total += 1
+    return {
+        term: math.log((total + 1) / (freq + 0.5))
+        for term, freq in document_freq.items()
+    }
+
@@ -0,0 +1,135 @@
+"""
+End-to-end request deadlines for the chat pipeline.
+
+chat_endpoint opens a RequestBudget (default 8s) that lives in a context
+variable, so every stage downstream — DB lookups, query embedding, Qdrant
+search and each LLM turn — can ask how much time is left and bound its own
+timeout by it instead of using a fixed per-call timeout. The budget also
+collects the textbook references rag_search_tool retrieved, which is what a
+degraded answer is built from when the deadline is about to expire, and the
+time spent per stage (see timed_stage) for the chat event log.
+"""
+import asyncio
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Dict, Iterator, List, Optional
+
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "8"))
+# Time kept back at the end of the budget to build and send a degraded answer
+DEGRADE_RESERVE_SECONDS = 0.3
+# Never give a stage less than this, even if the budget is nearly spent
+MIN_STAGE_TIMEOUT = 0.05
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """
+    A stage didn't finish in time. `budget_limited` is True when the
+    caller's request budget, not the stage's own timeout, set the limit:
+    the stage was cut short rather than being slow.
+    """
+
+    def __init__(self, message: str = "deadline exceeded", budget_limited: bool = False):
+        super().__init__(message)
+        self.budget_limited = budget_limited
+
+
+class RequestBudget:
+    def __init__(self, seconds: float, stage_ms: Optional[Dict[str, float]] = None):
+        self.deadline = time.monotonic() + seconds
+        self.references: List[Dict[str, Any]] = []
+        # Stage name -> milliseconds spent (summed over repeated stages)
+        self.stage_ms: Dict[str, float] = stage_ms if stage_ms is not None else {}
+        self.model: Optional[str] = None  # Model that answered, if an LLM ran
+        # Set when a textbook search failed (deadline, open breaker, Qdrant
+        # error): the answer then says nothing about the textbook and must
+        # not be cached
+        self.retrieval_failed = False
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def add_references(self, chunks: List[Dict[str, Any]]) -> None:
+        """Remember retrieved chunks' citation info (deduplicated)."""
+        for chunk in chunks:
+            reference = {
+                "chapter": chunk.get("chapter") or "",
+                "section": chunk.get("section") or "",
+                "url": chunk.get("chapter_url") or "",
+            }
+            if reference["url"] and reference not in self.references:
+                self.references.append(reference)
+
+
+_current_budget: contextvars.ContextVar[Optional[RequestBudget]] = contextvars.ContextVar(
+    "request_budget", default=None
+)
+
+
+@contextmanager
+def request_deadline(seconds: float = REQUEST_DEADLINE_SECONDS) -> Iterator[RequestBudget]:
+    """
+    Start a request budget for the current task (and tasks it spawns). A
+    budget opened inside another one records stage times into the outer one.
+    """
+    outer = _current_budget.get()
+    budget = RequestBudget(seconds, outer.stage_ms if outer else None)
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+def current_budget() -> Optional[RequestBudget]:
+    return _current_budget.get()
+
+
+@contextmanager
+def timed_stage(name: str) -> Iterator[None]:
+    """Add the time spent in the block to the current budget's stage_ms."""
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        budget = _current_budget.get()
+        if budget is not None:
+            budget.stage_ms[name] = budget.stage_ms.get(name, 0.0) + (time.monotonic() - start) * 1000
+
+
+def stage_timeout(default: float, reserve: float = 0.0) -> float:
+    """
+    Timeout for a stage: its usual `default`, capped by what's left of the
+    request budget minus `reserve`. Without a budget, `default` is used.
+    """
+    budget = _current_budget.get()
+    if budget is None:
+        return default
+    return max(MIN_STAGE_TIMEOUT, min(default, budget.remaining() - reserve))
+
+
+async def with_deadline(awaitable: Awaitable[Any], default: float, reserve: float = 0.0) -> Any:
+    """Await with stage_timeout(); raises DeadlineExceeded when it runs out."""
+    timeout = stage_timeout(default, reserve)
+    try:
+        return await asyncio.wait_for(awaitable, timeout=timeout)
+    except asyncio.TimeoutError as e:
+        raise DeadlineExceeded(str(e) or "deadline exceeded", budget_limited=timeout < default) from e
+
+
+def degraded_answer(references: List[Dict[str, Any]]) -> str:
+    """Short fallback answer pointing at the sections retrieved so far."""
+    if not references:
+        return (
+            "Sorry, the tutor couldn't finish an answer in time. "
+            "Please try again in a moment or rephrase your question."
+        )
+    lines = [
+        "Sorry, the tutor couldn't finish a full answer in time. "
+        "These textbook sections look relevant to your question:",
+        "",
+    ]
+    for reference in references:
+        lines.append(f"- **{reference['chapter']}**, {reference['section']} — {reference['url']}")
+    return "\n".join(lines)
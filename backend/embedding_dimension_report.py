@@ -0,0 +1,143 @@
+"""
+Recall-vs-dimension report for choosing EMBEDDING_DIMENSION.
+
+Embeds every textbook chunk once at the full 768 dimensions, uses section
+titles as sample queries, and measures for each candidate size how well
+truncated (Matryoshka-style, as returned by outputDimensionality) vectors
+reproduce the full-size search results.
+
+Usage:
+    python embedding_dimension_report.py [--dims 128 256 384 512 768] [--top-k 5]
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from index_textbook import (
+    BOOK_DOCS_DIR,
+    FULL_EMBEDDING_DIMENSION,
+    GEMINI_API_KEY,
+    generate_embeddings_batch,
+    process_chapter_file,
+)
+
+DEFAULT_DIMENSIONS = [64, 128, 256, 384, 512, 768]
+
+
+def _truncate_normalize(matrix: np.ndarray, dimension: int) -> np.ndarray:
+    """Keep the first `dimension` components and L2-normalise the rows."""
+    reduced = matrix[:, :dimension]
+    norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return reduced / norms
+
+
+def _top_k(queries: np.ndarray, docs: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k most similar documents for each query (cosine)."""
+    scores = queries @ docs.T
+    top = np.argpartition(-scores, kth=min(k, scores.shape[1] - 1), axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+
+def evaluate(
+    doc_vectors: np.ndarray,
+    query_vectors: np.ndarray,
+    query_sections: List[str],
+    doc_sections: List[str],
+    dimensions: List[int],
+    k: int,
+) -> List[Dict[str, float]]:
+    """Compute recall against full-size results and section hit rate per dimension."""
+    full_docs = _truncate_normalize(doc_vectors, FULL_EMBEDDING_DIMENSION)
+    full_queries = _truncate_normalize(query_vectors, FULL_EMBEDDING_DIMENSION)
+    reference = _top_k(full_queries, full_docs, k)
+
+    rows = []
+    for dimension in dimensions:
+        docs = _truncate_normalize(doc_vectors, dimension)
+        queries = _truncate_normalize(query_vectors, dimension)
+
+        start = time.perf_counter()
+        results = _top_k(queries, docs, k)
+        search_ms = (time.perf_counter() - start) * 1000
+
+        overlap = [
+            len(set(found) & set(expected)) / k
+            for found, expected in zip(results, reference)
+        ]
+        section_hits = [
+            any(doc_sections[idx] == section for idx in found)
+            for found, section in zip(results, query_sections)
+        ]
+        rows.append({
+            "dimension": dimension,
+            "recall_vs_full": float(np.mean(overlap)),
+            "section_hit_rate": float(np.mean(section_hits)),
+            "bytes_per_vector": dimension * 4,
+            "search_ms": search_ms,
+        })
+    return rows
+
+
+async def main(dimensions: List[int], k: int) -> bool:
+    if not GEMINI_API_KEY:
+        print("❌ GEMINI_API_KEY must be set in .env file")
+        return False
+
+    chunks = []
+    for chapter_file in sorted(BOOK_DOCS_DIR.glob("chapter-*.mdx")):
+        chunks.extend(process_chapter_file(chapter_file))
+    if not chunks:
+        print(f"❌ No chapter files found in {BOOK_DOCS_DIR}")
+        return False
+
+    doc_sections = [f"{c['chapter_id']}::{c['section']}" for c in chunks]
+    # One query per distinct section: "<section title> (<chapter title>)"
+    queries: Dict[str, str] = {}
+    for chunk, key in zip(chunks, doc_sections):
+        queries.setdefault(key, f"{chunk['section']} ({chunk['chapter']})")
+
+    print(f"\nEmbedding {len(chunks)} chunks and {len(queries)} queries at full size...")
+    doc_vectors = np.asarray(
+        await generate_embeddings_batch(
+            [c["content"] for c in chunks],
+            output_dimensionality=FULL_EMBEDDING_DIMENSION,
+        ),
+        dtype=np.float32,
+    )
+    query_vectors = np.asarray(
+        await generate_embeddings_batch(
+            list(queries.values()),
+            task_type="RETRIEVAL_QUERY",
+            output_dimensionality=FULL_EMBEDDING_DIMENSION,
+        ),
+        dtype=np.float32,
+    )
+
+    rows = evaluate(doc_vectors, query_vectors, list(queries.keys()), doc_sections, dimensions, k)
+
+    print("\n" + "=" * 72)
+    print(f"{'dim':>5} {'recall@' + str(k) + ' vs 768':>16} {'section hit@' + str(k):>16} {'bytes/vec':>10} {'search ms':>10}")
+    for row in rows:
+        print(
+            f"{row['dimension']:>5} {row['recall_vs_full']:>16.3f} {row['section_hit_rate']:>16.3f} "
+            f"{row['bytes_per_vector']:>10} {row['search_ms']:>10.2f}"
+        )
+    print("=" * 72)
+    print("Set EMBEDDING_DIMENSION to the smallest size with acceptable recall, then")
+    print("recreate the collection (init_qdrant_collection.py) and re-index.")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dims", type=int, nargs="+", default=DEFAULT_DIMENSIONS)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+    success = asyncio.run(main(sorted(set(args.dims)), args.top_k))
+    if not success:
+        exit(1)
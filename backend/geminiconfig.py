@@ -1,33 +1,70 @@
+"""
+Gemini (OpenAI-compatible) model configuration for the agents runner.
+
+The OpenAI client and agents SDK are imported and built on first use so that
+importing this module stays cheap on serverless cold starts.
+"""
 from dotenv import load_dotenv
 import os
-from openai import AsyncOpenAI
-from agents import OpenAIChatCompletionsModel, RunConfig 
+from typing import Dict, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from agents import RunConfig
+    from openai import AsyncOpenAI
 
 load_dotenv()
 
 gemini_api_key = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
+_configs: Dict[Tuple[str, Optional[int]], "RunConfig"] = {}
+_client: Optional["AsyncOpenAI"] = None
+
+def get_gemini_client() -> "AsyncOpenAI":
+    """Shared OpenAI-compatible client for Gemini (also used outside the runner)."""
+    global _client
+    if _client is not None:
+        return _client
+
+    if not gemini_api_key:
+        raise ValueError("GEMINI_API_KEY is not set")
 
-if not gemini_api_key:
-    raise ValueError("GEMINI_API_KEY is not set")
+    from openai import AsyncOpenAI
 
-def get_gemini_config() -> RunConfig:
-    client = AsyncOpenAI(
+    _client = AsyncOpenAI(
         api_key=gemini_api_key,
         base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
     )
+    return _client
 
-    model = OpenAIChatCompletionsModel(
-        model="gemini-2.5-flash",
+def get_gemini_config(model: Optional[str] = None, max_tokens: Optional[int] = None) -> "RunConfig":
+    """
+    Run config for a Gemini model (GEMINI_MODEL by default). max_tokens, when
+    given, overrides the agent's output budget (see model_routing).
+    """
+    key = (model or GEMINI_MODEL, max_tokens)
+    if key in _configs:
+        return _configs[key]
+
+    from agents import ModelSettings, RunConfig
+    from model_client import ResilientChatCompletionsModel
+
+    client = get_gemini_client()
+
+    # Each LLM turn is bounded by the remaining request deadline and
+    # fails fast while the Gemini circuit breaker is open
+    resilient_model = ResilientChatCompletionsModel(
+        model=key[0],
         openai_client=client,
     )
 
-    config = RunConfig(
-        model=model,
-        model_provider=client)
+    _configs[key] = RunConfig(
+        model=resilient_model,
+        model_provider=client,
+        model_settings=ModelSettings(max_tokens=max_tokens) if max_tokens else None)
 
-    return config
+    return _configs[key]
 
 if __name__ == "__main__":
     config = get_gemini_config()
     print(config)
-
@@ -1,6 +1,12 @@
 """
 Script to index the Physical AI textbook content into Qdrant.
 This script reads MDX chapter files, chunks them, generates embeddings, and uploads to Qdrant.
+
+Indexing is blue/green: chunks go into a new versioned collection
+(e.g. physical_ai_textbook_v7), which is validated and then atomically put
+behind the COLLECTION_NAME alias that the agent queries. Older versions are
+garbage-collected afterwards. Each version also gets a precomputed chunk
+neighbor graph (neighbor_graph.py) for related-section lookups.
 """
 import os
 import re
@@ -10,8 +16,20 @@ from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 from qdrant_client import AsyncQdrantClient
-from qdrant_client.http.models import Distance, VectorParams, PointStruct
+from qdrant_client.http.models import PointStruct
 import httpx
+import numpy as np
+
+from collection_versions import create_next_version, garbage_collect, swap_alias
+from neighbor_graph import build_neighbor_graph, mark_live, neighbor_graph_path, remove_neighbor_graph
+from content_store import (
+    CONTENT_STORE_ENABLED,
+    SLIM_PAYLOAD_FIELDS,
+    STORED_FIELDS,
+    ContentStore,
+    content_store_path,
+    remove_content_store,
+)
 
 # Load environment variables
 BASE_DIR = Path(__file__).resolve().parent
@@ -22,10 +40,13 @@ load_dotenv(dotenv_path=ENV_PATH)
 QDRANT_URL = os.getenv("QDRANT_URL", "")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY", "")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
-COLLECTION_NAME = "physical_ai_textbook"
+COLLECTION_NAME = "physical_ai_textbook"  # Alias pointing at the live version
 BOOK_ID = "physical_ai_humanoid_robotics"
 EMBEDDING_MODEL = "models/text-embedding-004"  # Gemini embedding model
-EMBEDDING_DIMENSION = 768  # Gemini embeddings are 768 dimensions
+FULL_EMBEDDING_DIMENSION = 768  # Native size of text-embedding-004
+# Stored/searched vector size; anything below 768 is requested from the API
+# via outputDimensionality. Must match agent.py and init_qdrant_collection.py.
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", str(FULL_EMBEDDING_DIMENSION)))
 BASE_URL = "https://panaversity-robotics-hackathon.github.io/panaversity-robotics-hackathon"
 
 # Chunking configuration - AGGRESSIVE OPTIMIZATION for speed
@@ -144,7 +165,28 @@ def clean_markdown(text: str) -> str:
     return text.strip()
 
 
-async def generate_embeddings_batch(texts: List[str]) -> List[List[float]]:
+def build_embedding_payload(
+    text: str,
+    task_type: str = "RETRIEVAL_DOCUMENT",
+    output_dimensionality: int = EMBEDDING_DIMENSION,
+) -> Dict[str, Any]:
+    """Build the embedContent request body for a single text."""
+    payload: Dict[str, Any] = {
+        "content": {
+            "parts": [{"text": text}]
+        },
+        "taskType": task_type
+    }
+    if output_dimensionality < FULL_EMBEDDING_DIMENSION:
+        payload["outputDimensionality"] = output_dimensionality
+    return payload
+
+
+async def generate_embeddings_batch(
+    texts: List[str],
+    task_type: str = "RETRIEVAL_DOCUMENT",
+    output_dimensionality: int = EMBEDDING_DIMENSION,
+) -> List[List[float]]:
     """Generate embeddings using Gemini Embedding API via REST."""
     async with httpx.AsyncClient(timeout=120.0) as client:
         embeddings = []
@@ -158,12 +200,7 @@ async def generate_embeddings_batch(texts: List[str]) -> List[List[float]]:
             tasks = []
             for text in batch_texts:
                 url = f"https://generativelanguage.googleapis.com/v1beta/{EMBEDDING_MODEL}:embedContent?key={GEMINI_API_KEY}"
-                payload = {
-                    "content": {
-                        "parts": [{"text": text}]
-                    },
-                    "taskType": "RETRIEVAL_DOCUMENT"
-                }
+                payload = build_embedding_payload(text, task_type, output_dimensionality)
                 tasks.append(client.post(url, json=payload))
             
             # Execute batch requests in parallel
@@ -230,51 +267,112 @@ def process_chapter_file(file_path: Path) -> List[Dict[str, Any]]:
     return chunks
 
 
-async def index_chapters():
-    """Main function to index all chapters."""
-    # Validate environment
-    if not QDRANT_URL or not QDRANT_API_KEY:
-        print("❌ QDRANT_URL and QDRANT_API_KEY must be set in .env file")
+# Payload every point must carry in Qdrant (the rest may live in the content store)
+QDRANT_PAYLOAD_FIELDS = ("content", "chapter", "section", "chapter_url", "chapter_id", "book")
+
+
+async def validate_collection(
+    qdrant_client: AsyncQdrantClient,
+    collection_name: str,
+    expected_points: int,
+    failed_batches: int,
+    sample_chunk: Optional[Dict[str, Any]],
+    content_store: Optional[ContentStore] = None,
+) -> bool:
+    """
+    Check a freshly built version before it goes live: vector dimension,
+    point count, and a sample query whose hits must come from the sample
+    chunk's chapter and carry the expected payload (and stored text).
+    """
+    if failed_batches:
+        print(f"  ❌ {failed_batches} batch(es) failed to embed or upload")
         return False
-    
-    if not GEMINI_API_KEY:
-        print("❌ GEMINI_API_KEY must be set in .env file")
+    if expected_points == 0 or sample_chunk is None:
+        print("  ❌ No chunks were indexed")
         return False
-    
-    # Check if docs directory exists
-    if not BOOK_DOCS_DIR.exists():
-        print(f"❌ Textbook docs directory not found: {BOOK_DOCS_DIR}")
+
+    info = await qdrant_client.get_collection(collection_name)
+    dimension = getattr(info.config.params.vectors, "size", None)
+    if dimension != EMBEDDING_DIMENSION:
+        print(f"  ❌ Vector size mismatch: expected {EMBEDDING_DIMENSION}, collection has {dimension}")
         return False
-    
-    # Initialize clients
-    print("Initializing clients...")
-    qdrant_client = AsyncQdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
-    
-    # Verify collection exists
-    try:
-        await qdrant_client.get_collection(COLLECTION_NAME)
-        print(f"✅ Collection '{COLLECTION_NAME}' exists")
-    except Exception as e:
-        if "doesn't exist" in str(e) or "404" in str(e):
-            print(f"❌ Collection '{COLLECTION_NAME}' doesn't exist. Run init_qdrant_collection.py first")
+
+    count_result = await qdrant_client.count(collection_name, exact=True)
+    if count_result.count != expected_points:
+        print(f"  ❌ Point count mismatch: expected {expected_points}, found {count_result.count}")
+        return False
+
+    # The first chunk's section title should find its own chapter
+    query = f"{sample_chunk['section']} ({sample_chunk['chapter']})"
+    query_vector = (await generate_embeddings_batch([query], task_type="RETRIEVAL_QUERY"))[0]
+    if len(query_vector) != EMBEDDING_DIMENSION:
+        print(f"  ❌ Query embedding has {len(query_vector)} dimensions, expected {EMBEDDING_DIMENSION}")
+        return False
+    result = await qdrant_client.query_points(
+        collection_name=collection_name,
+        query=query_vector,
+        limit=5,
+        with_payload=True,
+    )
+    if not result.points:
+        print(f"  ❌ Sample query '{query}' returned no results")
+        return False
+
+    required = SLIM_PAYLOAD_FIELDS if content_store else QDRANT_PAYLOAD_FIELDS
+    stored = content_store.get_many([str(point.id) for point in result.points]) if content_store else {}
+    for point in result.points:
+        missing = [field for field in required if not (point.payload or {}).get(field)]
+        if content_store:
+            missing += [f"stored {field}" for field in STORED_FIELDS if not stored.get(str(point.id), {}).get(field)]
+        if missing:
+            print(f"  ❌ Point {point.id} is missing {', '.join(missing)}")
             return False
-        else:
-            raise
-    
-    # Find all chapter MDX files
-    chapter_files = sorted(BOOK_DOCS_DIR.glob("chapter-*.mdx"))
-    
-    if not chapter_files:
-        print(f"❌ No chapter files found in {BOOK_DOCS_DIR}")
+    if not any(point.payload.get("chapter_id") == sample_chunk["chapter_id"] for point in result.points):
+        print(f"  ❌ Sample query '{query}' found nothing from {sample_chunk['chapter_id']}")
         return False
-    
-    print(f"\nFound {len(chapter_files)} chapter files")
-    print("=" * 60)
+
+    top = stored.get(str(result.points[0].id)) or result.points[0].payload
+    print(f"  ✅ Validated {expected_points} points; sample query top hit: {top.get('section')}")
+    return True
+
+
+async def discard_version(qdrant_client: AsyncQdrantClient, collection_name: str) -> None:
+    """Delete a version that never went live, with its content store and graph."""
+    try:
+        await qdrant_client.delete_collection(collection_name)
+    except Exception as e:
+        print(f"⚠️  Could not delete '{collection_name}': {e}")
+    remove_content_store(collection_name)
+    remove_neighbor_graph(collection_name)
+
+
+async def build_version(
+    qdrant_client: AsyncQdrantClient,
+    target_collection: str,
+    chapter_files: List[Path],
+) -> Optional[Tuple[int, float]]:
+    """
+    Embed and upload every chapter into `target_collection`, validate it and
+    build its neighbor graph. Returns (chunks, seconds), or None if the
+    version must not go live.
+    """
+    # Chunk text goes to a local store; Qdrant keeps only filter fields
+    content_store: Optional[ContentStore] = None
+    if CONTENT_STORE_ENABLED:
+        remove_content_store(target_collection)
+        content_store = ContentStore(content_store_path(target_collection))
+        print(f"🗄️  Writing chunk text to {content_store.path}")
     
     # Process and index chapters ONE AT A TIME for visible progress
     import time
     start_time = time.time()
     total_chunks = 0
+    failed_batches = 0
+    sample_chunk: Optional[Dict[str, Any]] = None
+    # Everything uploaded, kept for the neighbor graph built at the end
+    graph_ids: List[str] = []
+    graph_vectors: List[List[float]] = []
+    graph_payloads: List[Dict[str, Any]] = []
     
     print(f"\n🚀 Starting indexing (processing chapters one at a time)...")
     print("=" * 60)
@@ -293,6 +391,8 @@ async def index_chapters():
             continue
         
         print(f"  📦 Extracted {len(chunks)} chunks")
+        if sample_chunk is None:
+            sample_chunk = chunks[0]
         
         # Process in batches
         chapter_chunks_uploaded = 0
@@ -309,50 +409,142 @@ async def index_chapters():
                 embeddings = await generate_embeddings_batch(batch_texts)
             except Exception as e:
                 print(f" ❌ Error: {e}")
+                failed_batches += 1
                 continue
             
             # Prepare points
             points = []
+            stored_rows = []
+            full_payloads = []
             for chunk, embedding in zip(batch, embeddings):
                 point_id = str(uuid.uuid4())
+                payload = {
+                    "content": chunk["content"],
+                    "chapter": chunk["chapter"],
+                    "section": chunk["section"],
+                    "chapter_url": chunk["chapter_url"],
+                    "chapter_id": chunk["chapter_id"],
+                    "book": BOOK_ID,
+                }
+                full_payloads.append(payload)
+                if content_store:
+                    stored_rows.append((point_id, payload))
+                    payload = {field: payload[field] for field in SLIM_PAYLOAD_FIELDS}
                 points.append(
                     PointStruct(
                         id=point_id,
                         vector=embedding,
-                        payload={
-                            "content": chunk["content"],
-                            "chapter": chunk["chapter"],
-                            "section": chunk["section"],
-                            "chapter_url": chunk["chapter_url"],
-                            "chapter_id": chunk["chapter_id"],
-                            "book": BOOK_ID,
-                        }
+                        payload=payload,
                     )
                 )
             
             # Upload to Qdrant
             try:
+                if content_store:
+                    content_store.put_many(stored_rows)
                 await qdrant_client.upsert(
-                    collection_name=COLLECTION_NAME,
+                    collection_name=target_collection,
                     points=points
                 )
                 chapter_chunks_uploaded += len(batch)
                 total_chunks += len(batch)
+                graph_ids.extend(str(point.id) for point in points)
+                graph_vectors.extend(embeddings)
+                graph_payloads.extend(full_payloads)
                 chapter_time = time.time() - chapter_start
                 print(f" ✅ ({chapter_time:.1f}s)")
             except Exception as e:
                 print(f" ❌ Upload error: {e}")
+                failed_batches += 1
         
         chapter_total_time = time.time() - chapter_start
         print(f"  ✅ Chapter complete: {chapter_chunks_uploaded} chunks in {chapter_total_time:.1f}s")
     
-    # Get final collection info
+    # Validate the new version before it goes live
     total_time = time.time() - start_time
-    collection_info = await qdrant_client.get_collection(COLLECTION_NAME)
+    if not await validate_collection(
+        qdrant_client, target_collection, total_chunks, failed_batches, sample_chunk, content_store
+    ):
+        print("❌ Validation failed. The live alias was not changed.")
+        return None
+    if content_store and content_store.count() != total_chunks:
+        print(f"❌ Content store has {content_store.count()} chunks, expected {total_chunks}.")
+        return None
+
+    # Related-sections graph for this version (a few seconds even for 10k chunks)
+    graph_start = time.time()
+    build_neighbor_graph(
+        neighbor_graph_path(target_collection),
+        graph_ids,
+        np.asarray(graph_vectors, dtype=np.float32),
+        graph_payloads,
+    )
+    print(f"🕸️  Neighbor graph for {len(graph_ids)} chunks built in {time.time() - graph_start:.1f}s")
+    return total_chunks, total_time
+
+
+async def index_chapters():
+    """Main function to index all chapters."""
+    # Validate environment
+    if not QDRANT_URL or not QDRANT_API_KEY:
+        print("❌ QDRANT_URL and QDRANT_API_KEY must be set in .env file")
+        return False
+    
+    if not GEMINI_API_KEY:
+        print("❌ GEMINI_API_KEY must be set in .env file")
+        return False
+    
+    # Check if docs directory exists
+    if not BOOK_DOCS_DIR.exists():
+        print(f"❌ Textbook docs directory not found: {BOOK_DOCS_DIR}")
+        return False
+    
+    # Initialize clients
+    print("Initializing clients...")
+    qdrant_client = AsyncQdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+    
+    # Find all chapter MDX files
+    chapter_files = sorted(BOOK_DOCS_DIR.glob("chapter-*.mdx"))
+    
+    if not chapter_files:
+        print(f"❌ No chapter files found in {BOOK_DOCS_DIR}")
+        return False
+    
+    print(f"\nFound {len(chapter_files)} chapter files")
+    print("=" * 60)
+
+    # Build into a fresh version; the live alias is untouched until validation
+    target_collection = await create_next_version(qdrant_client, COLLECTION_NAME, EMBEDDING_DIMENSION)
+    print(f"🆕 Building new version '{target_collection}' ({EMBEDDING_DIMENSION}-dim vectors)")
+    try:
+        result = await build_version(qdrant_client, target_collection, chapter_files)
+    except BaseException as e:
+        # Crashed or interrupted mid-build: don't leave an orphaned version behind
+        print(f"\n❌ Indexing failed ({e!r}); dropping '{target_collection}'")
+        await discard_version(qdrant_client, target_collection)
+        raise
+    if result is None:
+        print(f"🗑️  Dropping '{target_collection}'")
+        await discard_version(qdrant_client, target_collection)
+        return False
+    total_chunks, total_time = result
+
+
+    # Atomically repoint the alias, then clean up old versions
+    await swap_alias(qdrant_client, COLLECTION_NAME, target_collection)
+    mark_live(target_collection)
+    print(f"🔀 Alias '{COLLECTION_NAME}' now points to '{target_collection}'")
+    deleted = await garbage_collect(qdrant_client, COLLECTION_NAME)
+    for name in deleted:
+        remove_content_store(name)
+        remove_neighbor_graph(name)
+    if deleted:
+        print(f"🧹 Removed old versions: {', '.join(deleted)}")
+
     print("\n" + "=" * 60)
     print(f"✅ Indexing complete!")
     print(f"   Total time: {total_time:.1f}s ({total_time/60:.1f} minutes)")
-    print(f"   Total points in collection: {collection_info.points_count}")
+    print(f"   Live collection: {target_collection}")
     print(f"   Chapters indexed: {len(chapter_files)}")
     print(f"   Total chunks uploaded: {total_chunks}")
     if total_time > 0:
@@ -360,7 +552,6 @@ async def index_chapters():
     
     return True
 
-
 if __name__ == "__main__":
     print("Physical AI Textbook Indexing Script")
     print("=" * 60)
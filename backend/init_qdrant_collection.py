@@ -1,13 +1,15 @@
 """
 Script to initialize the Qdrant collection for the Physical AI textbook.
-This creates an empty collection that can be populated with textbook content later.
+This creates an empty first version (physical_ai_textbook_v1) behind the
+physical_ai_textbook alias; index_textbook.py builds later versions.
 """
 import os
 import asyncio
 from pathlib import Path
 from dotenv import load_dotenv
 from qdrant_client import AsyncQdrantClient
-from qdrant_client.http.models import Distance, VectorParams
+
+from collection_versions import create_next_version, swap_alias
 
 # Load environment variables from .env file
 BASE_DIR = Path(__file__).resolve().parent
@@ -16,8 +18,9 @@ load_dotenv(dotenv_path=ENV_PATH)
 
 QDRANT_URL = os.getenv("QDRANT_URL", "")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY", "")
-COLLECTION_NAME = "physical_ai_textbook"
-EMBEDDING_DIMENSION = 768  # Gemini text-embedding-004 dimension
+COLLECTION_NAME = "physical_ai_textbook"  # Alias; the data lives in versioned collections
+# Gemini text-embedding-004 is 768-dim natively; smaller sizes use outputDimensionality
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "768"))
 
 async def init_collection():
     """Create the Qdrant collection if it doesn't exist."""
@@ -37,22 +40,25 @@ async def init_collection():
             print(f"✅ Collection '{COLLECTION_NAME}' already exists!")
             print(f"   Points count: {collection_info.points_count}")
             print(f"   Vectors count: {collection_info.vectors_count}")
+            existing_dimension = collection_info.config.params.vectors.size
+            if existing_dimension != EMBEDDING_DIMENSION:
+                print(
+                    f"⚠️  Existing vector size {existing_dimension} does not match "
+                    f"EMBEDDING_DIMENSION={EMBEDDING_DIMENSION}."
+                )
+                print("   Run index_textbook.py to build a new version at the configured size.")
+                return False
             return True
         except Exception as e:
             error_msg = str(e)
             if "doesn't exist" in error_msg or "404" in error_msg or "Not found" in error_msg:
-                # Collection doesn't exist, create it
+                # Collection doesn't exist, create the first version behind the alias
                 print(f"Collection '{COLLECTION_NAME}' doesn't exist. Creating it...")
                 
-                await client.create_collection(
-                    collection_name=COLLECTION_NAME,
-                    vectors_config=VectorParams(
-                        size=EMBEDDING_DIMENSION,
-                        distance=Distance.COSINE
-                    )
-                )
+                version = await create_next_version(client, COLLECTION_NAME, EMBEDDING_DIMENSION)
+                await swap_alias(client, COLLECTION_NAME, version)
                 
-                print(f"✅ Collection '{COLLECTION_NAME}' created successfully!")
+                print(f"✅ Collection '{version}' created with alias '{COLLECTION_NAME}'!")
                 print(f"   Vector dimension: {EMBEDDING_DIMENSION}")
                 print(f"   Distance metric: COSINE")
                 print("\n⚠️  Note: The collection is empty. You need to index your textbook content.")
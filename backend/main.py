@@ -2,17 +2,25 @@ import os
 import uuid
 import jwt
 import bcrypt
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from pathlib import Path
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, EmailStr
 from typing import Literal, Optional, Dict, Any
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from psycopg2.pool import SimpleConnectionPool
 
+from migrate import get_capabilities
+from resilience import resilience_metrics
+from serialization import fast_json_response
+from user_profiles import known_profile_version
+from profiling import LOOP_MONITOR_ENABLED, ProfilingMiddleware, is_admin_token, loop_monitor
+
 # Get the directory where this script is located
 BASE_DIR = Path(__file__).resolve().parent
 ENV_PATH = BASE_DIR / '.env'
@@ -56,7 +64,38 @@ def get_db_connection():
         print(f"Database connection error: {e}")
         raise
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    yield
+    await loop_monitor.stop()
+    # Write chat events still queued before the worker exits
+    from chat_events import chat_event_log
+    await chat_event_log.close()
+
+app = FastAPI(lifespan=lifespan)
+
+
+# Base columns returned by get_current_user; optional ones are added once the
+# schema capabilities are known (see current_user_query). Capabilities are
+# detected on first use rather than at startup to keep cold starts DB-free.
+CURRENT_USER_COLUMNS = ["id", "email", "is_technical", "experience_level"]
+_current_user_query: Optional[str] = None
+
+def current_user_query() -> str:
+    """Return the users lookup used by get_current_user, built once per process."""
+    global _current_user_query
+    if _current_user_query is None:
+        columns = list(CURRENT_USER_COLUMNS)
+        capabilities = get_capabilities(get_db_connection)
+        if capabilities is None:
+            # Schema unknown (DB unreachable): use the base shape, retry next time
+            return f"SELECT {', '.join(columns)} FROM users WHERE id = %s"
+        if capabilities.has_user_column("language"):
+            columns.append("language")
+        _current_user_query = f"SELECT {', '.join(columns)} FROM users WHERE id = %s"
+    return _current_user_query
 
 # CORS middleware
 # In production, we read allowed origins from the ALLOWED_ORIGINS env var
@@ -82,8 +121,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Profile-Id"],
 )
 
+# Opt-in per-request sampling profiles (X-Profile header or PROFILE_SAMPLE_RATE)
+app.add_middleware(ProfilingMiddleware)
+
 # Pydantic models
 class SignUpRequest(BaseModel):
     email: EmailStr
@@ -135,6 +178,19 @@ def verify_token(token: str) -> dict:
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+def token_user_id(authorization: Optional[str]) -> Optional[str]:
+    """User id of a valid access token, without a database lookup; None otherwise."""
+    if not authorization:
+        return None
+    token = authorization.replace("Bearer ", "") if authorization.startswith("Bearer ") else authorization
+    try:
+        payload = verify_token(token)
+    except HTTPException:
+        return None
+    if payload.get("type") != "access":
+        return None
+    return payload.get("sub")
+
 # Helper to get current user from Authorization header
 async def get_current_user(authorization: Optional[str] = Header(None)):
     """Get the current authenticated user from the JWT token"""
@@ -160,10 +216,7 @@ async def get_current_user(authorization: Optional[str] = Header(None)):
         conn = get_db_connection()
         try:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(
-                    "SELECT id, email, is_technical, experience_level FROM users WHERE id = %s",
-                    (user_id,)
-                )
+                cur.execute(current_user_query(), (user_id,))
                 user = cur.fetchone()
                 
                 if not user:
@@ -340,8 +393,36 @@ async def health_check():
         "env_exists": ENV_PATH.exists()
     }
 
-# Include API routers
-from app.api import chat, personalization
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """Metrics expose internals (stall stacks, code locations): PROFILE_ADMIN_TOKEN only."""
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/metrics/resilience", dependencies=[Depends(require_admin_token)])
+async def resilience_metrics_endpoint():
+    """Hedge and circuit-breaker counters for upstream calls in this worker"""
+    return resilience_metrics()
+
+@app.get("/metrics/routing", dependencies=[Depends(require_admin_token)])
+async def routing_metrics_endpoint():
+    """Model-tier routing decisions and latencies in this worker"""
+    from model_routing import routing_metrics
+    return routing_metrics()
+
+@app.get("/metrics/event-loop", dependencies=[Depends(require_admin_token)])
+async def event_loop_metrics_endpoint():
+    """Event-loop lag and recent stalls (with the blocking call) in this worker"""
+    return loop_monitor.metrics()
+
+@app.get("/metrics/chat-events", dependencies=[Depends(require_admin_token)])
+async def chat_event_metrics_endpoint():
+    """Write-behind chat event log counters in this worker"""
+    from chat_events import chat_event_log
+    return chat_event_log.metrics()
+
+# Include API routers. The chat module (agent, LLM and Qdrant clients) is
+# imported on the first chat request so auth and health routes stay light.
+from app.api import personalization
 
 # Helper function for optional authentication
 async def get_current_user_optional(authorization: Optional[str] = Header(None)) -> Optional[Dict[str, Any]]:
@@ -359,29 +440,88 @@ async def get_current_user_optional(authorization: Optional[str] = Header(None))
 # app.include_router(personalization.router)
 
 # Override chat endpoint with authenticated version
-from app.api.chat import ChatRequest, ChatResponse
+from app.api.chat_models import ChatRequest, ChatResponse
 @app.post("/api/chat", response_model=ChatResponse, tags=["chat"])
 async def chat_endpoint_authenticated(
     request: ChatRequest,
+    http_request: Request,
     authorization: Optional[str] = Header(None)
 ):
     """Chat endpoint with optional authentication."""
     current_user = await get_current_user_optional(authorization)
-    return await chat.chat_endpoint(request, current_user)
+    from app.api import chat
+    answer = await chat.chat_endpoint(request, current_user)
+    # Already a validated ChatResponse: encode it directly (and compress
+    # long answers) instead of a second response_model pass
+    return fast_json_response(answer.model_dump(), http_request)
+
+from app.api.chat_models import ChatBatchRequest
+@app.post("/api/chat/batch", tags=["chat"])
+async def chat_batch_authenticated(
+    request: ChatBatchRequest,
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Answer many questions at once (e.g. an instructor's quiz set). Results
+    are streamed as NDJSON, one line per question as it completes. Only
+    accounts listed in INSTRUCTOR_EMAILS may run batches, always as
+    themselves.
+    """
+    # Validate the user once for the whole batch
+    current_user = await get_current_user(authorization)
+    from app.api import chat
+    if not chat.is_instructor(current_user):
+        raise HTTPException(status_code=403, detail="Batch questions are limited to instructors")
+    return StreamingResponse(
+        chat.chat_batch_stream(request, current_user),
+        media_type="application/x-ndjson",
+    )
+
+from app.api import related
+from app.api.related import RelatedResponse
+@app.get("/api/related", response_model=RelatedResponse, tags=["related"])
+async def related_sections(chapter_id: str, section: Optional[str] = None, limit: int = 5):
+    """Related textbook sections, from the precomputed neighbor graph."""
+    return await related.get_related(chapter_id, section, limit)
+
+from app.api import digests
+from app.api.digests import ChapterDigestResponse
+@app.get("/api/chapters/{chapter_id}/digest", response_model=ChapterDigestResponse, tags=["chapters"])
+async def chapter_digest(
+    chapter_id: str,
+    language: Optional[str] = None,
+    level: Optional[str] = None,
+    authorization: Optional[str] = Header(None)
+):
+    """Precomputed chapter digest matching the caller's experience level and language."""
+    current_user = await get_current_user_optional(authorization)
+    return digests.get_chapter_digest(chapter_id, current_user, language, level)
 
 # Override personalization endpoints with authenticated versions
 from app.api.personalization import PersonalizationUpdate, PersonalizationResponse
 @app.get("/api/personalization", response_model=PersonalizationResponse)
 async def get_personalization_authenticated(
+    http_request: Request,
     user_id: Optional[str] = None,
     authorization: Optional[str] = Header(None)
 ):
-    """Get personalization with authentication."""
-    current_user = await get_current_user_optional(authorization)
-    actual_user_id = user_id or (current_user.get("id") if current_user else None)
+    """
+    Get personalization with authentication. Supports conditional requests:
+    a client revalidating an unchanged profile gets 304 Not Modified.
+    """
+    # The token is verified without loading the user: the settings read
+    # below is the only database access, and a 304 needs none
+    actual_user_id = user_id or token_user_id(authorization)
     if not actual_user_id:
         raise HTTPException(status_code=401, detail="Authentication required")
-    return await personalization.get_personalization(actual_user_id, current_user)
+    version = known_profile_version(actual_user_id)
+    if version and personalization.is_not_modified(http_request, version):
+        return Response(status_code=304, headers=personalization.version_headers(version))
+    settings, version = personalization.read_personalization(actual_user_id)
+    headers = personalization.version_headers(version)
+    if personalization.is_not_modified(http_request, version):
+        return Response(status_code=304, headers=headers)
+    return fast_json_response(settings.model_dump(), http_request, headers=headers)
 
 @app.put("/api/personalization", response_model=PersonalizationResponse)
 async def update_personalization_authenticated(
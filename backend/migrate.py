@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations and startup capability detection for Neon Postgres.
+
+Migrations live in migrations/NNNN_name.sql and are applied in order, each in
+its own transaction. The applied versions are recorded in schema_migrations.
+
+At application startup, detect_capabilities() reads the schema version and the
+columns of the users table once; request handlers use the cached result to
+pick their query shape instead of probing information_schema per request.
+
+Usage:
+    python migrate.py           # apply pending migrations
+    python migrate.py --status  # show applied / pending versions
+"""
+import argparse
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+BASE_DIR = Path(__file__).resolve().parent
+ENV_PATH = BASE_DIR / '.env'
+MIGRATIONS_DIR = BASE_DIR / "migrations"
+
+# Arbitrary key so concurrent deploys don't apply migrations twice
+MIGRATION_LOCK_ID = 727001
+
+_MIGRATION_FILE = re.compile(r"^(\d{4})_([\w-]+)\.sql$")
+
+
+class SchemaCapabilities(BaseModel):
+    version: int
+    users_columns: List[str]
+
+    def has_user_column(self, column: str) -> bool:
+        return column in self.users_columns
+
+
+def available_migrations() -> List[Tuple[int, str, Path]]:
+    """Return (version, name, path) for every migration file, in order."""
+    migrations = []
+    for path in MIGRATIONS_DIR.glob("*.sql"):
+        match = _MIGRATION_FILE.match(path.name)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), path))
+    return sorted(migrations)
+
+
+LATEST_VERSION = max((version for version, _, _ in available_migrations()), default=0)
+
+
+def _ensure_migrations_table(cur) -> None:
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(conn) -> List[int]:
+    with conn.cursor() as cur:
+        _ensure_migrations_table(cur)
+        cur.execute("SELECT version FROM schema_migrations ORDER BY version")
+        versions = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    return versions
+
+
+def apply_migrations(conn) -> List[int]:
+    """Apply all pending migrations and return the versions applied."""
+    applied = set(applied_versions(conn))
+    newly_applied = []
+    for version, name, path in available_migrations():
+        if version in applied:
+            continue
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            # Another process may have applied it while we waited for the lock
+            cur.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+            if cur.fetchone():
+                conn.commit()
+                continue
+            print(f"Applying {path.name}...")
+            cur.execute(path.read_text(encoding="utf-8"))
+            cur.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (version, name),
+            )
+        conn.commit()
+        newly_applied.append(version)
+    return newly_applied
+
+
+def detect_capabilities(conn) -> SchemaCapabilities:
+    """Read the schema version and the users table columns (startup only)."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name = 'users'
+        """)
+        columns = [row[0] for row in cur.fetchall()]
+        cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+        version = 0
+        if cur.fetchone()[0]:
+            cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+            version = cur.fetchone()[0]
+    conn.commit()
+    return SchemaCapabilities(version=version, users_columns=sorted(columns))
+
+
+# Cached capabilities for the running process (None until detected)
+_capabilities: Optional[SchemaCapabilities] = None
+
+
+def get_capabilities(connect: Callable[[], Any]) -> Optional[SchemaCapabilities]:
+    """
+    Return the cached schema capabilities, detecting them on first use.
+
+    `connect` returns a new DB connection. Failures are not cached, so a
+    database that is briefly unavailable at startup is retried later.
+    """
+    global _capabilities
+    if _capabilities is not None:
+        return _capabilities
+    try:
+        conn = connect()
+    except Exception as e:
+        print(f"Warning: could not detect schema capabilities: {e}")
+        return None
+    try:
+        _capabilities = detect_capabilities(conn)
+        if _capabilities.version < LATEST_VERSION:
+            print(
+                f"WARNING: database schema is at version {_capabilities.version}, "
+                f"latest is {LATEST_VERSION}. Run `python migrate.py`."
+            )
+        return _capabilities
+    except Exception as e:
+        print(f"Warning: could not detect schema capabilities: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def main() -> int:
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv(dotenv_path=ENV_PATH)
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("ERROR: DATABASE_URL not found in .env file")
+        return 1
+
+    parser = argparse.ArgumentParser(description="Apply database schema migrations.")
+    parser.add_argument("--status", action="store_true", help="Show applied and pending migrations")
+    args = parser.parse_args()
+
+    try:
+        print("Connecting to database...")
+        conn = psycopg2.connect(database_url)
+        try:
+            if args.status:
+                applied = set(applied_versions(conn))
+                for version, name, _ in available_migrations():
+                    state = "applied" if version in applied else "pending"
+                    print(f"  {version:04d} {name:<40} {state}")
+                return 0
+
+            newly_applied = apply_migrations(conn)
+            if newly_applied:
+                print(f"✓ Applied migrations: {', '.join(f'{v:04d}' for v in newly_applied)}")
+            else:
+                print("✓ Database schema is up to date")
+            capabilities = detect_capabilities(conn)
+            print(f"Schema version: {capabilities.version}")
+            print(f"users columns: {', '.join(capabilities.users_columns)}")
+        finally:
+            conn.close()
+    except psycopg2.Error as e:
+        print(f"ERROR: Database error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+-- Personalization columns added after the first deployments.
+-- Databases created from 0001 already have them; older ones may not.
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS background TEXT;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS language VARCHAR(50) DEFAULT 'english';
@@ -0,0 +1,21 @@
+-- Write-behind log of answered chat questions (see chat_events.py).
+-- user_id is not a foreign key: events are batch-inserted and must not fail
+-- because a user was deleted meanwhile, and anonymous questions have none.
+
+CREATE TABLE IF NOT EXISTS chat_events (
+    id BIGSERIAL PRIMARY KEY,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    endpoint VARCHAR(20) NOT NULL,
+    session_id VARCHAR(255),
+    user_id VARCHAR(255),
+    language VARCHAR(50),
+    query TEXT NOT NULL,
+    outcome VARCHAR(20) NOT NULL,
+    model VARCHAR(100),
+    total_ms INTEGER NOT NULL,
+    stage_ms JSONB NOT NULL DEFAULT '{}',
+    sources JSONB NOT NULL DEFAULT '[]'
+);
+
+CREATE INDEX IF NOT EXISTS idx_chat_events_created_at ON chat_events(created_at);
+CREATE INDEX IF NOT EXISTS idx_chat_events_user_id ON chat_events(user_id);
@@ -0,0 +1,28 @@
+"""
+Chat-completions model used by the tutor runner.
+
+Wraps the agents SDK's OpenAIChatCompletionsModel so that every LLM turn is
+bounded by what's left of the request deadline (see deadline.py), instead of
+only the client's fixed timeout, and goes through the Gemini LLM circuit
+breaker (see resilience.py). LLM turns are not hedged: they are expensive
+and not worth duplicating. Imported lazily by geminiconfig.
+"""
+from agents import OpenAIChatCompletionsModel
+
+from deadline import DEGRADE_RESERVE_SECONDS, with_deadline
+from resilience import get_upstream
+
+# Upper bound for a single LLM turn when no request deadline is active
+LLM_TURN_TIMEOUT = 60.0
+
+
+class ResilientChatCompletionsModel(OpenAIChatCompletionsModel):
+    async def get_response(self, *args, **kwargs):
+        parent = super(ResilientChatCompletionsModel, self)
+        return await get_upstream("gemini_llm").call(
+            lambda: with_deadline(
+                parent.get_response(*args, **kwargs),
+                default=LLM_TURN_TIMEOUT,
+                reserve=DEGRADE_RESERVE_SECONDS,
+            )
+        )
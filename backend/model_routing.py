@@ -0,0 +1,147 @@
+"""
+Adaptive model routing for tutor runs.
+
+Definitional lookups ("what is a servo?") don't need the same model and
+token budget as multi-step derivations. Each question is classified locally
+(no LLM call) from its length, wording, compound structure, the size of the
+selected text and, when available, the spread of its retrieval scores, and
+run on one of two tiers:
+
+    light   GEMINI_LIGHT_MODEL with a small output budget
+    full    GEMINI_MODEL with the regular budget (the default when unsure)
+
+Every decision and the latency of every run are logged and counted per tier
+(GET /metrics/routing), so the thresholds below can be tuned from real
+traffic.
+"""
+import os
+import re
+import statistics
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Sequence
+
+from pydantic import BaseModel
+
+from geminiconfig import GEMINI_MODEL
+from query_expansion import split_query
+
+ROUTING_ENABLED = os.getenv("MODEL_ROUTING_ENABLED", "true").lower() in ("1", "true", "yes")
+# Classify with the scores of a pre-run search (seeded into the run's tool memo)
+ROUTING_USE_RETRIEVAL = os.getenv("MODEL_ROUTING_USE_RETRIEVAL", "true").lower() in ("1", "true", "yes")
+LIGHT_MODEL = os.getenv("GEMINI_LIGHT_MODEL", "gemini-2.5-flash-lite")
+LIGHT_MAX_TOKENS = int(os.getenv("LIGHT_MAX_TOKENS", "600"))
+FULL_MAX_TOKENS = int(os.getenv("FULL_MAX_TOKENS", "1200"))
+
+# Thresholds
+SIMPLE_MAX_WORDS = 12
+COMPLEX_MIN_WORDS = 30
+LONG_SELECTION_CHARS = 600
+# A single clearly best hit suggests a lookup; many equally good hits a broad question
+CONFIDENT_TOP_SCORE = 0.75
+CONFIDENT_SCORE_GAP = 0.05
+
+_SIMPLE_PATTERN = re.compile(
+    r"^(?:what(?:\s+(?:is|are)|'s)\s+(?:an?\s+|the\s+)?\S+(?:\s+\S+){0,3}\s*\??$"
+    r"|define\b|definition\s+of\b|meaning\s+of\b|what\s+does\s+.+\s+stand\s+for"
+    r"|who\s+(?:is|was|invented|developed)\b)",
+    re.IGNORECASE,
+)
+_COMPLEX_PATTERN = re.compile(
+    r"\b(?:derive|derivation|prove|proof|calculate|compute|solve|step[\s-]by[\s-]step"
+    r"|compare|contrast|differences?\s+between|trade[\s-]?offs?|pros\s+and\s+cons"
+    r"|design|implement|write\s+(?:a|the|some)?\s*code|algorithm|pseudo-?code|debug|optimi[sz]e"
+    r"|why|how\s+(?:does|do|would|could|should|can)|in\s+detail|analy[sz]e|evaluate)\b",
+    re.IGNORECASE,
+)
+
+
+class ModelTier(BaseModel):
+    name: str
+    model: str
+    max_tokens: int
+
+
+TIERS: Dict[str, ModelTier] = {
+    "light": ModelTier(name="light", model=LIGHT_MODEL, max_tokens=LIGHT_MAX_TOKENS),
+    "full": ModelTier(name="full", model=GEMINI_MODEL, max_tokens=FULL_MAX_TOKENS),
+}
+
+
+class RoutingDecision(BaseModel):
+    tier: ModelTier
+    reasons: List[str]
+    features: Dict[str, float]
+
+    def describe(self) -> str:
+        features = " ".join(f"{name}={value:g}" for name, value in self.features.items())
+        return f"{self.tier.name} ({', '.join(self.reasons)}; {features})"
+
+
+def classify_question(
+    query: str,
+    selected_text: Optional[str] = None,
+    scores: Optional[Sequence[float]] = None,
+) -> RoutingDecision:
+    """Pick a tier for a question. Anything not clearly simple runs on the full tier."""
+    text = query.strip()
+    words = len(text.split())
+    features: Dict[str, float] = {"words": words, "selection_chars": len(selected_text or "")}
+    if scores:
+        ranked = sorted(scores, reverse=True)
+        features["top_score"] = round(ranked[0], 3)
+        features["score_gap"] = round(ranked[0] - statistics.mean(ranked[1:]), 3) if len(ranked) > 1 else 1.0
+
+    complex_reasons = []
+    if words >= COMPLEX_MIN_WORDS:
+        complex_reasons.append("long question")
+    if _COMPLEX_PATTERN.search(text):
+        complex_reasons.append("multi-step wording")
+    if len(split_query(text)) > 1:
+        complex_reasons.append("compound question")
+    if len(selected_text or "") >= LONG_SELECTION_CHARS:
+        complex_reasons.append("long selection")
+    if "top_score" in features and features["top_score"] >= CONFIDENT_TOP_SCORE \
+            and features["score_gap"] < CONFIDENT_SCORE_GAP:
+        complex_reasons.append("broad retrieval")
+    if complex_reasons:
+        return RoutingDecision(tier=TIERS["full"], reasons=complex_reasons, features=features)
+
+    if words <= SIMPLE_MAX_WORDS and _SIMPLE_PATTERN.search(text):
+        return RoutingDecision(tier=TIERS["light"], reasons=["definitional"], features=features)
+    if words <= SIMPLE_MAX_WORDS and features.get("top_score", 0.0) >= CONFIDENT_TOP_SCORE:
+        return RoutingDecision(tier=TIERS["light"], reasons=["short, one clear source"], features=features)
+    return RoutingDecision(tier=TIERS["full"], reasons=["default"], features=features)
+
+
+# --- Metrics -------------------------------------------------------------------------
+
+LATENCY_WINDOW = 500
+
+_latencies: Dict[str, Deque[float]] = {name: deque(maxlen=LATENCY_WINDOW) for name in TIERS}
+_counts: Dict[str, Counter] = {name: Counter() for name in TIERS}
+
+
+def record_run(decision: RoutingDecision, elapsed_ms: float, outcome: str) -> None:
+    """Log one routed run; outcome is "ok", "error" or "escalated"."""
+    name = decision.tier.name
+    _counts[name]["runs"] += 1
+    _counts[name][outcome] += 1
+    for reason in decision.reasons:
+        _counts[name][f"reason:{reason}"] += 1
+    if outcome == "ok":
+        _latencies[name].append(elapsed_ms)
+    print(f"Model tier {name} [{decision.tier.model}]: {outcome} in {elapsed_ms:.0f} ms")
+
+
+def routing_metrics() -> Dict[str, Dict[str, object]]:
+    metrics: Dict[str, Dict[str, object]] = {}
+    for name, tier in TIERS.items():
+        latencies = sorted(_latencies[name])
+        metrics[name] = {
+            "model": tier.model,
+            "max_tokens": tier.max_tokens,
+            **_counts[name],
+            "latency_p50_ms": round(latencies[len(latencies) // 2]) if latencies else None,
+            "latency_p95_ms": round(latencies[int(len(latencies) * 0.95)]) if latencies else None,
+        }
+    return metrics
@@ -0,0 +1,208 @@
+"""
+Precomputed k-nearest-neighbor graph over all chunk vectors.
+
+The textbook only changes on re-index, so "related sections" don't need a
+live embedding and vector search. index_textbook.py (and snapshot import)
+compute each chunk's top NEIGHBOR_K neighbors by cosine similarity with
+blocked matrix products and save them next to the collection version in a
+compact .npz file (int32 neighbor indices, float16 scores, point ids and
+citation metadata; no pickles).
+
+At serving time the graph backs GET /api/related (section -> related
+sections, precomputed into a dict on load) and lets search_textbook add the
+neighbors of its best hits as extra candidates without another round trip.
+Both load it off the event loop, and a graph file rewritten on disk is
+reloaded on its next use. After the alias swap, the scripts record the
+live collection version in NEIGHBOR_GRAPH_DIR/live.txt. /api/related then
+finds its graph without asking Qdrant.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+NEIGHBOR_GRAPH_DIR = Path(os.getenv("NEIGHBOR_GRAPH_DIR", str(BASE_DIR / "neighbor_graphs")))
+NEIGHBOR_K = int(os.getenv("NEIGHBOR_K", "8"))
+# Rows per matrix-product block; bounds memory at BLOCK_SIZE x n floats
+BLOCK_SIZE = 1024
+METADATA_FIELDS = ("chapter_id", "chapter", "section", "chapter_url")
+
+
+def neighbor_graph_path(collection: str) -> Path:
+    return NEIGHBOR_GRAPH_DIR / f"{collection}.npz"
+
+
+def live_pointer_path() -> Path:
+    return NEIGHBOR_GRAPH_DIR / "live.txt"
+
+
+def mark_live(collection: str) -> None:
+    """Record the collection version the alias now points to."""
+    NEIGHBOR_GRAPH_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = live_pointer_path().with_suffix(".tmp")
+    tmp.write_text(collection, encoding="utf-8")
+    tmp.replace(live_pointer_path())
+
+
+def live_collection() -> Optional[str]:
+    """The live collection version recorded by mark_live(), if any."""
+    try:
+        return live_pointer_path().read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def compute_knn(vectors: np.ndarray, k: int = NEIGHBOR_K, block_size: int = BLOCK_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k cosine neighbors of every row (excluding itself).
+
+    Returns (indices, scores), both shaped (n, k) and sorted by score.
+    """
+    x = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    x = x / np.maximum(norms, 1e-12)
+    n = len(x)
+    k = max(0, min(k, n - 1))
+    indices = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float16)
+    if k == 0:
+        return indices, scores
+
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+        sims = x[start:end] @ x.T
+        sims[np.arange(end - start), np.arange(start, end)] = -np.inf  # No self-loops
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        indices[start:end] = np.take_along_axis(top, order, axis=1)
+        scores[start:end] = np.take_along_axis(top_scores, order, axis=1)
+    return indices, scores
+
+
+def build_neighbor_graph(
+    path: Path,
+    ids: Sequence[Any],
+    vectors: np.ndarray,
+    payloads: Sequence[Dict[str, Any]],
+    k: int = NEIGHBOR_K,
+) -> None:
+    """Compute the graph for a collection version and write it to `path`."""
+    indices, scores = compute_knn(vectors, k)
+    metadata = [{field: payload.get(field) for field in METADATA_FIELDS} for payload in payloads]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        np.savez_compressed(
+            f,
+            ids=np.array([str(point_id) for point_id in ids]),
+            indices=indices,
+            scores=scores,
+            metadata=np.array(json.dumps(metadata, ensure_ascii=False)),
+        )
+
+
+class NeighborGraph:
+    def __init__(self, ids: List[str], indices: np.ndarray, scores: np.ndarray, metadata: List[Dict[str, Any]]):
+        self.ids = ids
+        self.indices = indices
+        self.scores = scores
+        self.metadata = metadata
+        self.index_of = {point_id: i for i, point_id in enumerate(ids)}
+        self._related = self._build_related_sections()
+
+    @classmethod
+    def load(cls, path: Path) -> "NeighborGraph":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["ids"].tolist(),
+                data["indices"],
+                data["scores"].astype(np.float32),
+                json.loads(str(data["metadata"])),
+            )
+
+    def neighbors(self, point_id: Any, limit: int = NEIGHBOR_K) -> List[Tuple[str, float]]:
+        """Nearest chunks to a point as (point_id, cosine score)."""
+        i = self.index_of.get(str(point_id))
+        if i is None:
+            return []
+        return [
+            (self.ids[j], float(score))
+            for j, score in zip(self.indices[i][:limit], self.scores[i][:limit])
+        ]
+
+    def _build_related_sections(self) -> Dict[Tuple[str, str], List[Dict[str, Any]]]:
+        # Section-level graph: each section's best link to every other section
+        best: Dict[Tuple[str, str], Dict[Tuple[str, str], float]] = {}
+        for i, meta in enumerate(self.metadata):
+            key = (meta.get("chapter_id") or "", meta.get("section") or "")
+            links = best.setdefault(key, {})
+            for j, score in zip(self.indices[i], self.scores[i]):
+                other = self.metadata[j]
+                other_key = (other.get("chapter_id") or "", other.get("section") or "")
+                if other_key != key and score > links.get(other_key, -1.0):
+                    links[other_key] = float(score)
+
+        first_chunk: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for meta in self.metadata:
+            first_chunk.setdefault((meta.get("chapter_id") or "", meta.get("section") or ""), meta)
+
+        related = {}
+        for key, links in best.items():
+            related[key] = [
+                {**first_chunk[other_key], "score": round(score, 4)}
+                for other_key, score in sorted(links.items(), key=lambda item: item[1], reverse=True)
+            ]
+        return related
+
+    def related_sections(self, chapter_id: str, section: Optional[str] = None, limit: int = 5) -> Optional[List[Dict[str, Any]]]:
+        """
+        Sections most similar to a section, or to a whole chapter when
+        `section` is omitted. None if the chapter/section is unknown.
+        """
+        if section is not None:
+            related = self._related.get((chapter_id, section))
+            return related[:limit] if related is not None else None
+
+        merged: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        found = False
+        for (chapter, _), links in self._related.items():
+            if chapter != chapter_id:
+                continue
+            found = True
+            for link in links:
+                key = (link.get("chapter_id") or "", link.get("section") or "")
+                if link.get("chapter_id") != chapter_id and link["score"] > merged.get(key, {}).get("score", -1.0):
+                    merged[key] = link
+        if not found:
+            return None
+        return sorted(merged.values(), key=lambda link: link["score"], reverse=True)[:limit]
+
+
+# collection -> (file mtime, graph)
+_loaded_graphs: Dict[str, Tuple[float, NeighborGraph]] = {}
+
+def load_neighbor_graph(collection: str) -> Optional[NeighborGraph]:
+    """
+    The graph built for a collection version, or None. Loaded once and
+    reloaded when the file changes; blocking, so async callers use a thread.
+    """
+    path = neighbor_graph_path(collection)
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        _loaded_graphs.pop(collection, None)
+        return None
+    cached = _loaded_graphs.get(collection)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    graph = NeighborGraph.load(path)
+    _loaded_graphs[collection] = (mtime, graph)
+    return graph
+
+
+def remove_neighbor_graph(collection: str) -> None:
+    _loaded_graphs.pop(collection, None)
+    neighbor_graph_path(collection).unlink(missing_ok=True)
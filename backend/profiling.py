@@ -0,0 +1,267 @@
+"""
+Opt-in request profiling and an event-loop lag monitor.
+
+Request profiles
+    ProfilingMiddleware samples the event-loop thread's Python stack every
+    PROFILE_INTERVAL_MS while a selected request runs, and writes the samples
+    to PROFILE_DIR as a folded-stack file ("frame;frame;frame count" per
+    line), which flamegraph.pl, inferno and speedscope read directly. A
+    request is profiled when it carries `X-Profile: <PROFILE_ADMIN_TOKEN>`,
+    or at random with probability PROFILE_SAMPLE_RATE on PROFILED_PATHS. The
+    response then has an X-Profile-Id header naming the file.
+
+    Only samples taken while the request's own task, or a task it spawned
+    (agent runner, tool calls), is running are kept, so concurrent requests
+    don't leak into each other's profiles. Work handed to threads
+    (asyncio.to_thread) shows up as the await that waits for it.
+
+Event-loop monitor
+    LoopMonitor ticks on the loop every LOOP_MONITOR_INTERVAL and records the
+    lag between when a tick was due and when it ran. A watchdog thread notices
+    when ticks stop for longer than LOOP_STALL_THRESHOLD, i.e. something is
+    blocking the loop right now (bcrypt, psycopg2, a large JSON dump ...), and
+    logs the stack of whatever is running on the loop thread at that moment.
+    Lag percentiles and recent stalls are served at GET /metrics/event-loop.
+
+PROFILE_ADMIN_TOKEN also guards the /metrics/* endpoints (X-Admin-Token
+header); without it set, they are disabled.
+
+Both use only the standard library; profiling costs nothing unless a request
+is selected.
+"""
+import asyncio
+import contextvars
+import hmac
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILED_PATHS = [
+    path.strip() for path in os.getenv("PROFILED_PATHS", "/api/chat,/auth/signin").split(",") if path.strip()
+]
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(BASE_DIR / "profiles")))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "2"))
+# A runaway request is not sampled forever
+PROFILE_MAX_SECONDS = 60.0
+MAX_STACK_DEPTH = 128
+
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() in ("1", "true", "yes")
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.1"))
+LOOP_STALL_THRESHOLD = float(os.getenv("LOOP_STALL_THRESHOLD", "0.2"))
+LAG_WINDOW = 1000
+RECENT_STALLS = 20
+
+# Set for the duration of a profiled request; inherited by the tasks it spawns
+_active_profile: contextvars.ContextVar[Optional["SamplingProfiler"]] = contextvars.ContextVar(
+    "active_profile", default=None
+)
+# loop -> running task (CPython keeps this for asyncio.current_task)
+_current_tasks: Optional[Dict[Any, Any]] = getattr(asyncio.tasks, "_current_tasks", None)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})"
+
+
+def _folded_stack(frame) -> str:
+    labels: List[str] = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+# --- Request profiles ----------------------------------------------------------------
+
+class SamplingProfiler:
+    """Samples one thread's stack from a background thread while active."""
+
+    def __init__(self, thread_id: int, loop: asyncio.AbstractEventLoop, interval: float):
+        self.thread_id = thread_id
+        self.loop = loop
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.taken = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self.started = time.monotonic()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _belongs_here(self) -> bool:
+        if _current_tasks is None:
+            return True  # Can't attribute; keep every loop-thread sample
+        task = _current_tasks.get(self.loop)
+        if task is None:
+            return False  # Loop idle or running a plain callback
+        return task.get_context().get(_active_profile) is self
+
+    def _run(self) -> None:
+        deadline = self.started + PROFILE_MAX_SECONDS
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.taken += 1
+            if self._belongs_here():
+                self.samples[_folded_stack(frame)] += 1
+
+    def write(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def is_admin_token(value: Optional[str]) -> bool:
+    """True for the configured PROFILE_ADMIN_TOKEN; always False when it isn't set."""
+    return bool(PROFILE_ADMIN_TOKEN) and value is not None and hmac.compare_digest(
+        value.encode("latin-1", "replace"), PROFILE_ADMIN_TOKEN.encode("latin-1", "replace")
+    )
+
+
+def _should_profile(scope: Dict[str, Any]) -> bool:
+    if PROFILE_ADMIN_TOKEN:
+        for name, value in scope.get("headers") or []:
+            if name == b"x-profile":
+                return is_admin_token(value.decode("latin-1"))
+    return (
+        PROFILE_SAMPLE_RATE > 0
+        and scope.get("path") in PROFILED_PATHS
+        and random.random() < PROFILE_SAMPLE_RATE
+    )
+
+
+class ProfilingMiddleware:
+    """ASGI middleware; a plain pass-through for requests that aren't selected."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        profiler = SamplingProfiler(threading.get_ident(), asyncio.get_running_loop(), PROFILE_INTERVAL_MS / 1000)
+        token = _active_profile.set(profiler)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        start = time.monotonic()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.stop()
+            _active_profile.reset(token)
+            elapsed_ms = (time.monotonic() - start) * 1000
+            route = scope.get("path", "").strip("/").replace("/", "_") or "root"
+            path = PROFILE_DIR / f"{profile_id}-{route}.folded"
+            try:
+                await asyncio.to_thread(profiler.write, path)
+                print(
+                    f"Profile {profile_id}: {scope.get('method')} {scope.get('path')} took {elapsed_ms:.0f} ms; "
+                    f"{sum(profiler.samples.values())}/{profiler.taken} samples -> {path}"
+                )
+            except OSError as e:
+                print(f"Warning: could not write profile {path}: {e}")
+
+
+# --- Event-loop monitor ----------------------------------------------------------------
+
+class LoopMonitor:
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL, stall_threshold: float = LOOP_STALL_THRESHOLD):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.lags_ms: Deque[float] = deque(maxlen=LAG_WINDOW)
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=RECENT_STALLS)
+        self.stall_count = 0
+        self._last_tick = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._tick())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _tick(self) -> None:
+        while True:
+            due = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.lags_ms.append(max(0.0, now - due) * 1000)
+            self._last_tick = now
+
+    def _watch(self) -> None:
+        # Runs in its own thread, so it sees the loop while it is blocked
+        stalled_since: Optional[float] = None
+        stall: Optional[Dict[str, Any]] = None
+        check_every = min(self.interval, self.stall_threshold) / 2
+        while not self._stop.wait(check_every):
+            overdue = time.monotonic() - self._last_tick - self.interval
+            if overdue > self.stall_threshold and stalled_since is None:
+                stalled_since = self._last_tick + self.interval
+                frame = sys._current_frames().get(self._loop_thread_id)
+                stack = traceback.format_stack(frame, limit=12) if frame is not None else []
+                blocker = _frame_label(frame) if frame is not None else "unknown"
+                stall = {"at": time.time(), "blocked_in": blocker, "stack": "".join(stack)}
+                print(f"⚠️  Event loop blocked for >{self.stall_threshold * 1000:.0f} ms in {blocker}:\n{stall['stack']}")
+            elif overdue <= self.stall_threshold and stalled_since is not None:
+                stall["duration_ms"] = round((self._last_tick - stalled_since) * 1000)
+                print(f"Event loop stall in {stall['blocked_in']} lasted {stall['duration_ms']} ms")
+                self.stalls.append(stall)
+                self.stall_count += 1
+                stalled_since = stall = None
+
+    def metrics(self) -> Dict[str, Any]:
+        lags = sorted(self.lags_ms)
+        return {
+            "running": self._task is not None,
+            "interval_ms": self.interval * 1000,
+            "lag_p50_ms": round(statistics.median(lags), 2) if lags else None,
+            "lag_p99_ms": round(lags[int(len(lags) * 0.99)], 2) if lags else None,
+            "lag_max_ms": round(lags[-1], 2) if lags else None,
+            "stalls": self.stall_count,
+            "recent_stalls": [
+                {key: value for key, value in stall.items() if key != "stack"} for stall in self.stalls
+            ],
+        }
+
+
+loop_monitor = LoopMonitor()
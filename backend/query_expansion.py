@@ -0,0 +1,121 @@
+"""
+Rule-based splitting of compound questions into retrieval sub-queries.
+
+A question like "compare LiDAR and stereo cameras for SLAM on a humanoid"
+matches chunks about either sensor only weakly as a single dense query. The
+sub-queries ("LiDAR for SLAM on a humanoid", "stereo cameras for SLAM on a
+humanoid") are embedded in one batch and searched in one Qdrant batch query
+(see agent.search_textbook); the original question is always kept as the
+first query. No LLM call is involved, so splitting costs microseconds.
+
+Sub-queries have to stand on their own, because they compete with the
+original in max-score fusion. A shared head noun is carried into each side
+of a comparison ("forward and inverse kinematics" -> "forward kinematics",
+"inverse kinematics"). A pronoun in a follow-up question is replaced with
+the subject of the question before it ("What is ZMP and how is it
+computed?" -> "how is ZMP computed"). A part needs MIN_CONTENT_WORDS
+content words unless it is itself a question with a subject ("What is
+ZMP"); fragments such as "Yes" or a bare modifier are dropped.
+"""
+import os
+import re
+from typing import List, Optional
+
+from context_compression import tokenize
+
+MULTI_QUERY_ENABLED = os.getenv("MULTI_QUERY_ENABLED", "true").lower() in ("1", "true", "yes")
+MAX_SUBQUERIES = int(os.getenv("MAX_SUBQUERIES", "4"))  # Including the original
+MIN_SUBQUERY_CHARS = 3
+# Stopwords and question words don't count ("how is it computed" has one)
+MIN_CONTENT_WORDS = 2
+_QUESTION_START = re.compile(
+    r"^(?:how|what|why|when|where|which|who|does|do|is|are|can|define|explain|describe)\b", re.IGNORECASE
+)
+
+_COMPARISON = re.compile(
+    r"^(?:compare|contrast|(?:what(?:'s| is| are) )?(?:the )?differences? between)\s+"
+    r"(?P<left>.+?)\s+(?:and|vs\.?|versus|with|to)\s+(?P<right>.+?)"
+    r"(?P<tail>\s+(?:for|in|on|when|during|regarding)\s+.+)?$",
+    re.IGNORECASE,
+)
+_VERSUS = re.compile(r"\s+(?:vs\.?|versus)\s+", re.IGNORECASE)
+# "What is ZMP and how is it computed?" -> two questions
+_QUESTION_JOIN = re.compile(
+    r"(?:[?;]\s*|\s+and\s+(?=(?:how|what|why|when|where|which|who|does|do|is|are|can)\b))",
+    re.IGNORECASE,
+)
+# "What is ZMP" -> "ZMP"; the subject a follow-up pronoun refers to
+_SUBJECT = re.compile(
+    r"^(?:(?:what|who|which)(?:'s|\s+(?:is|are|was|were|does|do))|define|explain|describe)"
+    r"\s+(?:an?\s+|the\s+)?(?P<subject>.+)$",
+    re.IGNORECASE,
+)
+_PRONOUN = re.compile(r"\b(?:it|they|them|this|these)\b", re.IGNORECASE)
+
+
+def _clean(text: str) -> str:
+    return text.strip(" \t\n?.!,;:")
+
+
+def _comparison_parts(question: str) -> List[str]:
+    match = _COMPARISON.match(question)
+    if match:
+        tail = match.group("tail") or ""
+        left, right = match.group("left"), match.group("right")
+        right_words = right.split()
+        joined_by_and = " and " in match.group(0)[len(left):].lower()
+        if joined_by_and and len(left.split()) == 1 and left.islower() and len(right_words) > 1:
+            # "forward and inverse kinematics": a lone lowercase modifier shares
+            # right's head noun (names like "LiDAR" stand on their own)
+            left = f"{left} {' '.join(right_words[1:])}"
+        return [left + tail, right + tail]
+    if _VERSUS.search(question):
+        return _VERSUS.split(question)
+    return []
+
+
+def _subject(question: str) -> Optional[str]:
+    match = _SUBJECT.match(question)
+    return _clean(match.group("subject")) if match else None
+
+
+def _resolve_pronoun(question: str, subject: Optional[str]) -> Optional[str]:
+    """The question with its first pronoun replaced by subject; None if it can't be."""
+    if not _PRONOUN.search(question):
+        return question
+    if not subject:
+        return None
+    return _PRONOUN.sub(subject, question, count=1)
+
+
+def split_query(query: str, max_queries: int = MAX_SUBQUERIES) -> List[str]:
+    """Original query first, then up to max_queries - 1 distinct sub-queries."""
+    original = query.strip()
+    queries = [original]
+    if not MULTI_QUERY_ENABLED or max_queries <= 1:
+        return queries
+
+    parts: List[str] = []
+    subject: Optional[str] = None
+    for question in _QUESTION_JOIN.split(original):
+        question = _clean(question)
+        resolved = _resolve_pronoun(question, subject)
+        subject = _subject(question) or subject
+        if resolved is None:
+            continue  # "how is it computed" with nothing for "it" to refer to
+        parts.extend(_comparison_parts(resolved) or [resolved])
+
+    seen = {original.casefold()}
+    for part in parts:
+        part = _clean(part)
+        if len(part) < MIN_SUBQUERY_CHARS or part.casefold() in seen:
+            continue
+        content_words = len(tokenize(part))
+        if content_words < (1 if _QUESTION_START.match(part) else MIN_CONTENT_WORDS):
+            continue
+        seen.add(part.casefold())
+        queries.append(part)
+        if len(queries) >= max_queries:
+            break
+    # A single sub-query equal to the whole question adds nothing
+    return queries if len(queries) > 2 else queries[:1]
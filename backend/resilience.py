@@ -0,0 +1,196 @@
+"""
+Hedged requests and circuit breakers for upstream calls (Gemini, Qdrant).
+
+Each upstream gets an Upstream object that:
+
+- tracks recent successful latencies and, for idempotent calls (embeddings,
+  searches), sends one duplicate "hedge" request when the first hasn't
+  answered after the upstream's p95 latency. Whichever finishes first wins;
+  the other is cancelled. Hedges are capped to a fraction of all calls so
+  the extra load stays small.
+- wraps calls in a circuit breaker: after CONSECUTIVE_FAILURES failures in a
+  row the circuit opens and calls fail fast with CircuitOpenError for
+  OPEN_SECONDS, then a single probe call decides whether it closes again.
+  A call that times out only because the caller's request budget was nearly
+  spent (DeadlineExceeded.budget_limited) is not held against the upstream;
+  exceeding the call's own timeout is.
+
+resilience_metrics() exposes hedge wins and breaker state per upstream.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from deadline import DeadlineExceeded
+
+CONSECUTIVE_FAILURES = 5
+OPEN_SECONDS = 30.0
+# Latency window used for the hedge delay percentile
+LATENCY_WINDOW = 200
+MIN_SAMPLES_FOR_PERCENTILE = 20
+HEDGE_PERCENTILE = 95
+DEFAULT_HEDGE_DELAY = 0.5  # Until enough samples are collected
+MIN_HEDGE_DELAY = 0.05
+# At most this fraction of calls may send a hedge
+MAX_HEDGE_RATIO = 0.1
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = CONSECUTIVE_FAILURES, open_seconds: float = OPEN_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go through right now."""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                raise CircuitOpenError(f"{self.name} circuit is half-open; probe in flight")
+            self._probe_in_flight = True
+
+    def release_probe(self) -> None:
+        """Forget an in-flight probe whose outcome is unknown (call cancelled)."""
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+        self.state = self.CLOSED
+
+    def record_failure(self) -> None:
+        self._probe_in_flight = False
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+                print(f"Warning: circuit for {self.name} opened after {self.consecutive_failures} failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class Upstream:
+    def __init__(self, name: str):
+        self.name = name
+        self.breaker = CircuitBreaker(name)
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self.metrics = {
+            "calls": 0,
+            "failures": 0,
+            "rejected": 0,
+            "hedges_sent": 0,
+            "hedge_wins": 0,
+        }
+
+    def hedge_delay(self) -> float:
+        if len(self.latencies) < MIN_SAMPLES_FOR_PERCENTILE:
+            return DEFAULT_HEDGE_DELAY
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE / 100))
+        return max(MIN_HEDGE_DELAY, ordered[index])
+
+    def _may_hedge(self) -> bool:
+        return self.metrics["hedges_sent"] < MAX_HEDGE_RATIO * self.metrics["calls"] + 1
+
+    async def call(self, attempt: Callable[[], Awaitable[Any]], hedge: bool = False) -> Any:
+        """
+        Run `attempt()` through the breaker, hedging it if `hedge` is True.
+
+        `attempt` must create a fresh awaitable on each call, since a hedge
+        invokes it a second time.
+        """
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self.metrics["rejected"] += 1
+            raise
+        self.metrics["calls"] += 1
+        start = time.monotonic()
+        try:
+            if hedge:
+                result = await self._hedged(attempt)
+            else:
+                result = await attempt()
+        except asyncio.CancelledError:
+            # Caller gave up (e.g. request deadline); says nothing about health
+            self.breaker.release_probe()
+            raise
+        except DeadlineExceeded as e:
+            if e.budget_limited:
+                # Cut short by a low request budget, not a slow upstream
+                self.breaker.release_probe()
+            else:
+                self.metrics["failures"] += 1
+                self.breaker.record_failure()
+            raise
+        except Exception:
+            self.metrics["failures"] += 1
+            self.breaker.record_failure()
+            raise
+        self.latencies.append(time.monotonic() - start)
+        self.breaker.record_success()
+        return result
+
+    async def _hedged(self, attempt: Callable[[], Awaitable[Any]]) -> Any:
+        primary = asyncio.ensure_future(attempt())
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay())
+            if done or not self._may_hedge():
+                return await primary
+
+            self.metrics["hedges_sent"] += 1
+            backup = asyncio.ensure_future(attempt())
+            pending = {primary, backup}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.metrics["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Also reached when the caller is cancelled mid-wait
+            for task in pending:
+                task.cancel()
+
+
+_upstreams: Dict[str, Upstream] = {}
+
+def get_upstream(name: str) -> Upstream:
+    if name not in _upstreams:
+        _upstreams[name] = Upstream(name)
+    return _upstreams[name]
+
+
+def resilience_metrics() -> Dict[str, Any]:
+    """Per-upstream counters, hedge delay and breaker state for this process."""
+    return {
+        name: {
+            **upstream.metrics,
+            "hedge_delay_ms": round(upstream.hedge_delay() * 1000, 1),
+            "breaker_state": upstream.breaker.state,
+            "breaker_times_opened": upstream.breaker.times_opened,
+        }
+        for name, upstream in _upstreams.items()
+    }
@@ -0,0 +1,116 @@
+"""
+Fast JSON serialization for the hot paths.
+
+- dumps()/dumps_text() use orjson when it is installed (optional dependency)
+  and fall back to the stdlib encoder with the same compact output.
+- fast_json_response() builds the HTTP response directly from plain data,
+  skipping FastAPI's jsonable_encoder pass and the response_model
+  re-validation of data that was already validated or built by us. Routes
+  keep response_model for the OpenAPI schema.
+- Bodies of at least COMPRESS_MIN_BYTES (long tutor answers with sources)
+  are compressed with brotli or gzip when the client accepts it. Streaming
+  responses are left alone so NDJSON lines aren't held back by a compressor.
+
+See benchmark_serialization.py for the per-request CPU comparison.
+"""
+import gzip
+import json
+import os
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import orjson  # Optional dependency, roughly 5-10x faster than json
+except ImportError:
+    orjson = None
+
+try:
+    import brotli  # Optional dependency; gzip is used without it
+except ImportError:
+    brotli = None
+
+RESPONSE_COMPRESSION = os.getenv("RESPONSE_COMPRESSION", "true").lower() in ("1", "true", "yes")
+# Below this size compression costs more CPU than it saves on the wire
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def _default(value: Any) -> Any:
+    # Pydantic models and datetimes that end up in plain data
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_text(value: Any) -> str:
+    """Compact JSON as str (e.g. tool results handed to the model)."""
+    return dumps(value).decode("utf-8")
+
+
+def _encoding_qvalues(header: str) -> Dict[str, float]:
+    """Accept-Encoding as {coding: q}; malformed q-values count as 0."""
+    qvalues: Dict[str, float] = {}
+    for item in header.lower().split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qvalues[coding] = q
+    return qvalues
+
+
+def _accepted_encoding(request: Optional[Request]) -> Optional[str]:
+    """The client's most preferred encoding we can produce (brotli on ties), or None."""
+    if request is None:
+        return None
+    qvalues = _encoding_qvalues(request.headers.get("accept-encoding", ""))
+    wildcard = qvalues.get("*", 0.0)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_q = None, 0.0
+    for coding in candidates:
+        q = qvalues.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def fast_json_response(
+    content: Any,
+    request: Optional[Request] = None,
+    status_code: int = 200,
+    headers: Optional[dict] = None,
+) -> Response:
+    """JSON response from plain data, compressed when large and accepted."""
+    body = dumps(content)
+    response_headers = dict(headers or {})
+    encoding = _accepted_encoding(request) if RESPONSE_COMPRESSION and len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding == "br":
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+    elif encoding == "gzip":
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    if encoding:
+        response_headers["Content-Encoding"] = encoding
+    if RESPONSE_COMPRESSION and request is not None:
+        # The body depends on Accept-Encoding whenever it could have been compressed
+        response_headers["Vary"] = "Accept-Encoding"
+    return Response(content=body, status_code=status_code, headers=response_headers, media_type="application/json")
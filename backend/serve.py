@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Production server: pre-forked Uvicorn workers sharing read-only state.
+
+The parent process imports the app and builds the static, read-only state
+(the FastAPI app, the agent stack and the per-language agent registry) once,
+freezes it out of the garbage collector, binds the listening socket and then
+forks the workers. Children share those pages copy-on-write instead of each
+rebuilding them. Network clients (Qdrant, Gemini, Postgres) are created lazily
+inside each worker after the fork, and the embedding/answer caches are shared
+between workers through SQLite (see shared_cache.py).
+
+The parent restarts workers that die and forwards SIGINT/SIGTERM to them.
+
+Usage:
+    python serve.py [--workers 4] [--host 0.0.0.0] [--port 8000]
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List
+
+import uvicorn
+
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+# Agents built before forking; others are created on demand in each worker
+PRELOAD_LANGUAGES = [
+    lang.strip() for lang in os.getenv("PRELOAD_LANGUAGES", "english,urdu").split(",") if lang.strip()
+]
+# Don't respawn faster than this if workers keep crashing
+RESPAWN_BACKOFF_SECONDS = 1.0
+
+
+def preload():
+    """Import and build everything read-only before forking; return the app."""
+    import main
+    from app.api import chat  # noqa: F401 - agent, tools and LLM config modules
+    from agent import get_agent
+
+    for language in PRELOAD_LANGUAGES:
+        get_agent(language)
+
+    # Move everything allocated so far out of GC tracking: collections would
+    # otherwise touch every object and un-share the copy-on-write pages
+    gc.collect()
+    gc.freeze()
+    return main.app
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket) -> None:
+    """Child process body: serve requests on the inherited socket."""
+    config = uvicorn.Config(app, lifespan="on", log_level="info")
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def spawn(app, sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        # Child: default signal handling; uvicorn installs its own
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        try:
+            run_worker(app, sock)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def supervise(app, sock: socket.socket, workers: int) -> int:
+    """Fork the workers and keep them running until asked to stop."""
+    children: Dict[int, float] = {}
+    stopping: List[bool] = [False]
+
+    def handle_stop(signum, frame):
+        stopping[0] = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, handle_stop)
+    signal.signal(signal.SIGTERM, handle_stop)
+
+    for _ in range(workers):
+        children[spawn(app, sock)] = time.time()
+    print(f"Started {workers} workers: {', '.join(str(pid) for pid in children)}")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started_at = children.pop(pid, None)
+        if started_at is None or stopping[0]:
+            continue
+        print(f"Worker {pid} exited with status {status}; restarting")
+        if time.time() - started_at < RESPAWN_BACKOFF_SECONDS:
+            time.sleep(RESPAWN_BACKOFF_SECONDS)
+        children[spawn(app, sock)] = time.time()
+
+    print("All workers stopped")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the backend with pre-forked workers.")
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        print("Pre-forking needs os.fork(); falling back to a single process")
+        from main import app
+        uvicorn.run(app, host=args.host, port=args.port)
+        return 0
+
+    app = preload()
+    sock = bind_socket(args.host, args.port)
+    print(f"Listening on http://{args.host}:{args.port}")
+    return supervise(app, sock, max(1, args.workers))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
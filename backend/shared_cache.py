@@ -0,0 +1,103 @@
+"""
+Cross-process key/value cache backed by SQLite in WAL mode.
+
+Every worker process (see serve.py) opens its own connection to the same
+database file, so a query embedding or tutor answer computed by one worker
+is a cache hit for all the others. WAL lets readers proceed while another
+process writes. Values are raw bytes; callers choose the encoding.
+
+This is the local shared tier of cache.TwoTierCache.
+"""
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+SHARED_CACHE_PATH = os.getenv(
+    "SHARED_CACHE_PATH",
+    str(Path(tempfile.gettempdir()) / "physical_ai_shared_cache.sqlite3"),
+)
+# Chance per write of sweeping expired rows, keeps the file from growing forever
+PURGE_PROBABILITY = 0.01
+
+
+class SharedCache:
+    """SQLite-backed cache shared by all processes on the host."""
+
+    def __init__(self, path: str = SHARED_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per process/thread; connections must not cross a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY,"
+                " value BLOB NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            row = self._connection().execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Warning: shared cache read failed: {e}")
+            return None
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl),
+            )
+            if random.random() < PURGE_PROBABILITY:
+                conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error as e:
+            print(f"Warning: shared cache write failed: {e}")
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """
+        Set `key` only if it is absent or expired; True if this call set it.
+
+        Unlike the other methods, errors (including "database is locked" after
+        the busy timeout) raise sqlite3.Error: False must mean the key exists.
+        """
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM cache WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl),
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount == 1
+
+    def delete(self, key: str) -> None:
+        try:
+            self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            print(f"Warning: shared cache delete failed: {e}")
+
@@ -0,0 +1,12 @@
+"""
+Shared test setup: backend modules are imported by their flat names, as the
+app does, and caches stay in memory so tests never touch shared files.
+"""
+import os
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault("CACHE_BACKEND", "memory")
@@ -0,0 +1,95 @@
+import asyncio
+import sqlite3
+import time
+
+from cache import SqliteBackend, TwoTierCache
+from deadline import request_deadline
+from shared_cache import SharedCache
+
+
+def sqlite_cache(tmp_path, **kwargs):
+    backend = SqliteBackend(SharedCache(str(tmp_path / "cache.sqlite3")))
+    return TwoTierCache("test", backend=backend, **kwargs)
+
+
+def test_concurrent_misses_compute_once(tmp_path):
+    cache = sqlite_cache(tmp_path, ttl=60)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"answer": 42}
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == [{"answer": 42}] * 5
+    assert len(calls) == 1
+    assert cache.stats["misses"] == 5
+
+
+def test_shared_tier_serves_a_fresh_process(tmp_path):
+    asyncio.run(sqlite_cache(tmp_path, ttl=60).set("k", [1, 2]))
+    other = sqlite_cache(tmp_path, ttl=60)
+    assert asyncio.run(other.get("k")) == [1, 2]
+    assert other.stats["shared_hits"] == 1
+
+
+def test_stale_entry_is_served_while_refreshing(tmp_path):
+    cache = TwoTierCache("test", ttl=60, stale_ttl=60, backend=None)
+    cache._lru_put("k", "old", time.time() - 1)
+
+    async def scenario():
+        value = await cache.get_or_compute("k", lambda: asyncio.sleep(0.01, "new"))
+        await asyncio.sleep(0.05)
+        return value, await cache.get("k")
+
+    assert asyncio.run(scenario()) == ("old", "new")
+    assert cache.stats["stale_hits"] == 1
+
+
+def test_lock_wait_is_bounded_by_request_budget(tmp_path):
+    cache = sqlite_cache(tmp_path, ttl=60)
+
+    async def scenario():
+        assert await cache.backend.add("lock:k", b"1", 30)  # Another worker is computing
+        with request_deadline(0.3):
+            start = time.monotonic()
+            value = await cache.get_or_compute("k", lambda: asyncio.sleep(0, "computed"))
+            return value, time.monotonic() - start
+
+    value, elapsed = asyncio.run(scenario())
+    assert value == "computed"
+    assert elapsed < 1.0
+
+
+def test_add_raises_when_the_store_is_unusable(tmp_path):
+    store = SharedCache(str(tmp_path))  # A directory: sqlite can't open it
+    try:
+        store.add("k", b"1", 30)
+    except sqlite3.Error:
+        pass
+    else:
+        raise AssertionError("add() must not report a backend error as 'key exists'")
+
+
+def test_unusable_shared_tier_computes_without_waiting(tmp_path):
+    cache = TwoTierCache("test", ttl=60, backend=SqliteBackend(SharedCache(str(tmp_path))))
+
+    async def scenario():
+        with request_deadline(5):
+            start = time.monotonic()
+            value = await cache.get_or_compute("k", lambda: asyncio.sleep(0, "computed"))
+            return value, time.monotonic() - start
+
+    value, elapsed = asyncio.run(scenario())
+    assert value == "computed"
+    assert elapsed < 1.0
+
+
+def test_uncacheable_values_are_returned_but_not_stored():
+    cache = TwoTierCache("test", ttl=60, backend=None)
+    value = asyncio.run(cache.get_or_compute("k", lambda: asyncio.sleep(0, "partial"), cacheable=lambda v: False))
+    assert value == "partial"
+    assert asyncio.run(cache.get("k")) is None
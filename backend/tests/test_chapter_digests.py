@@ -0,0 +1,60 @@
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import chapter_digests
+from app.api.digests import get_chapter_digest
+
+
+@pytest.fixture
+def digest_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(chapter_digests, "DIGEST_DIR", tmp_path)
+    chapter_digests._file_cache.clear()
+    return tmp_path
+
+
+def write_digest(chapter_id, content_hash, language, level):
+    path = chapter_digests.digest_path(chapter_id, content_hash, language, level)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        "chapter_id": chapter_id, "title": "Balance", "experience_level": level, "language": language,
+        "content_hash": content_hash, "generated_at": 0.0, "overview": "...", "sections": [],
+    }))
+
+
+def test_digest_path_rejects_traversal(digest_dir):
+    with pytest.raises(ValueError):
+        chapter_digests.digest_path("chapter-1", "abc123", "english", "../../etc/passwd")
+    with pytest.raises(ValueError):
+        chapter_digests.digest_path("..", "abc123", "english", "beginner")
+
+
+def test_unknown_level_or_language_is_400(digest_dir):
+    with pytest.raises(HTTPException) as info:
+        get_chapter_digest("chapter-1", None, level="../../secrets")
+    assert info.value.status_code == 400
+    with pytest.raises(HTTPException) as info:
+        get_chapter_digest("chapter-1", None, language="klingon")
+    assert info.value.status_code == 400
+
+
+def test_serves_requested_level_and_404s_unknown_chapter(digest_dir):
+    write_digest("chapter-1", "abc123", "english", "advanced")
+    chapter_digests.update_manifest("chapter-1", "Balance", "abc123")
+    assert get_chapter_digest("chapter-1", None, level="Advanced").experience_level == "advanced"
+    with pytest.raises(HTTPException) as info:
+        get_chapter_digest("chapter-9", None)
+    assert info.value.status_code == 404
+
+
+def test_back_to_back_manifest_updates_keep_both_entries(digest_dir):
+    for chapter_id in ("chapter-1", "chapter-2"):
+        (digest_dir / chapter_id).mkdir()
+    path = chapter_digests.manifest_path()
+    chapter_digests.update_manifest("chapter-1", "One", "aaa")
+    # A read cached before the first write, within the same mtime tick
+    chapter_digests._file_cache[path] = (path.stat().st_mtime, {})
+    chapter_digests.update_manifest("chapter-2", "Two", "bbb")
+    manifest = json.loads(path.read_text())
+    assert set(manifest) == {"chapter-1", "chapter-2"}
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+import agent
+from app.api import chat
+from app.api.chat_models import ChatBatchRequest
+
+
+def test_only_listed_instructors_may_batch(monkeypatch):
+    monkeypatch.setattr(chat, "INSTRUCTOR_EMAILS", {"prof@example.edu"})
+    assert chat.is_instructor({"id": "1", "email": "Prof@Example.edu"})
+    assert not chat.is_instructor({"id": "2", "email": "student@example.edu"})
+    assert not chat.is_instructor(None)
+
+
+def test_batch_runs_as_the_authenticated_user(monkeypatch):
+    seen = []
+
+    async def resolve_profile(user_id):
+        seen.append(user_id)
+        raise RuntimeError("stop after profile lookup")
+
+    monkeypatch.setattr(chat, "resolve_profile", resolve_profile)
+    request = ChatBatchRequest.model_validate({
+        "questions": [{"query": "What is ZMP?"}],
+        "session_id": "s1",
+        "user_id": "someone-else",
+    })
+
+    async def consume():
+        async for _ in chat.chat_batch_stream(request, {"id": "me", "email": "prof@example.edu"}):
+            pass
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(consume())
+    assert seen == ["me"]
+
+
+def test_answer_key_covers_the_rendered_profile(monkeypatch):
+    monkeypatch.setattr(chat, "get_collection_version", lambda: asyncio.sleep(0, "textbook_v1"))
+
+    def key(level, background, language="english"):
+        profile = agent.UserProfile(experience_level=level, background=background, language=language)
+        return asyncio.run(chat.answer_cache_key(language, "What is ZMP?", None, profile))
+
+    assert key("beginner", "High school student") == key("Beginner ", "High  school student")
+    # The background is in the instructions, so it must be in the key
+    assert key("beginner", "High school student") != key("beginner", "Retired mechanical engineer")
+    assert key("expert", "x") == key("intermediate", "x")
+    assert key("beginner", "x") != key("advanced", "x")
+    assert key("beginner", "x", "English") != key("beginner", "x", "urdu")
+
+
+def test_resolved_profile_shows_the_cached_level(monkeypatch):
+    async def cached_profile(user_id, fetch):
+        return {"experience_level": "Expert", "background": "PhD", "language": "english"}
+
+    monkeypatch.setattr(chat, "get_cached_profile", cached_profile)
+    profile = asyncio.run(chat.resolve_profile("u1"))
+    assert profile.experience_level == "intermediate"
+    assert "- Experience level: intermediate" in agent.render_profile_instructions(profile)
+
+
+def test_answers_written_after_a_failed_search_are_not_cached(monkeypatch):
+    async def search_textbook(*args):
+        raise agent.RetrievalUnavailable("breaker open")
+
+    async def run_tutor(agent_, query_text, config, context):
+        result = await agent.memoized_search(context, query_text)
+        return {"response": f"{len(result['chunks'])} chunks", "sources": []}
+
+    cache = chat.TwoTierCache("test", ttl=60, backend=None)
+    monkeypatch.setattr(chat, "answer_cache", cache)
+    monkeypatch.setattr(chat, "get_collection_version", lambda: asyncio.sleep(0, "textbook_v1"))
+    monkeypatch.setattr(chat, "ROUTING_ENABLED", False)
+    monkeypatch.setattr(chat, "run_tutor", run_tutor)
+    monkeypatch.setattr(chat, "record_chat_event", lambda *args, **kwargs: None)
+    monkeypatch.setattr(agent, "search_textbook", search_textbook)
+
+    def ask():
+        return asyncio.run(chat.answer_question(None, None, agent.TutorContext(), "english", "What is ZMP?"))
+
+    assert ask()["response"] == "0 chunks"
+    assert len(cache._lru) == 0
+
+    monkeypatch.setattr(agent, "search_textbook", lambda *args: asyncio.sleep(0, agent._search_response("q", None, [])))
+    ask()
+    assert len(cache._lru) == 1
+
+
+def test_out_of_time_answer_is_degraded_to_the_references_found(monkeypatch):
+    async def slow_run(agent_, query_text, config, context):
+        chat.current_budget().add_references([{"chapter": "Chapter 3", "section": "Balance", "chapter_url": "/c3"}])
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(chat, "answer_cache", chat.TwoTierCache("test", ttl=60, backend=None))
+    monkeypatch.setattr(chat, "get_collection_version", lambda: asyncio.sleep(0, "textbook_v1"))
+    monkeypatch.setattr(chat, "ROUTING_ENABLED", False)
+    monkeypatch.setattr(chat, "run_tutor", slow_run)
+    monkeypatch.setattr(chat, "record_chat_event", lambda *args, **kwargs: None)
+
+    answer = asyncio.run(
+        chat.answer_question(None, None, agent.TutorContext(), "english", "What is ZMP?", seconds=0.5)
+    )
+    assert answer["sources"] == [{"chapter": "Chapter 3", "section": "Balance", "url": "/c3"}]
+    assert "**Chapter 3**, Balance" in answer["response"]
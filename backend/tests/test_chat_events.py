@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import chat_events
+from chat_events import ChatEventLog
+
+
+class RecordingLog(ChatEventLog):
+    """Writes batches to a list instead of Postgres."""
+
+    def __init__(self, write_delay: float = 0.0, fail_times: int = 0, **kwargs):
+        super().__init__(connect=None, **kwargs)
+        self.batches = []
+        self.write_delay = write_delay
+        self.fail_times = fail_times
+        self.writing = threading.Event()
+
+    def _write(self, batch):
+        self.writing.set()
+        if self.write_delay:
+            threading.Event().wait(self.write_delay)
+        if self.fail_times:
+            self.fail_times -= 1
+            raise ConnectionError("database unavailable")
+        self.batches.append([event["id"] for event in batch])
+
+
+def test_full_batch_is_flushed_by_the_worker():
+    log = RecordingLog(batch_size=3, flush_interval=60)
+
+    async def scenario():
+        for i in range(7):
+            log.record({"id": i})
+        await asyncio.sleep(0.05)
+        await log.close()
+
+    asyncio.run(scenario())
+    assert log.batches == [[0, 1, 2], [3, 4, 5], [6]]
+    assert log.stats["written"] == 7
+
+
+def test_overflow_drops_oldest_events():
+    log = RecordingLog(max_events=3, batch_size=10)
+    for i in range(5):
+        log.record({"id": i})  # No running loop: nothing is flushed yet
+    asyncio.run(log.flush())
+    assert log.batches == [[2, 3, 4]]
+    assert log.stats["dropped"] == 2
+
+
+def test_failed_batch_is_retried_on_next_flush():
+    log = RecordingLog(batch_size=10, fail_times=1)
+    log.record({"id": 1})
+    asyncio.run(log.flush())
+    assert log.batches == [] and log.stats["failed_batches"] == 1
+    asyncio.run(log.flush())
+    assert log.batches == [[1]]
+
+
+def test_close_during_a_write_loses_nothing():
+    log = RecordingLog(batch_size=2, flush_interval=60, write_delay=0.1)
+
+    async def scenario():
+        for i in range(3):
+            log.record({"id": i})
+        await asyncio.to_thread(log.writing.wait, 1.0)  # Worker is inside flush()
+        await log.close()
+
+    asyncio.run(scenario())
+    assert sorted(i for batch in log.batches for i in batch) == [0, 1, 2]
+
+
+def test_record_chat_event_trims_and_rounds(monkeypatch):
+    log = RecordingLog()
+    monkeypatch.setattr(chat_events, "chat_event_log", log)
+    monkeypatch.setattr(chat_events, "CHAT_EVENT_LOG_ENABLED", True)
+    chat_events.record_chat_event("chat", "q" * 5000, "answered", 123.456, {"search": 12.345}, [])
+    event = log._queue[0]
+    assert len(event["query"]) == chat_events.MAX_QUERY_CHARS
+    assert event["total_ms"] == 123 and event["stage_ms"] == {"search": 12.3}
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import zipfile
+
+import numpy as np
+import pytest
+
+import collection_snapshot
+from collection_snapshot import EMBEDDING_DIMENSION, import_collection, read_snapshot, write_snapshot
+
+PAYLOADS = [{"content": "ZMP", "chapter_id": "chapter-3", "book": "b"}, {"content": "Gait", "chapter_id": "chapter-4", "book": "b"}]
+
+
+def snapshot(tmp_path, dimension=EMBEDDING_DIMENSION, **manifest_overrides):
+    path = tmp_path / "textbook.qsnap"
+    write_snapshot(path, ["a", "b"], np.ones((2, dimension), dtype=np.float32), PAYLOADS, "textbook_v1")
+    if manifest_overrides:
+        with zipfile.ZipFile(path) as archive:
+            files = {name: archive.read(name) for name in archive.namelist()}
+        manifest = {**json.loads(files["manifest.json"]), **manifest_overrides}
+        files["manifest.json"] = json.dumps(manifest).encode()
+        with zipfile.ZipFile(path, "w") as archive:
+            for name, data in files.items():
+                archive.writestr(name, data)
+    return path
+
+
+def test_round_trip(tmp_path):
+    manifest, ids, vectors, payloads = read_snapshot(snapshot(tmp_path))
+    assert ids == ["a", "b"] and payloads == PAYLOADS
+    assert vectors.shape == (2, EMBEDDING_DIMENSION)
+    assert collection_snapshot.incompatibility(manifest) is None
+
+
+class NoCollections:
+    async def create_collection(self, *args, **kwargs):
+        raise AssertionError("a mismatched snapshot must not create a collection")
+
+
+@pytest.mark.parametrize("dimension, overrides", [
+    (EMBEDDING_DIMENSION // 2, {}),
+    (EMBEDDING_DIMENSION, {"embedding_model": "models/some-other-embedding"}),
+])
+def test_mismatched_snapshot_is_refused(tmp_path, monkeypatch, dimension, overrides):
+    async def no_new_version(*args):
+        raise AssertionError("a mismatched snapshot must not create a version")
+
+    monkeypatch.setattr(collection_snapshot, "create_next_version", no_new_version)
+    path = snapshot(tmp_path, dimension, **overrides)
+    assert asyncio.run(import_collection(NoCollections(), path, concurrency=1)) is False
+
+
+def test_snapshot_without_chunk_text_is_refused(tmp_path, monkeypatch):
+    async def no_new_version(*args):
+        raise AssertionError("a snapshot without text must not create a version")
+
+    monkeypatch.setattr(collection_snapshot, "create_next_version", no_new_version)
+    path = tmp_path / "slim.qsnap"
+    slim = [{"chapter_id": "chapter-3", "book": "b"}, PAYLOADS[1]]
+    write_snapshot(path, ["a", "b"], np.ones((2, EMBEDDING_DIMENSION), dtype=np.float32), slim, "textbook_v1")
+    assert asyncio.run(import_collection(NoCollections(), path, concurrency=1)) is False
+
+
+class FailingUploads:
+    def __init__(self):
+        self.deleted = []
+        self.upserts = 0
+        self.cancelled = 0
+
+    async def upsert(self, collection_name, points):
+        self.upserts += 1
+        if self.upserts == 1:
+            raise RuntimeError("upsert rejected")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+    async def delete_collection(self, name):
+        self.deleted.append(name)
+
+
+def failing_import(tmp_path, monkeypatch, client, points=600, build_graph=None):
+    removed = []
+    monkeypatch.setattr(collection_snapshot, "create_next_version", lambda *args: asyncio.sleep(0, "textbook_v2"))
+    monkeypatch.setattr(collection_snapshot, "build_neighbor_graph", build_graph or (lambda *args: None))
+    monkeypatch.setattr(collection_snapshot, "remove_neighbor_graph", lambda name: removed.append(("graph", name)))
+    monkeypatch.setattr(collection_snapshot, "remove_content_store", lambda name: removed.append(("store", name)))
+    monkeypatch.setattr(collection_snapshot, "UPSERT_BATCH_SIZE", 100)
+    path = tmp_path / "big.qsnap"
+    payloads = [PAYLOADS[0]] * points
+    write_snapshot(path, list(range(points)), np.ones((points, EMBEDDING_DIMENSION), dtype=np.float32), payloads, "v1")
+    assert asyncio.run(import_collection(client, path, concurrency=6)) is False
+    return removed
+
+
+def test_failed_upload_cancels_the_other_batches_and_cleans_up(tmp_path, monkeypatch):
+    client = FailingUploads()
+    removed = failing_import(tmp_path, monkeypatch, client)
+    assert client.deleted == ["textbook_v2"]
+    assert client.cancelled == client.upserts - 1
+    assert set(removed) == {("graph", "textbook_v2"), ("store", "textbook_v2")}
+
+
+def test_failed_graph_build_drops_the_new_version(tmp_path, monkeypatch):
+    def broken_graph(*args):
+        raise OSError("disk full")
+
+    client = FailingUploads()
+    removed = failing_import(tmp_path, monkeypatch, client, build_graph=broken_graph)
+    assert client.deleted == ["textbook_v2"] and client.upserts == 0
+    assert ("graph", "textbook_v2") in removed
@@ -0,0 +1,70 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import agent
+import content_store
+from content_store import ContentStore, open_content_store, remove_content_store
+
+ZMP = "The zero moment point must stay inside the support polygon while the robot stands. " * 5
+ROWS = [
+    (1, {"content": ZMP, "chapter": "Chapter 3", "section": "Balance",
+         "chapter_url": "/docs/chapter-3", "chapter_id": "chapter-3"}),
+    ("2", {"content": "Gait cycles alternate stance and swing.", "chapter": "Chapter 4", "section": "Walking",
+           "chapter_url": "/docs/chapter-4", "chapter_id": "chapter-4"}),
+]
+
+
+def test_round_trip_by_point_id(tmp_path):
+    store = ContentStore(tmp_path / "textbook_v1.sqlite3")
+    store.put_many(ROWS)
+    assert store.count() == 2
+    stored = store.get_many([1, "2", "missing"])
+    assert set(stored) == {"1", "2"}  # Ids are stored as text; unknown ids are left out
+    assert stored["1"] == ROWS[0][1]
+    assert store.get_many([]) == {}
+
+
+def test_open_and_remove_follow_the_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(content_store, "CONTENT_STORE_DIR", tmp_path)
+    assert open_content_store("textbook_v1") is None
+    ContentStore(content_store.content_store_path("textbook_v1")).put_many(ROWS)
+    store = open_content_store("textbook_v1")
+    assert store is open_content_store("textbook_v1")
+    remove_content_store("textbook_v1")
+    assert open_content_store("textbook_v1") is None
+
+
+class FakeQdrant:
+    def __init__(self, payload):
+        self.payload = payload
+
+    async def get_collection(self, name):
+        return None
+
+    async def query_batch_points(self, collection_name, requests):
+        hit = SimpleNamespace(id=1, score=0.9, payload=self.payload, vector=None)
+        return [SimpleNamespace(points=[hit]) for _ in requests]
+
+
+def search(monkeypatch, payload, store):
+    monkeypatch.setattr(agent, "get_qdrant_client", lambda: FakeQdrant(payload))
+    monkeypatch.setattr(agent, "_generate_embeddings", lambda texts: asyncio.sleep(0, [[0.1]] * len(texts)))
+    monkeypatch.setattr(agent, "get_collection_version", lambda: asyncio.sleep(0, "textbook_v1"))
+    monkeypatch.setattr(agent, "open_content_store", lambda collection: store)
+    monkeypatch.setattr(agent, "NEIGHBOR_EXPANSION_HITS", 0)
+    return asyncio.run(agent.search_textbook("what is the zero moment point"))
+
+
+def test_search_reads_text_from_the_store(tmp_path, monkeypatch):
+    store = ContentStore(tmp_path / "textbook_v1.sqlite3")
+    store.put_many(ROWS)
+    result = search(monkeypatch, None, store)
+    assert [chunk["chapter"] for chunk in result["chunks"]] == ["Chapter 3"]
+    assert "support polygon" in result["chunks"][0]["content"]
+
+
+def test_slim_payloads_without_a_store_fail_the_search(monkeypatch):
+    with pytest.raises(agent.RetrievalUnavailable):
+        search(monkeypatch, {"book": agent.BOOK_ID, "chapter_id": "chapter-3"}, None)
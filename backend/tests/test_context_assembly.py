@@ -0,0 +1,93 @@
+import math
+import random
+
+from context_assembly import assemble_context, fuse_candidates, mmr_select, strip_overlap
+
+
+def reference_mmr(candidates, k, lambda_mult):
+    """The straightforward pure-Python MMR the numpy version must match."""
+    def cosine(a, b):
+        norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+        return sum(x * y for x, y in zip(a, b)) / norm if norm else 0.0
+
+    remaining, selected = list(candidates), []
+    while remaining and len(selected) < k:
+        values = [
+            lambda_mult * (c.get("score") or 0.0) - (1 - lambda_mult) * max(
+                (cosine(c["vector"], s["vector"]) for s in selected if c.get("vector") and s.get("vector")),
+                default=0.0,
+            )
+            for c in remaining
+        ]
+        selected.append(remaining.pop(values.index(max(values))))
+    return selected
+
+
+def test_mmr_matches_reference():
+    rng = random.Random(7)
+    for _ in range(20):
+        candidates = [
+            {
+                "id": i,
+                "score": rng.random(),
+                "vector": [rng.gauss(0, 1) for _ in range(16)] if rng.random() > 0.2 else None,
+            }
+            for i in range(30)
+        ]
+        expected = [c["id"] for c in reference_mmr(candidates, 8, 0.7)]
+        assert [c["id"] for c in mmr_select(candidates, 8, 0.7)] == expected
+
+
+def test_mmr_skips_near_duplicates():
+    candidates = [
+        {"id": "a", "score": 0.9, "vector": [1.0, 0.0]},
+        {"id": "a-copy", "score": 0.89, "vector": [1.0, 0.01]},
+        {"id": "b", "score": 0.8, "vector": [0.0, 1.0]},
+    ]
+    assert [c["id"] for c in mmr_select(candidates, 2, 0.5)] == ["a", "b"]
+    assert mmr_select([], 3) == []
+
+
+def test_strip_overlap_removes_shared_seams_and_contained_chunks():
+    seam = "The support polygon is the convex hull of the contact points. " * 2
+    first = "Intro to balance. " * 5 + seam
+    second = seam + "Walking shifts the polygon each step."
+    assert strip_overlap(second, [first]) == "Walking shifts the polygon each step."
+    assert strip_overlap(first, [second]) == ("Intro to balance. " * 5).strip()
+    assert strip_overlap(seam, [first]) == ""
+
+
+def test_fuse_keeps_best_score_per_point():
+    fused = fuse_candidates([
+        [{"id": 1, "score": 0.5}, {"id": 2, "score": 0.7}],
+        [{"id": 1, "score": 0.9}],
+    ])
+    assert [(c["id"], c["score"]) for c in fused] == [(1, 0.9), (2, 0.7)]
+
+
+def test_assemble_drops_low_scores_and_vectors():
+    candidates = [
+        {"content": "Servo motors " * 40, "score": 0.8, "vector": [1.0, 0.0]},
+        {"content": "Unrelated " * 40, "score": 0.1, "vector": [0.0, 1.0]},
+    ]
+    chunks = assemble_context(candidates, top_k=5, user_selected_text="my highlight")
+    assert [c["score"] for c in chunks] == [1.0, 0.8]
+    assert chunks[0]["chapter"] == "User Selection"
+    assert all("vector" not in c for c in chunks)
+
+
+def test_each_chunk_is_compressed_against_the_query_in_its_language():
+    def chunk(sentences, target, **extra):
+        text = " ".join(sentences[:7] + [target] + sentences[7:])
+        return {"id": target, "content": text, "score": 0.9, "vector": None, **extra}
+
+    english = [f"Filler sentence number {i} talks about something else entirely here." for i in range(9)]
+    urdu = [f"یہ جملہ نمبر {i} کسی اور موضوع کے بارے میں تفصیل سے بات کرتا ہے۔" for i in range(9)]
+    candidates = [
+        chunk(english, "The ZMP criterion keeps a walking robot balanced."),
+        chunk(urdu, "روبوٹ کا توازن زیرو مومنٹ پوائنٹ سے قائم رہتا ہے۔", localized=True),
+    ]
+    chunks = assemble_context(candidates, top_k=2, query="ZMP balance", localized_query="روبوٹ کا توازن")
+    assert "ZMP criterion" in chunks[0]["content"]
+    assert "زیرو مومنٹ" in chunks[1]["content"]
+    assert all("localized" not in c for c in chunks)
@@ -0,0 +1,56 @@
+from context_compression import compress_text, compute_idf, split_sentences, tokenize
+
+FILLER = "Robots in warehouses move boxes between shelves all day long."
+
+
+def compress(text, query, ratio=0.3):
+    return compress_text(text, tokenize(query), compute_idf([text]), ratio)
+
+
+def test_keeps_relevant_sentences_in_order_and_marks_gaps():
+    text = " ".join([
+        "The zero moment point keeps a biped balanced.",
+        *[FILLER] * 8,
+        "The zero moment point must stay inside the support polygon.",
+        *[FILLER] * 4,
+    ])
+    compressed = compress(text, "zero moment point")
+    assert compressed.startswith("The zero moment point keeps a biped balanced.")
+    assert "…" in compressed
+    assert "support polygon" in compressed
+    assert len(compressed) < len(text)
+
+
+def test_line_boundaries_and_list_items_survive():
+    text = "\n".join([
+        "Sensors used for balance:",
+        "- An inertial measurement unit measures tilt. It also reports angular rate.",
+        *[f"- {FILLER}" for _ in range(8)],
+        "- Force sensors under the feet locate the center of pressure.",
+        FILLER * 3,
+    ])
+    compressed = compress(text, "inertial measurement unit force sensors")
+    lines = compressed.splitlines()
+    assert "- An inertial measurement unit measures tilt. It also reports angular rate." in lines
+    assert any(line.endswith("- Force sensors under the feet locate the center of pressure.") for line in lines)
+
+
+def test_code_and_tables_are_not_compressed():
+    code = "Servo control loop:\n```python\n" + "\n".join(f"servo.write({i})  # {FILLER}" for i in range(20)) + "\n```"
+    assert compress(code, "servo control") == code
+    table = "| joint | limit |\n" + "\n".join(f"| joint {i} | {FILLER} |" for i in range(20))
+    assert compress(table, "joint limit") == table
+
+
+def test_urdu_text_is_tokenized_and_compressed():
+    assert tokenize("زیرو مومنٹ پوائنٹ") == ["زیرو", "مومنٹ", "پوائنٹ"]
+    filler = "گودام میں روبوٹ سارا دن ڈبے اٹھاتے ہیں۔"
+    text = " ".join(["زیرو مومنٹ پوائنٹ توازن کے لیے اہم ہے۔", *[filler] * 16])
+    assert len(split_sentences(text)) == 17
+    compressed = compress(text, "زیرو مومنٹ پوائنٹ کیا ہے")
+    assert compressed.startswith("زیرو مومنٹ پوائنٹ")
+    assert len(compressed) < len(text)
+
+
+def test_short_text_is_untouched():
+    assert compress("Short chunk. About ZMP.", "ZMP") == "Short chunk. About ZMP."
@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import pytest
+
+from deadline import (
+    MIN_STAGE_TIMEOUT,
+    DeadlineExceeded,
+    current_budget,
+    degraded_answer,
+    request_deadline,
+    stage_timeout,
+    timed_stage,
+    with_deadline,
+)
+
+CHUNK = {"chapter": "Chapter 3", "section": "Balance", "chapter_url": "/docs/chapter-3"}
+
+
+def test_stage_timeout_is_capped_by_the_budget_minus_reserve():
+    assert stage_timeout(10.0, reserve=0.3) == 10.0  # No budget: the stage's own default
+    with request_deadline(2.0):
+        assert 1.6 < stage_timeout(10.0, reserve=0.3) <= 1.7
+        assert stage_timeout(0.5) == 0.5
+        assert stage_timeout(10.0, reserve=5.0) == MIN_STAGE_TIMEOUT
+
+
+def test_slow_stage_hits_its_own_timeout():
+    with pytest.raises(DeadlineExceeded) as info:
+        asyncio.run(with_deadline(asyncio.sleep(1), default=0.05))
+    assert not info.value.budget_limited
+
+
+def test_expiring_budget_cuts_a_stage_short():
+    async def scenario():
+        with request_deadline(0.1):
+            start = time.monotonic()
+            try:
+                await with_deadline(asyncio.sleep(5), default=5.0)
+            finally:
+                assert time.monotonic() - start < 0.5
+
+    with pytest.raises(DeadlineExceeded) as info:
+        asyncio.run(scenario())
+    assert info.value.budget_limited
+
+
+def test_references_are_deduplicated_and_nested_budgets_share_stage_times():
+    with request_deadline(5.0) as outer:
+        outer.add_references([CHUNK, CHUNK, {**CHUNK, "chapter_url": ""}])
+        with request_deadline(1.0):
+            assert current_budget() is not outer
+            with timed_stage("embedding"):
+                pass
+    assert outer.references == [{"chapter": "Chapter 3", "section": "Balance", "url": "/docs/chapter-3"}]
+    assert "embedding" in outer.stage_ms
+    assert current_budget() is None
+
+
+def test_degraded_answer_lists_the_references():
+    with request_deadline(1.0) as budget:
+        budget.add_references([CHUNK])
+    answer = degraded_answer(budget.references)
+    assert "couldn't finish a full answer in time" in answer
+    assert "- **Chapter 3**, Balance — /docs/chapter-3" in answer
+    assert "try again" in degraded_answer([])
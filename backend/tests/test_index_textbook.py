@@ -0,0 +1,82 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import index_textbook
+from index_textbook import EMBEDDING_DIMENSION, validate_collection
+
+SAMPLE = {"section": "Balance", "chapter": "Bipedal Locomotion", "chapter_id": "chapter-3"}
+PAYLOAD = {
+    "content": "The ZMP ...", "chapter": "Bipedal Locomotion", "section": "Balance",
+    "chapter_url": "/docs/chapter-3", "chapter_id": "chapter-3", "book": "physical_ai_humanoid_robotics",
+}
+
+
+class FakeQdrant:
+    def __init__(self, points=3, dimension=EMBEDDING_DIMENSION, payloads=(PAYLOAD,)):
+        self.points = points
+        self.dimension = dimension
+        self.payloads = payloads
+
+    async def get_collection(self, name):
+        return SimpleNamespace(config=SimpleNamespace(params=SimpleNamespace(vectors=SimpleNamespace(size=self.dimension))))
+
+    async def count(self, name, exact=True):
+        return SimpleNamespace(count=self.points)
+
+    async def query_points(self, **kwargs):
+        return SimpleNamespace(points=[SimpleNamespace(id=i, payload=p) for i, p in enumerate(self.payloads)])
+
+
+@pytest.fixture(autouse=True)
+def fake_embeddings(monkeypatch):
+    async def embed(texts, task_type="RETRIEVAL_DOCUMENT"):
+        return [[0.1] * EMBEDDING_DIMENSION for _ in texts]
+    monkeypatch.setattr(index_textbook, "generate_embeddings_batch", embed)
+
+
+def validate(client, expected_points=3):
+    return asyncio.run(validate_collection(client, "textbook_v2", expected_points, 0, SAMPLE))
+
+
+def test_well_built_collection_passes():
+    assert validate(FakeQdrant())
+
+
+def test_wrong_dimension_or_count_fails():
+    assert not validate(FakeQdrant(dimension=EMBEDDING_DIMENSION // 2))
+    assert not validate(FakeQdrant(points=2))
+
+
+def test_hits_missing_payload_or_from_wrong_chapter_fail():
+    assert not validate(FakeQdrant(payloads=({**PAYLOAD, "chapter_url": None},)))
+    assert not validate(FakeQdrant(payloads=({**PAYLOAD, "chapter_id": "chapter-9"},)))
+
+
+def test_failed_build_discards_the_new_version(monkeypatch):
+    deleted, removed = [], []
+
+    class Client:
+        async def delete_collection(self, name):
+            deleted.append(name)
+
+    async def crash(*args):
+        raise RuntimeError("embedding quota exhausted")
+
+    async def next_version(client, alias, dimension):
+        return "textbook_v3"
+
+    monkeypatch.setattr(index_textbook, "QDRANT_URL", "http://qdrant")
+    monkeypatch.setattr(index_textbook, "QDRANT_API_KEY", "key")
+    monkeypatch.setattr(index_textbook, "GEMINI_API_KEY", "key")
+    monkeypatch.setattr(index_textbook, "AsyncQdrantClient", lambda **kwargs: Client())
+    monkeypatch.setattr(index_textbook, "create_next_version", next_version)
+    monkeypatch.setattr(index_textbook, "build_version", crash)
+    monkeypatch.setattr(index_textbook, "remove_content_store", removed.append)
+    monkeypatch.setattr(index_textbook, "remove_neighbor_graph", removed.append)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(index_textbook.index_chapters())
+    assert deleted == ["textbook_v3"]
+    assert removed == ["textbook_v3", "textbook_v3"]
@@ -0,0 +1,25 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import profiling
+
+METRICS_PATHS = ["/metrics/resilience", "/metrics/routing", "/metrics/event-loop", "/metrics/chat-events"]
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+@pytest.mark.parametrize("path", METRICS_PATHS)
+def test_metrics_require_admin_token(client, monkeypatch, path):
+    monkeypatch.setattr(profiling, "PROFILE_ADMIN_TOKEN", "s3cret")
+    assert client.get(path).status_code == 403
+    assert client.get(path, headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.get(path, headers={"X-Admin-Token": "s3cret"}).status_code == 200
+
+
+def test_metrics_disabled_without_configured_token(client, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_ADMIN_TOKEN", "")
+    assert client.get("/metrics/event-loop", headers={"X-Admin-Token": ""}).status_code == 403
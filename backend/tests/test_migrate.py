@@ -0,0 +1,112 @@
+import pytest
+
+import migrate
+from app.api import chat
+from migrate import LATEST_VERSION, SchemaCapabilities, available_migrations, get_capabilities
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.db.queries.append(sql)
+        if "information_schema.columns" in sql:
+            self.result = [(column,) for column in self.db.users_columns]
+        elif "to_regclass" in sql:
+            self.result = [(self.db.version is not None,)]
+        elif "MAX(version)" in sql:
+            self.result = [(self.db.version,)]
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+
+class FakeConnection:
+    def __init__(self, users_columns, version):
+        self.users_columns = users_columns
+        self.version = version
+        self.queries = []
+        self.closed = False
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fresh_capabilities(monkeypatch):
+    monkeypatch.setattr(migrate, "_capabilities", None)
+
+
+def test_migrations_are_numbered_in_order():
+    versions = [version for version, _, _ in available_migrations()]
+    assert versions == list(range(1, LATEST_VERSION + 1))
+
+
+def test_capabilities_are_probed_once(monkeypatch):
+    connections = []
+
+    def connect():
+        connections.append(FakeConnection(["id", "experience_level", "background", "language"], LATEST_VERSION))
+        return connections[-1]
+
+    first = get_capabilities(connect)
+    assert get_capabilities(connect) is first
+    assert len(connections) == 1 and connections[0].closed
+    assert first.version == LATEST_VERSION and first.has_user_column("language")
+
+
+def test_failed_probe_is_retried_later():
+    def unavailable():
+        raise OSError("database is starting up")
+
+    assert get_capabilities(unavailable) is None
+    assert get_capabilities(lambda: FakeConnection(["id"], None)).version == 0
+
+
+@pytest.mark.parametrize("capabilities, expected", [
+    (SchemaCapabilities(version=2, users_columns=["background", "experience_level", "language"]),
+     "SELECT experience_level, background, language FROM users WHERE id = %s"),
+    (SchemaCapabilities(version=1, users_columns=["experience_level"]),
+     "SELECT experience_level FROM users WHERE id = %s"),
+    (None, "SELECT experience_level FROM users WHERE id = %s"),
+])
+def test_profile_query_only_reads_existing_columns(monkeypatch, capabilities, expected):
+    monkeypatch.setattr(chat, "get_capabilities", lambda connect: capabilities)
+    assert chat.user_profile_query() == expected
+
+
+def test_missing_columns_fall_back_to_defaults(monkeypatch):
+    class Cursor(FakeCursor):
+        def execute(self, sql, params=None):
+            self.db.queries.append(sql)
+            self.result = [{"experience_level": "advanced"}]
+
+    conn = FakeConnection([], 1)
+    conn.cursor = lambda **kwargs: Cursor(conn)
+    monkeypatch.setattr(chat, "get_db_connection", lambda: conn)
+    monkeypatch.setattr(chat, "get_capabilities", lambda connect: SchemaCapabilities(version=1, users_columns=[]))
+
+    profile = chat.fetch_user_profile_from_db("u1")
+    assert profile == {
+        "experience_level": "advanced",
+        "background": "Profile not provided; using default settings.",
+        "language": "english",
+    }
+    assert conn.queries == ["SELECT experience_level FROM users WHERE id = %s"]
@@ -0,0 +1,55 @@
+import importlib
+
+import pytest
+
+import model_routing
+from model_routing import classify_question
+
+
+@pytest.mark.parametrize("question", ["What is a servo?", "Define ZMP", "what's an actuator"])
+def test_short_definitional_questions_go_light(question):
+    decision = classify_question(question)
+    assert decision.tier.name == "light"
+    assert decision.reasons == ["definitional"]
+
+
+@pytest.mark.parametrize("question, reason", [
+    ("Derive the ZMP equations step by step", "multi-step wording"),
+    ("Compare position control with torque control", "multi-step wording"),
+    ("What is the zero moment point? What is a support polygon?", "compound question"),
+    (" ".join(["word"] * 30), "long question"),
+])
+def test_complex_or_multi_part_questions_go_full(question, reason):
+    decision = classify_question(question)
+    assert decision.tier.name == "full"
+    assert reason in decision.reasons
+
+
+def test_retrieval_scores_and_selection_shape_the_route():
+    assert classify_question("servo torque limits").tier.name == "full"  # Unsure: default
+    confident = classify_question("servo torque limits", scores=[0.9, 0.6, 0.55])
+    assert confident.tier.name == "light" and confident.reasons == ["short, one clear source"]
+    broad = classify_question("servo torque limits", scores=[0.8, 0.79, 0.78])
+    assert broad.tier.name == "full" and broad.reasons == ["broad retrieval"]
+    assert classify_question("What is a servo?", "x" * 700).reasons == ["long selection"]
+
+
+@pytest.fixture
+def reload_routing(monkeypatch):
+    def reload(**env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        return importlib.reload(model_routing)
+
+    yield reload
+    monkeypatch.undo()
+    importlib.reload(model_routing)
+
+
+def test_env_overrides_tiers_and_switch(reload_routing):
+    module = reload_routing(
+        GEMINI_LIGHT_MODEL="gemini-test-lite", LIGHT_MAX_TOKENS="300", MODEL_ROUTING_ENABLED="false"
+    )
+    assert not module.ROUTING_ENABLED
+    light = module.classify_question("What is a servo?").tier
+    assert (light.model, light.max_tokens) == ("gemini-test-lite", 300)
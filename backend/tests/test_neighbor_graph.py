@@ -0,0 +1,54 @@
+import asyncio
+import os
+import sys
+
+import numpy as np
+import pytest
+
+import neighbor_graph
+from app.api.related import get_related
+from neighbor_graph import build_neighbor_graph, compute_knn, load_neighbor_graph, mark_live, neighbor_graph_path
+
+
+def section_payloads(sections):
+    return [{"chapter_id": chapter, "section": section, "chapter": chapter, "chapter_url": None}
+            for chapter, section in sections]
+
+
+@pytest.fixture
+def graph_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(neighbor_graph, "NEIGHBOR_GRAPH_DIR", tmp_path)
+    neighbor_graph._loaded_graphs.clear()
+    return tmp_path
+
+
+def test_knn_excludes_self_and_sorts_by_score():
+    vectors = np.array([[1, 0], [0.9, 0.1], [0, 1], [0.1, 0.9]], dtype=np.float32)
+    indices, scores = compute_knn(vectors, k=2, block_size=3)
+    assert indices[0].tolist() == [1, 3]
+    assert all(i not in row for i, row in enumerate(indices.tolist()))
+    assert (np.diff(scores.astype(np.float32), axis=1) <= 0).all()
+
+
+def test_graph_is_reloaded_after_a_rebuild(graph_dir):
+    path = neighbor_graph_path("textbook_v1")
+    sections = [("ch1", "Balance"), ("ch1", "ZMP"), ("ch2", "Gait")]
+    vectors = np.eye(3, dtype=np.float32)
+    build_neighbor_graph(path, ["a", "b", "c"], vectors, section_payloads(sections))
+    first = load_neighbor_graph("textbook_v1")
+    assert load_neighbor_graph("textbook_v1") is first
+
+    build_neighbor_graph(path, ["a", "b", "c", "d"], np.eye(4, dtype=np.float32), section_payloads(sections + [("ch3", "Arms")]))
+    os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 5))
+    assert load_neighbor_graph("textbook_v1").ids == ["a", "b", "c", "d"]
+
+
+def test_related_uses_live_pointer_without_the_agent(graph_dir, monkeypatch):
+    sections = [("ch1", "Balance"), ("ch1", "ZMP"), ("ch2", "Gait")]
+    vectors = np.array([[1, 0], [0.9, 0.1], [0.8, 0.3]], dtype=np.float32)
+    build_neighbor_graph(neighbor_graph_path("textbook_v2"), ["a", "b", "c"], vectors, section_payloads(sections))
+    mark_live("textbook_v2")
+    monkeypatch.setitem(sys.modules, "agent", None)  # Importing it would raise
+
+    response = asyncio.run(get_related("ch1", "Balance"))
+    assert [link.section for link in response.related] == ["ZMP", "Gait"]
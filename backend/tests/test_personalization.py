@@ -0,0 +1,55 @@
+import asyncio
+from datetime import datetime, timezone
+
+from starlette.requests import Request
+
+from app.api.personalization import is_not_modified, version_headers
+from user_profiles import invalidate_profile, known_profile_version, profile_version, remember_profile_version
+
+UPDATED_AT = datetime(2026, 3, 1, 12, 30, 15, 250000, tzinfo=timezone.utc)
+SETTINGS = {"experience_level": "beginner", "language": "urdu"}
+
+
+def request_with(**headers):
+    return Request({"type": "http", "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]})
+
+
+def test_etag_tracks_settings_and_is_weak():
+    etag, last_modified = profile_version("u1", SETTINGS, UPDATED_AT)
+    assert etag.startswith('W/"') and last_modified == UPDATED_AT
+    assert etag == profile_version("u1", dict(SETTINGS), UPDATED_AT)[0]
+    assert etag != profile_version("u1", {**SETTINGS, "language": "english"}, UPDATED_AT)[0]
+
+
+def test_version_headers_use_http_dates():
+    headers = version_headers(profile_version("u1", SETTINGS, UPDATED_AT))
+    assert headers["Last-Modified"] == "Sun, 01 Mar 2026 12:30:15 GMT"
+    assert headers["ETag"].startswith('W/"')
+
+
+def test_if_none_match_wins_and_compares_weakly():
+    version = profile_version("u1", SETTINGS, UPDATED_AT)
+    strong = version[0].removeprefix("W/")
+    assert is_not_modified(request_with(if_none_match=strong), version)
+    assert is_not_modified(request_with(if_none_match=f'"other", {version[0]}'), version)
+    assert is_not_modified(request_with(if_none_match="*"), version)
+    # A stale ETag means modified, even with a current If-Modified-Since
+    assert not is_not_modified(
+        request_with(if_none_match='"stale"', if_modified_since="Sun, 01 Mar 2026 12:30:15 GMT"), version
+    )
+
+
+def test_if_modified_since_has_second_precision():
+    version = profile_version("u1", SETTINGS, UPDATED_AT)
+    assert is_not_modified(request_with(if_modified_since="Sun, 01 Mar 2026 12:30:15 GMT"), version)
+    assert not is_not_modified(request_with(if_modified_since="Sun, 01 Mar 2026 12:30:14 GMT"), version)
+    assert not is_not_modified(request_with(if_modified_since="not a date"), version)
+    assert not is_not_modified(request_with(), version)
+
+
+def test_remembered_version_is_dropped_on_invalidate():
+    version = profile_version("u2", SETTINGS, UPDATED_AT)
+    remember_profile_version("u2", version)
+    assert known_profile_version("u2") == version
+    asyncio.run(invalidate_profile("u2"))
+    assert known_profile_version("u2") is None
@@ -0,0 +1,40 @@
+import asyncio
+
+from agents import RunContextWrapper
+
+import agent
+from app.api import chat
+
+PROFILE = agent.UserProfile(experience_level="beginner", background="High school student", language="urdu")
+
+
+def instructions_for(profile):
+    tutor = agent.get_agent(profile.language if profile else "english")
+    context = agent.TutorContext(user_id="u1", profile=profile)
+    return tutor.instructions(RunContextWrapper(context=context), tutor)
+
+
+def test_instructions_render_the_learner_profile():
+    text = instructions_for(PROFILE)
+    assert "- Experience level: beginner" in text
+    assert "- Background: High school student" in text
+    assert "Respond in urdu" in text
+    assert "do not call user_context_tool" in text
+
+
+def test_without_a_profile_the_tool_stays_the_fallback():
+    text = instructions_for(None)
+    assert "Learner profile" not in text
+    assert "call user_context_tool only if no profile is given" in text
+
+
+def test_every_rendered_profile_field_is_in_the_answer_key(monkeypatch):
+    monkeypatch.setattr(chat, "get_collection_version", lambda: asyncio.sleep(0, "textbook_v1"))
+
+    def key(profile):
+        return asyncio.run(chat.answer_cache_key(profile.language, "What is ZMP?", None, profile))
+
+    for change in ({"experience_level": "advanced"}, {"background": "Retired engineer"}, {"language": "arabic"}):
+        other = PROFILE.model_copy(update=change)
+        assert instructions_for(other) != instructions_for(PROFILE)
+        assert key(other) != key(PROFILE), f"{change} changes the instructions but not the cache key"
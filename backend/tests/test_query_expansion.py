@@ -0,0 +1,32 @@
+from query_expansion import split_query
+
+
+def test_comparison_carries_shared_head_noun():
+    assert split_query("difference between forward and inverse kinematics")[1:] == [
+        "forward kinematics", "inverse kinematics",
+    ]
+
+
+def test_comparison_keeps_named_sides_and_tail():
+    assert split_query("compare LiDAR and stereo cameras for SLAM on a humanoid")[1:] == [
+        "LiDAR for SLAM on a humanoid", "stereo cameras for SLAM on a humanoid",
+    ]
+
+
+def test_follow_up_pronoun_gets_the_subject():
+    assert split_query("What is ZMP and how is it computed?")[1:] == ["What is ZMP", "how is ZMP computed"]
+
+
+def test_fragments_fall_back_to_original():
+    assert split_query("Is it true? Yes.") == ["Is it true? Yes."]
+    assert split_query("ROS vs ROS2") == ["ROS vs ROS2"]
+
+
+def test_simple_question_is_not_split():
+    assert split_query("What is a servo motor?") == ["What is a servo motor?"]
+
+
+def test_original_is_first_and_count_is_capped():
+    queries = split_query("What is ZMP? What is a servo? What is LiDAR? What is SLAM?", max_queries=3)
+    assert queries[0].startswith("What is ZMP?")
+    assert len(queries) == 3
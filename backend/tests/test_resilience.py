@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from deadline import DeadlineExceeded, request_deadline, with_deadline
+from resilience import CircuitBreaker, CircuitOpenError, Upstream
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    upstream = Upstream("test")
+
+    async def failing():
+        raise RuntimeError("boom")
+
+    async def scenario():
+        for _ in range(upstream.breaker.failure_threshold):
+            with pytest.raises(RuntimeError):
+                await upstream.call(failing)
+        with pytest.raises(CircuitOpenError):
+            await upstream.call(failing)
+
+    run(scenario())
+    assert upstream.breaker.state == CircuitBreaker.OPEN
+    assert upstream.metrics["rejected"] == 1
+
+
+def test_half_open_probe_closes_on_success():
+    breaker = CircuitBreaker("test", failure_threshold=1, open_seconds=0.0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # Only one probe at a time
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_budget_limited_deadline_is_not_an_upstream_failure():
+    upstream = Upstream("test")
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def scenario():
+        with request_deadline(0.01):
+            for _ in range(upstream.breaker.failure_threshold + 1):
+                with pytest.raises(DeadlineExceeded) as info:
+                    await upstream.call(lambda: with_deadline(slow(), 5.0))
+                assert info.value.budget_limited
+
+    run(scenario())
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+    assert upstream.metrics["failures"] == 0
+
+
+def test_own_timeout_counts_as_failure():
+    upstream = Upstream("test")
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def scenario():
+        with pytest.raises(DeadlineExceeded) as info:
+            await upstream.call(lambda: with_deadline(slow(), 0.01))
+        assert not info.value.budget_limited
+
+    run(scenario())
+    assert upstream.metrics["failures"] == 1
+
+
+def test_hedge_wins_when_primary_is_slow():
+    upstream = Upstream("test")
+    upstream.hedge_delay = lambda: 0.01
+    calls = []
+
+    async def attempt():
+        calls.append(len(calls))
+        await asyncio.sleep(1.0 if len(calls) == 1 else 0.0)
+        return len(calls)
+
+    assert run(upstream.call(attempt, hedge=True)) == 2
+    assert upstream.metrics["hedge_wins"] == 1
+
+
+def test_cancelled_caller_cancels_primary():
+    upstream = Upstream("test")
+    upstream.hedge_delay = lambda: 10.0
+    started = []
+
+    async def attempt():
+        started.append(asyncio.current_task())
+        await asyncio.sleep(10)
+
+    async def scenario():
+        caller = asyncio.ensure_future(upstream.call(attempt, hedge=True))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+        return started[0]
+
+    primary = run(scenario())
+    assert primary.cancelled()
+    assert upstream.breaker._probe_in_flight is False
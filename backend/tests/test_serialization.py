@@ -0,0 +1,52 @@
+import gzip
+import json
+
+import pytest
+from starlette.requests import Request
+
+import serialization
+from serialization import dumps, fast_json_response
+
+LARGE = {"response": "The zero moment point must stay inside the support polygon. " * 40}
+
+
+def request_with(accept_encoding):
+    return Request({"type": "http", "headers": [(b"accept-encoding", accept_encoding.encode())]})
+
+
+def test_dumps_is_compact_utf8():
+    assert dumps({"text": "زیرو", "n": 1}) == '{"text":"زیرو","n":1}'.encode("utf-8")
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate", "gzip"),
+    ("gzip;q=0", None),
+    ("br;q=0, gzip", "gzip"),
+    ("identity", None),
+    ("*", "gzip"),
+    ("*;q=0.5, gzip;q=0", None),
+    ("x-gzip-ish", None),
+    ("", None),
+])
+def test_accept_encoding_honours_q_values(monkeypatch, header, expected):
+    monkeypatch.setattr(serialization, "brotli", None)
+    assert serialization._accepted_encoding(request_with(header)) == expected
+
+
+def test_brotli_preferred_only_when_acceptable(monkeypatch):
+    monkeypatch.setattr(serialization, "brotli", object())
+    assert serialization._accepted_encoding(request_with("gzip, br")) == "br"
+    assert serialization._accepted_encoding(request_with("gzip;q=1, br;q=0.5")) == "gzip"
+    assert serialization._accepted_encoding(request_with("brotli-like, gzip;q=0.1")) == "gzip"
+
+
+def test_large_bodies_are_gzipped_and_all_negotiable_responses_vary(monkeypatch):
+    monkeypatch.setattr(serialization, "brotli", None)
+    compressed = fast_json_response(LARGE, request_with("gzip"))
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert json.loads(gzip.decompress(compressed.body)) == LARGE
+    assert compressed.headers["vary"] == "Accept-Encoding"
+
+    for response in (fast_json_response(LARGE, request_with("identity")), fast_json_response({"ok": True}, request_with("gzip"))):
+        assert "content-encoding" not in response.headers
+        assert response.headers["vary"] == "Accept-Encoding"
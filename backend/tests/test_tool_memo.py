@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from tool_memo import ToolMemo, normalize_arg
+
+
+def test_normalization_ignores_case_punctuation_and_spacing():
+    assert normalize_arg("  What is   ZMP?! ") == normalize_arg("what is zmp")
+    assert normalize_arg(5) == 5
+
+
+def test_language_symbols_are_kept():
+    assert normalize_arg("What is C++?") == "what is c++"
+    assert len({normalize_arg(q) for q in ("what is c", "what is c++", "what is c#")}) == 3
+
+
+def test_equivalent_calls_run_once():
+    memo = ToolMemo()
+    calls = []
+
+    async def search():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"chunks": []}
+
+    async def scenario():
+        first = memo.get_or_run("rag_search_tool", {"query": "What is ZMP?"}, search)
+        second = memo.get_or_run("rag_search_tool", {"query": "what is zmp"}, search)
+        results = await asyncio.gather(first, second)
+        await memo.get_or_run("rag_search_tool", {"query": "What is ZMP"}, search)
+        return results
+
+    assert asyncio.run(scenario()) == [{"chunks": []}] * 2
+    assert len(calls) == 1
+    assert memo.stats == {"calls": 3, "hits": 2}
+
+
+def test_failures_are_not_memoized():
+    memo = ToolMemo()
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("qdrant down")
+        return "ok"
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await memo.get_or_run("rag_search_tool", {"query": "q"}, flaky)
+        return await memo.get_or_run("rag_search_tool", {"query": "q"}, flaky)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert len(attempts) == 2
@@ -0,0 +1,56 @@
+import asyncio
+
+import translation
+from cache import TwoTierCache
+from translation import TranslationStore, content_hash, localize_candidates, needs_translation, translate_query
+
+
+def test_only_other_languages_need_translation():
+    assert needs_translation("urdu")
+    assert not needs_translation("English")
+    assert not needs_translation(None)
+
+
+def test_query_translation_is_cached(monkeypatch):
+    calls = []
+
+    async def translate_text(text, target_language):
+        calls.append((text, target_language))
+        return "what is the zero moment point"
+
+    monkeypatch.setattr(translation, "translate_text", translate_text)
+    monkeypatch.setattr(translation, "query_translation_cache", TwoTierCache("test", ttl=60, backend=None))
+
+    async def twice():
+        return [await translate_query("زیرو مومنٹ پوائنٹ کیا ہے؟", "Urdu") for _ in range(2)]
+
+    assert asyncio.run(twice()) == ["what is the zero moment point"] * 2
+    assert calls == [("زیرو مومنٹ پوائنٹ کیا ہے؟", "english")]
+
+
+def test_failed_or_empty_translation_searches_with_the_original(monkeypatch):
+    async def failing(text, target_language):
+        raise RuntimeError("gemini down")
+
+    monkeypatch.setattr(translation, "query_translation_cache", TwoTierCache("test", ttl=60, backend=None))
+    monkeypatch.setattr(translation, "translate_text", failing)
+    assert asyncio.run(translate_query("توازن", "urdu")) == "توازن"
+    monkeypatch.setattr(translation, "translate_text", lambda text, target: asyncio.sleep(0, ""))
+    assert asyncio.run(translate_query("توازن", "urdu")) == "توازن"
+
+
+def test_localize_swaps_and_marks_translated_chunks(tmp_path, monkeypatch):
+    store = TranslationStore(tmp_path / "translations.sqlite3")
+    store.put_many("urdu", [(content_hash("Balance matters."), "توازن اہم ہے۔")])
+    monkeypatch.setattr(translation, "get_translation_store", lambda: store)
+    candidates = [{"content": "Balance matters."}, {"content": "Gait cycles."}]
+
+    assert localize_candidates(candidates, "Urdu") == 1
+    assert candidates == [{"content": "توازن اہم ہے۔", "localized": True}, {"content": "Gait cycles."}]
+
+
+def test_localize_without_a_store_is_a_no_op(monkeypatch):
+    monkeypatch.setattr(translation, "get_translation_store", lambda: None)
+    candidates = [{"content": "Balance matters."}]
+    assert localize_candidates(candidates, "urdu") == 0
+    assert candidates == [{"content": "Balance matters."}]
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import time
+
+import agent
+import geminiconfig
+import warm_answer_cache
+from app.api import chat
+from warm_answer_cache import RateLimiter, load_progress, record_progress, warm_one
+
+JOB = {"chapter": "chapter-1", "question": "What is ZMP?", "language": "english", "level": "beginner"}
+
+
+def test_only_recent_successes_count_as_done(tmp_path):
+    path = tmp_path / "progress.jsonl"
+    record_progress(path, "ans:warmed", JOB, "warmed")
+    record_progress(path, "ans:failed", JOB, "failed")
+    record_progress(path, "ans:retried", JOB, "failed")
+    record_progress(path, "ans:retried", JOB, "cached")
+    with open(path, "a") as f:
+        f.write(json.dumps({"key": "ans:expired", "status": "warmed", "at": time.time() - 7200}) + "\n")
+        f.write('{"id": "english|beginner|old format", "status": "warmed"}\n{"key": "cut sh')
+    assert load_progress(path, max_age=3600) == {"ans:warmed", "ans:retried"}
+
+
+def test_new_collection_version_changes_the_key(monkeypatch):
+    async def version(name):
+        monkeypatch.setattr(chat, "get_collection_version", lambda: asyncio.sleep(0, name))
+        return await warm_answer_cache.job_key(JOB)
+
+    assert asyncio.run(version("textbook_v1")) != asyncio.run(version("textbook_v2"))
+
+
+def test_exhausted_retries_report_failed(monkeypatch):
+    calls = []
+
+    async def failing_run(*args):
+        calls.append(args)
+        raise RuntimeError("upstream down")
+
+    class EmptyCache:
+        async def get(self, key):
+            return None
+
+    monkeypatch.setattr(chat, "run_tutor", failing_run)
+    monkeypatch.setattr(chat, "answer_cache", EmptyCache())
+    monkeypatch.setattr(agent, "get_agent", lambda language: None)
+    monkeypatch.setattr(geminiconfig, "get_gemini_config", lambda *args: None)
+    monkeypatch.setattr(warm_answer_cache, "RATE_LIMIT_BACKOFF_SECONDS", 0.0)
+
+    status = asyncio.run(warm_one(JOB, "ans:key", RateLimiter(0)))
+    assert status == "failed"
+    assert len(calls) == warm_answer_cache.MAX_ATTEMPTS
+
+
+def test_answers_without_the_textbook_are_not_warmed(monkeypatch):
+    stored = []
+
+    async def run_without_search(*args):
+        from deadline import current_budget
+        current_budget().retrieval_failed = True
+        return {"response": "I don't have that information in the textbook.", "sources": []}
+
+    class RecordingCache:
+        async def get(self, key):
+            return None
+
+        async def set(self, key, value):
+            stored.append(key)
+
+    monkeypatch.setattr(chat, "run_tutor", run_without_search)
+    monkeypatch.setattr(chat, "answer_cache", RecordingCache())
+    monkeypatch.setattr(agent, "get_agent", lambda language: None)
+    monkeypatch.setattr(geminiconfig, "get_gemini_config", lambda *args: None)
+    monkeypatch.setattr(warm_answer_cache, "RATE_LIMIT_BACKOFF_SECONDS", 0.0)
+
+    assert asyncio.run(warm_one(JOB, "ans:key", RateLimiter(0))) == "failed"
+    assert stored == []
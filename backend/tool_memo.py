@@ -0,0 +1,54 @@
+"""
+Run-scoped memoization of tool results.
+
+Within one Runner.run the model often repeats a tool call with the same or a
+trivially reworded query (case, punctuation, spacing). ToolMemo lives on the
+run context (agent.TutorContext), keys results on the tool name plus its
+normalized arguments, and returns the earlier result without repeating the
+embedding, Qdrant search or DB lookup. Concurrent identical calls (parallel
+tool calls) share one computation; failures are not memoized.
+"""
+import asyncio
+import re
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+# "+" and "#" are kept so "c++" and "c#" don't collide with "c"
+_NON_WORD = re.compile(r"[^\w\s+#]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_arg(value: Any) -> Any:
+    """Case-, punctuation- and whitespace-insensitive form of a text argument."""
+    if isinstance(value, str):
+        return _SPACES.sub(" ", _NON_WORD.sub(" ", value.casefold())).strip()
+    return value
+
+
+class ToolMemo:
+    def __init__(self):
+        self._results: Dict[Tuple[Any, ...], asyncio.Future] = {}
+        self.stats = {"calls": 0, "hits": 0}
+
+    async def get_or_run(
+        self,
+        tool: str,
+        args: Dict[str, Any],
+        compute: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        key = (tool,) + tuple(sorted((name, normalize_arg(value)) for name, value in args.items()))
+        self.stats["calls"] += 1
+        future = self._results.get(key)
+        if future is not None:
+            self.stats["hits"] += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(compute())
+        self._results[key] = future
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            self._results.pop(key, None)
+            raise
+
+    def summary(self) -> str:
+        return f"{self.stats['hits']}/{self.stats['calls']} tool calls served from run memo"
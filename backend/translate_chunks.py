@@ -0,0 +1,130 @@
+"""
+Translate the live collection's chunks for cross-lingual retrieval.
+
+Run after index_textbook.py. Every chunk of the live collection version is
+translated into each language in TRANSLATION_LANGUAGES and stored in the
+translation store (see translation.py) under its content hash. Chunks whose
+text is unchanged since a previous run are skipped, so re-running after a
+re-index only translates what changed.
+
+Usage:
+    python translate_chunks.py [--languages urdu,arabic] [--concurrency 4]
+"""
+import argparse
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+BASE_DIR = Path(__file__).resolve().parent
+ENV_PATH = BASE_DIR / '.env'
+load_dotenv(dotenv_path=ENV_PATH)
+
+from qdrant_client import AsyncQdrantClient
+
+from collection_versions import resolve_alias
+from content_store import open_content_store
+from translation import TranslationStore, content_hash, translate_text
+from warm_answer_cache import MAX_ATTEMPTS, RATE_LIMIT_BACKOFF_SECONDS, RateLimiter, is_rate_limit_error
+
+QDRANT_URL = os.getenv("QDRANT_URL", "")
+QDRANT_API_KEY = os.getenv("QDRANT_API_KEY", "")
+COLLECTION_NAME = "physical_ai_textbook"
+TRANSLATION_LANGUAGES = os.getenv("TRANSLATION_LANGUAGES", "urdu")
+TRANSLATION_CONCURRENCY = int(os.getenv("TRANSLATION_CONCURRENCY", "4"))
+TRANSLATION_REQUESTS_PER_MINUTE = float(os.getenv("TRANSLATION_REQUESTS_PER_MINUTE", "30"))
+CHUNK_TRANSLATION_TIMEOUT = 120.0
+SCROLL_PAGE_SIZE = 256
+
+
+async def live_chunk_texts(client: AsyncQdrantClient) -> List[str]:
+    """Distinct chunk texts of the live version (from the content store if any)."""
+    collection = await resolve_alias(client, COLLECTION_NAME) or COLLECTION_NAME
+    store = open_content_store(collection)
+    texts: Dict[str, str] = {}
+    offset = None
+    while True:
+        points, offset = await client.scroll(
+            collection_name=collection,
+            limit=SCROLL_PAGE_SIZE,
+            offset=offset,
+            with_payload=store is None,
+            with_vectors=False,
+        )
+        stored = store.get_many([point.id for point in points]) if store else {}
+        for point in points:
+            payload = stored.get(str(point.id)) if store else point.payload
+            content = (payload or {}).get("content")
+            if content:
+                texts[content_hash(content)] = content
+        if offset is None:
+            break
+    print(f"'{collection}': {len(texts)} distinct chunks")
+    return list(texts.values())
+
+
+async def translate_language(
+    texts: List[str],
+    language: str,
+    store: TranslationStore,
+    limiter: RateLimiter,
+    concurrency: int,
+) -> bool:
+    existing = store.get_many(language, [content_hash(text) for text in texts])
+    pending = [text for text in texts if content_hash(text) not in existing]
+    print(f"[{language}] {len(texts) - len(pending)} chunks already translated, {len(pending)} to go")
+    semaphore = asyncio.Semaphore(concurrency)
+    failed = 0
+
+    async def run(text: str) -> None:
+        nonlocal failed
+        async with semaphore:
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                await limiter.wait()
+                try:
+                    translated = await translate_text(text, language, timeout=CHUNK_TRANSLATION_TIMEOUT)
+                    if translated:
+                        # Stored right away, so an interrupted run resumes here
+                        store.put_many(language, [(content_hash(text), translated)])
+                    return
+                except Exception as e:
+                    if attempt == MAX_ATTEMPTS:
+                        print(f"  ❌ Chunk failed: {e}")
+                        failed += 1
+                        return
+                    if is_rate_limit_error(e):
+                        limiter.back_off(RATE_LIMIT_BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+    await asyncio.gather(*(run(text) for text in pending))
+    print(f"[{language}] done: {len(pending) - failed} translated, {failed} failed")
+    return failed == 0
+
+
+async def main(args: argparse.Namespace) -> bool:
+    if not QDRANT_URL:
+        print("❌ QDRANT_URL must be set in .env file")
+        return False
+    languages = [item.strip().lower() for item in args.languages.split(",") if item.strip()]
+    client = AsyncQdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY or None)
+    start = time.time()
+    texts = await live_chunk_texts(client)
+    store = TranslationStore()
+    limiter = RateLimiter(args.requests_per_minute)
+    ok = True
+    for language in languages:
+        ok = await translate_language(texts, language, store, limiter, args.concurrency) and ok
+    print(f"✅ Finished in {time.time() - start:.0f}s; store: {store.path}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Translate textbook chunks for non-English learners.")
+    parser.add_argument("--languages", default=TRANSLATION_LANGUAGES)
+    parser.add_argument("--concurrency", type=int, default=TRANSLATION_CONCURRENCY)
+    parser.add_argument("--requests-per-minute", type=float, default=TRANSLATION_REQUESTS_PER_MINUTE)
+    success = asyncio.run(main(parser.parse_args()))
+    if not success:
+        exit(1)
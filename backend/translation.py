@@ -0,0 +1,159 @@
+"""
+Cross-lingual retrieval support for non-English learners.
+
+The collection is embedded in English. For a learner whose language is e.g.
+Urdu or Arabic:
+
+- the query is translated to English once (cached in the two-tier cache) so
+  it can be matched against the English vectors, and
+- retrieved chunks are swapped for their translations from a local store
+  (translations.sqlite3, keyed by language + content hash) that
+  translate_chunks.py fills offline after indexing. Unchanged chunks keep
+  their translations across re-indexes.
+
+The model then receives context already in the learner's language instead
+of translating long English excerpts on every turn. Chunks without a stored
+translation are passed through in English.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from cache import TwoTierCache, make_key
+from deadline import with_deadline
+from resilience import get_upstream
+
+BASE_DIR = Path(__file__).resolve().parent
+MULTILINGUAL_ENABLED = os.getenv("MULTILINGUAL_ENABLED", "true").lower() in ("1", "true", "yes")
+TRANSLATION_STORE_PATH = Path(os.getenv("TRANSLATION_STORE_PATH", str(BASE_DIR / "translations.sqlite3")))
+QUERY_TRANSLATION_CACHE_TTL = 30 * 24 * 3600  # Translations don't go stale
+QUERY_TRANSLATION_TIMEOUT = 3.0
+SOURCE_LANGUAGE = "english"
+
+query_translation_cache = TwoTierCache("query_translation", ttl=QUERY_TRANSLATION_CACHE_TTL)
+
+
+def needs_translation(language: Optional[str]) -> bool:
+    return MULTILINGUAL_ENABLED and bool(language) and language.lower() != SOURCE_LANGUAGE
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+async def translate_text(text: str, target_language: str, timeout: float = QUERY_TRANSLATION_TIMEOUT) -> str:
+    """Translate with the Gemini chat model (no agent run, one request)."""
+    from geminiconfig import GEMINI_MODEL, get_gemini_client
+
+    client = get_gemini_client()
+    response = await get_upstream("gemini_llm").call(lambda: with_deadline(
+        client.chat.completions.create(
+            model=GEMINI_MODEL,
+            temperature=0.0,
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        f"Translate the user's text into {target_language}. Keep technical terms, "
+                        "code, formulas and names accurate. Reply with the translation only."
+                    ),
+                },
+                {"role": "user", "content": text},
+            ],
+        ),
+        timeout,
+    ))
+    return (response.choices[0].message.content or "").strip()
+
+
+async def translate_query(query: str, language: str) -> str:
+    """English form of a learner's query (cached); the query itself on failure."""
+    key = make_key("qtr", language.lower(), query.strip())
+    try:
+        translated = await query_translation_cache.get_or_compute(
+            key, lambda: translate_text(query, SOURCE_LANGUAGE)
+        )
+    except Exception as e:
+        print(f"Warning: query translation failed, searching with the original: {e!r}")
+        return query
+    return translated or query
+
+
+# --- Chunk translation store -------------------------------------------------------
+
+class TranslationStore:
+    """Chunk translations keyed by (language, content hash)."""
+
+    def __init__(self, path: Path = TRANSLATION_STORE_PATH):
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per process/thread; connections must not cross a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                " language TEXT NOT NULL,"
+                " content_hash TEXT NOT NULL,"
+                " text TEXT NOT NULL,"
+                " PRIMARY KEY (language, content_hash))"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_many(self, language: str, hashes: List[str]) -> Dict[str, str]:
+        if not hashes:
+            return {}
+        placeholders = ", ".join("?" for _ in hashes)
+        try:
+            rows = self._connection().execute(
+                f"SELECT content_hash, text FROM translations WHERE language = ? AND content_hash IN ({placeholders})",
+                [language.lower(), *hashes],
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Warning: translation store read failed: {e}")
+            return {}
+        return dict(rows)
+
+    def put_many(self, language: str, rows: Iterable[Tuple[str, str]]) -> None:
+        conn = self._connection()
+        conn.executemany(
+            "INSERT OR REPLACE INTO translations (language, content_hash, text) VALUES (?, ?, ?)",
+            [(language.lower(), digest, text) for digest, text in rows],
+        )
+
+
+_translation_store: Optional[TranslationStore] = None
+
+def get_translation_store() -> Optional[TranslationStore]:
+    """The local store, or None if translate_chunks.py never ran here."""
+    global _translation_store
+    if _translation_store is None and TRANSLATION_STORE_PATH.exists():
+        _translation_store = TranslationStore()
+    return _translation_store
+
+
+def localize_candidates(candidates: List[Dict], language: str) -> int:
+    """
+    Swap candidate content for stored translations in place and mark those
+    candidates "localized"; returns how many. Reads SQLite, so async callers
+    run it in a thread.
+    """
+    store = get_translation_store()
+    if store is None:
+        return 0
+    hashes = [content_hash(c.get("content") or "") for c in candidates]
+    translations = store.get_many(language, list(set(hashes)))
+    for candidate, digest in zip(candidates, hashes):
+        if digest in translations:
+            candidate["content"] = translations[digest]
+            candidate["localized"] = True
+    return sum(1 for digest in hashes if digest in translations)
@@ -0,0 +1,94 @@
+"""
+Cached learner profiles for personalizing tutor answers.
+
+chat_endpoint resolves the user's profile (experience level, background,
+language) before running the agent and renders it into the instructions,
+so the model never spends a turn calling user_context_tool just to learn
+who it is talking to. Profiles sit in the two-tier cache for a few minutes;
+updating personalization invalidates the entry (other workers' in-process
+copies expire within PROFILE_CACHE_TTL).
+
+The same module keeps the in-process version map behind conditional GETs of
+/api/personalization: user_id -> (ETag, Last-Modified) of the profile this
+worker last served or wrote. A revalidation that matches is answered 304
+without touching the database. Entries expire after PROFILE_VERSION_TTL so
+a change made through another worker is picked up within that window.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from cache import TwoTierCache, make_key
+
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", "300"))
+PROFILE_VERSION_TTL = int(os.getenv("PROFILE_VERSION_TTL", "30"))
+PROFILE_VERSION_MAX_ENTRIES = 10000
+
+profile_cache = TwoTierCache("profile", ttl=PROFILE_CACHE_TTL)
+
+
+def profile_cache_key(user_id: str) -> str:
+    return make_key("profile", str(user_id))
+
+
+async def get_cached_profile(
+    user_id: str,
+    fetch: Callable[[str], Optional[Dict[str, Any]]],
+) -> Optional[Dict[str, Any]]:
+    """Return the user's profile, calling the blocking `fetch` in a thread on a miss."""
+    return await profile_cache.get_or_compute(
+        profile_cache_key(user_id),
+        lambda: asyncio.to_thread(fetch, user_id),
+    )
+
+
+async def invalidate_profile(user_id: str) -> None:
+    """Drop a cached profile after the user changes their settings."""
+    _profile_versions.pop(str(user_id), None)
+    await profile_cache.delete(profile_cache_key(user_id))
+
+
+# --- Profile versions (conditional GET) --------------------------------------------
+
+ProfileVersion = Tuple[str, Optional[datetime]]  # (ETag, Last-Modified)
+
+# user_id -> (etag, last_modified, expires_at)
+_profile_versions: Dict[str, Tuple[str, Optional[datetime], float]] = {}
+
+
+def profile_version(user_id: str, settings: Dict[str, Any], updated_at: Optional[datetime]) -> ProfileVersion:
+    """
+    ETag over the served settings and users.updated_at. The settings are
+    part of it so rows written without bumping updated_at still change it.
+    """
+    digest = hashlib.sha256(
+        json.dumps([str(user_id), updated_at, settings], default=str, sort_keys=True).encode("utf-8")
+    ).hexdigest()[:20]
+    # Weak: the same settings may be sent gzip-compressed or not
+    return f'W/"{digest}"', updated_at
+
+
+def remember_profile_version(user_id: str, version: ProfileVersion) -> None:
+    if len(_profile_versions) >= PROFILE_VERSION_MAX_ENTRIES:
+        now = time.time()
+        for key in [key for key, entry in _profile_versions.items() if entry[2] <= now]:
+            del _profile_versions[key]
+        if len(_profile_versions) >= PROFILE_VERSION_MAX_ENTRIES:
+            _profile_versions.pop(next(iter(_profile_versions)))
+    _profile_versions[str(user_id)] = (*version, time.time() + PROFILE_VERSION_TTL)
+
+
+def known_profile_version(user_id: str) -> Optional[ProfileVersion]:
+    """The version this worker last saw for the user, if still trusted."""
+    entry = _profile_versions.get(str(user_id))
+    if entry is None:
+        return None
+    etag, last_modified, expires_at = entry
+    if expires_at <= time.time():
+        del _profile_versions[str(user_id)]
+        return None
+    return etag, last_modified
@@ -0,0 +1,295 @@
+"""
+Offline answer-cache warming for the textbook's key questions.
+
+Builds a question set for every chapter-*.mdx from its section headings and
+learning objectives, runs each question through the tutor agent for every
+configured language and experience level, and stores the answers (with their
+sources) in the answer cache under the same keys chat_endpoint uses. The
+first student to ask a common question then gets a cache hit instead of a
+multi-turn LLM run.
+
+Answers are warmed with the default profile background, so a warmed answer
+serves every learner at that level who hasn't written a background of their
+own. Point CACHE_BACKEND / REDIS_URL (or SHARED_CACHE_PATH) at the same
+shared tier the API uses.
+
+The job is resumable: every job's outcome is appended to a progress file
+under its answer-cache key, which covers the model and the collection
+version. The next run skips jobs that were warmed within the answer TTL and
+retries failed ones; a re-index, a model switch or an expired entry means a
+different or stale key, so those questions are warmed again. Requests are paced to WARM_REQUESTS_PER_MINUTE and
+the whole job backs off when Gemini reports a rate limit.
+
+Usage:
+    python warm_answer_cache.py [--languages english,urdu]
+        [--levels beginner,intermediate,advanced] [--concurrency 2]
+        [--progress warm_progress.jsonl] [--reset] [--dry-run]
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from dotenv import load_dotenv
+
+BASE_DIR = Path(__file__).resolve().parent
+ENV_PATH = BASE_DIR / '.env'
+load_dotenv(dotenv_path=ENV_PATH)
+
+from index_textbook import BOOK_DOCS_DIR, extract_sections, parse_frontmatter
+
+WARM_LANGUAGES = os.getenv("WARM_LANGUAGES", "english")
+WARM_LEVELS = os.getenv("WARM_LEVELS", "beginner,intermediate,advanced")
+WARM_CONCURRENCY = int(os.getenv("WARM_CONCURRENCY", "2"))
+WARM_REQUESTS_PER_MINUTE = float(os.getenv("WARM_REQUESTS_PER_MINUTE", "20"))
+# Offline runs may take much longer than an interactive request
+WARM_DEADLINE_SECONDS = 120.0
+MAX_ATTEMPTS = 4
+RATE_LIMIT_BACKOFF_SECONDS = 30.0
+DEFAULT_PROGRESS_FILE = BASE_DIR / "warm_progress.jsonl"
+
+# Headings that never make useful questions
+SKIPPED_HEADINGS = {
+    "introduction", "exercises", "references", "summary", "conclusion", "key concepts", "learning objectives",
+}
+SKIPPED_HEADING_PREFIXES = ("python code example", "explanation of the code", "diagram", "example")
+MAX_OBJECTIVES_PER_CHAPTER = 6
+
+
+# --- Question set ------------------------------------------------------------------
+
+def _heading_question(title: str) -> Optional[str]:
+    title = re.sub(r"^\d+(\.\d+)*\s+", "", title).strip().rstrip(":")
+    lowered = title.lower()
+    if not title or lowered in SKIPPED_HEADINGS or lowered.startswith(SKIPPED_HEADING_PREFIXES):
+        return None
+    if title.endswith("?"):
+        return title
+    if len(title.split()) <= 4:
+        return f"What is {title}?"
+    return f"Explain {title}."
+
+
+def chapter_questions(file_path: Path) -> List[str]:
+    """Questions for one chapter: its key headings and learning objectives."""
+    _, body = parse_frontmatter(file_path.read_text(encoding="utf-8"))
+    # Comments inside code blocks would otherwise look like headings
+    body = re.sub(r"```.*?```", "", body, flags=re.DOTALL)
+
+    questions: List[str] = []
+    for section in extract_sections(body):
+        if section["title"].lower() == "learning objectives":
+            objectives = [
+                line.strip()[2:].strip()
+                for line in section["content"]
+                if line.strip().startswith(("- ", "* "))
+            ]
+            questions.extend(objectives[:MAX_OBJECTIVES_PER_CHAPTER])
+        elif section["level"] in (2, 3):
+            question = _heading_question(section["title"])
+            if question:
+                questions.append(question)
+
+    seen: Set[str] = set()
+    return [q for q in questions if not (q.lower() in seen or seen.add(q.lower()))]
+
+
+def build_jobs(languages: List[str], levels: List[str]) -> List[Dict[str, str]]:
+    jobs = []
+    for chapter_file in sorted(BOOK_DOCS_DIR.glob("chapter-*.mdx")):
+        for question in chapter_questions(chapter_file):
+            for language in languages:
+                for level in levels:
+                    jobs.append({
+                        "chapter": chapter_file.stem,
+                        "question": question,
+                        "language": language,
+                        "level": level,
+                    })
+    return jobs
+
+
+def job_profile(job: Dict[str, str]):
+    from agent import DEFAULT_PROFILE, UserProfile
+
+    return UserProfile(
+        experience_level=job["level"],
+        background=DEFAULT_PROFILE.background,
+        language=job["language"],
+    )
+
+
+async def job_key(job: Dict[str, str]) -> str:
+    """The answer-cache key the API will look this question up under."""
+    from app.api.chat import answer_cache_key
+
+    return await answer_cache_key(job["language"], job["question"], None, job_profile(job))
+
+
+# --- Progress ----------------------------------------------------------------------
+
+DONE_STATUSES = ("warmed", "cached")
+
+
+def load_progress(path: Path, max_age: float) -> Set[str]:
+    """Cache keys warmed within max_age seconds; failed jobs are not done."""
+    if not path.exists():
+        return set()
+    done: Set[str] = set()
+    cutoff = time.time() - max_age
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                key, status, at = record["key"], record["status"], record["at"]
+            except (ValueError, KeyError):
+                continue  # Tolerate a line cut short by an interrupted run (or an old format)
+            if status in DONE_STATUSES and at >= cutoff:
+                done.add(key)
+            else:
+                done.discard(key)
+    return done
+
+
+def record_progress(path: Path, key: str, job: Dict[str, str], status: str) -> None:
+    record = {"key": key, "question": job["question"], "language": job["language"], "level": job["level"],
+              "status": status, "at": time.time()}
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+# --- Scheduling --------------------------------------------------------------------
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    text = f"{type(error).__name__} {error}"
+    return "RateLimit" in text or "429" in text or "RESOURCE_EXHAUSTED" in text
+
+
+class RateLimiter:
+    """Spaces request starts evenly and pauses everyone after a rate limit."""
+
+    def __init__(self, requests_per_minute: float):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self.next_start = 0.0
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            start = max(now, self.next_start, self.paused_until)
+            self.next_start = start + self.interval
+        await asyncio.sleep(start - now)
+
+    def back_off(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+# --- Warming -----------------------------------------------------------------------
+
+async def warm_one(job: Dict[str, str], key: str, limiter: RateLimiter) -> str:
+    """
+    Answer one question unless it is cached already. Returns "cached",
+    "warmed" or, once every attempt has failed, "failed".
+    """
+    from agent import TutorContext, get_agent
+    from app.api.chat import answer_cache, run_tutor
+    from deadline import request_deadline
+    from geminiconfig import get_gemini_config
+
+    if await answer_cache.get(key) is not None:
+        return "cached"
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        await limiter.wait()
+        try:
+            with request_deadline(WARM_DEADLINE_SECONDS) as budget:
+                answer = await run_tutor(
+                    get_agent(job["language"]),
+                    job["question"],
+                    get_gemini_config(),
+                    TutorContext(profile=job_profile(job)),
+                )
+            if budget.retrieval_failed:
+                # Answered without the textbook; never cache that
+                raise RuntimeError("textbook search failed during the run")
+            await answer_cache.set(key, answer)
+            return "warmed"
+        except Exception as e:
+            if attempt == MAX_ATTEMPTS:
+                print(f"  ❌ {job['question']!r} ({job['language']}/{job['level']}): {e}")
+                break
+            backoff = RATE_LIMIT_BACKOFF_SECONDS * 2 ** (attempt - 1)
+            if is_rate_limit_error(e):
+                print(f"  ⏸️  Rate limited; pausing all workers for {backoff:.0f}s")
+                limiter.back_off(backoff)
+            else:
+                print(f"  ⚠️  Attempt {attempt} failed ({e}); retrying")
+                await asyncio.sleep(min(backoff, 5.0))
+    return "failed"
+
+
+async def warm(args: argparse.Namespace) -> bool:
+    languages = [item.strip() for item in args.languages.split(",") if item.strip()]
+    levels = [item.strip() for item in args.levels.split(",") if item.strip()]
+    progress_path = Path(args.progress)
+    if args.reset and progress_path.exists():
+        progress_path.unlink()
+
+    from app.api.chat import ANSWER_CACHE_TTL
+
+    jobs = build_jobs(languages, levels)
+    keys = [await job_key(job) for job in jobs]
+    done = load_progress(progress_path, ANSWER_CACHE_TTL)
+    pending = [(job, key) for job, key in zip(jobs, keys) if key not in done]
+    print(f"{len(jobs)} jobs (questions x languages x levels); {len(jobs) - len(pending)} already done, {len(pending)} to go")
+    if args.dry_run:
+        for job, _ in pending:
+            print(f"  [{job['language']}/{job['level']}] {job['question']}")
+        return True
+    if os.getenv("CACHE_BACKEND", "sqlite") == "memory":
+        print("❌ CACHE_BACKEND=memory would discard the warmed answers")
+        return False
+
+    limiter = RateLimiter(args.requests_per_minute)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    counts = {"warmed": 0, "cached": 0, "failed": 0}
+    start = time.time()
+
+    async def run(job: Dict[str, str], key: str) -> None:
+        async with semaphore:
+            try:
+                status = await warm_one(job, key, limiter)
+            except Exception as e:
+                print(f"  ❌ {job['question']!r} ({job['language']}/{job['level']}): {e}")
+                status = "failed"
+            counts[status] += 1
+            # Failures are recorded too; load_progress leaves them pending for the next run
+            record_progress(progress_path, key, job, status)
+            finished = sum(counts.values())
+            print(f"  [{finished}/{len(pending)}] {status}: {job['question'][:60]} ({job['language']}/{job['level']})")
+
+    await asyncio.gather(*(run(job, key) for job, key in pending))
+    print(
+        f"✅ Done in {time.time() - start:.0f}s: {counts['warmed']} warmed, "
+        f"{counts['cached']} already cached, {counts['failed']} failed"
+    )
+    return counts["failed"] == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate tutor answers for key textbook questions.")
+    parser.add_argument("--languages", default=WARM_LANGUAGES)
+    parser.add_argument("--levels", default=WARM_LEVELS)
+    parser.add_argument("--concurrency", type=int, default=WARM_CONCURRENCY)
+    parser.add_argument("--requests-per-minute", type=float, default=WARM_REQUESTS_PER_MINUTE)
+    parser.add_argument("--progress", default=str(DEFAULT_PROGRESS_FILE))
+    parser.add_argument("--reset", action="store_true", help="Forget previous progress")
+    parser.add_argument("--dry-run", action="store_true", help="List the questions without running them")
+    success = asyncio.run(warm(parser.parse_args()))
+    if not success:
+        exit(1)